@@ -4,7 +4,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from logging.config import fileConfig
 from sqlalchemy import engine_from_config, QueuePool
 from alembic import context
-from shemas.database import DUser
+from shemas.database import Model
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -14,11 +14,11 @@ config = context.config
 fileConfig(config.config_file_name)
 
 # Добавьте URL для подключения к базе данных
-config.set_main_option('sqlalchemy.url', f"mysql+pymysql:/{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+config.set_main_option('sqlalchemy.url', f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
                                    f"@{os.getenv('DB_HOST')}/{os.getenv('DB_DATABASE')}")
 
 # Добавьте вашу базу моделей для автоматического обнаружения изменений
-target_metadata = DUser.metadata
+target_metadata = Model.metadata
 
 def run_migrations_offline():
     """Run migrations in 'offline' mode."""
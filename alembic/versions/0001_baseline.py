@@ -0,0 +1,42 @@
+"""baseline: book and user tables as created by create.install
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'book',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('title', sa.String(100)),
+        sa.Column('autor', sa.String(100)),
+        sa.Column('category', sa.String(100)),
+        sa.Column('describe', sa.String(1000), nullable=True),
+        sa.Column('hashed', sa.String(200)),
+        sa.Column('date_created', sa.DateTime()),
+    )
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('username', sa.String(50), unique=True),
+        sa.Column('password', sa.String(100)),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user')
+    op.drop_table('book')
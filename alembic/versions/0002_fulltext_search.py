@@ -0,0 +1,32 @@
+"""FULLTEXT indexes for ranked search (Repo.search_book)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:01:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ft_book_all', 'book', ['title', 'autor', 'category', 'describe'],
+                    mysql_prefix='FULLTEXT')
+    op.create_index('ft_book_title', 'book', ['title'], mysql_prefix='FULLTEXT')
+    op.create_index('ft_book_autor', 'book', ['autor'], mysql_prefix='FULLTEXT')
+    op.create_index('ft_book_category', 'book', ['category'], mysql_prefix='FULLTEXT')
+
+
+def downgrade() -> None:
+    op.drop_index('ft_book_category', table_name='book')
+    op.drop_index('ft_book_autor', table_name='book')
+    op.drop_index('ft_book_title', table_name='book')
+    op.drop_index('ft_book_all', table_name='book')
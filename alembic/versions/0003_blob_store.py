@@ -0,0 +1,37 @@
+"""content-addressed blob store: blob table and book.file_hash
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:02:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blob',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('digest', sa.String(64), nullable=False, unique=True),
+        sa.Column('path', sa.String(200), nullable=False),
+        sa.Column('size', sa.BigInteger(), default=0),
+        sa.Column('refcount', sa.Integer(), nullable=False, default=1),
+    )
+    op.add_column('book', sa.Column('file_hash', sa.String(64), nullable=True))
+    op.create_index('ix_book_file_hash', 'book', ['file_hash'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_book_file_hash', table_name='book')
+    op.drop_column('book', 'file_hash')
+    op.drop_table('blob')
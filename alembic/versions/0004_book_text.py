@@ -0,0 +1,38 @@
+"""book_text: extracted document text with FULLTEXT index
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.mysql import MEDIUMTEXT
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'book_text',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('digest', sa.String(64), nullable=False, unique=True),
+        sa.Column('status', sa.String(16), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('content', MEDIUMTEXT(), nullable=True),
+        sa.Column('error', sa.String(500), nullable=True),
+        sa.Column('updated', sa.DateTime()),
+    )
+    op.create_index('ix_book_text_status', 'book_text', ['status'])
+    op.create_index('ft_book_text_content', 'book_text', ['content'], mysql_prefix='FULLTEXT')
+
+
+def downgrade() -> None:
+    op.drop_table('book_text')
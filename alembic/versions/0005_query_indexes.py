@@ -0,0 +1,41 @@
+"""composite indexes for every Repo query shape
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:04:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    # Repo.category (DISTINCT, loose index scan), Repo.all_query sorted by category/id
+    ('ix_book_category_id', ['category', 'id']),
+    # Repo.all_query keyset pages and page anchors for each sort field
+    ('ix_book_category_title', ['category', 'title', 'id']),
+    ('ix_book_category_autor', ['category', 'autor', 'id']),
+    ('ix_book_category_date', ['category', 'date_created', 'id']),
+    # Repo.stream_books filters by author and date range
+    ('ix_book_autor_id', ['autor', 'id']),
+    ('ix_book_date_id', ['date_created', 'id']),
+    # Repo.drop_file / adopt_blob lookups by stored path
+    ('ix_book_hashed', ['hashed']),
+)
+
+
+def upgrade() -> None:
+    for name, columns in INDEXES:
+        op.create_index(name, 'book', columns)
+
+
+def downgrade() -> None:
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name='book')
@@ -0,0 +1,37 @@
+"""maintained per-category book counters
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 13:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'book_count',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('scope', sa.String(10), nullable=False),
+        sa.Column('category', sa.String(100), nullable=False),
+        sa.Column('total', sa.BigInteger(), nullable=False),
+        sa.UniqueConstraint('scope', 'category', name='uq_book_count_scope_category'),
+    )
+    op.execute("INSERT INTO book_count (scope, category, total) "
+               "SELECT 'category', category, COUNT(*) FROM book GROUP BY category")
+    op.execute("INSERT INTO book_count (scope, category, total) "
+               "SELECT 'total', '', COUNT(*) FROM book")
+
+
+def downgrade() -> None:
+    op.drop_table('book_count')
@@ -0,0 +1,38 @@
+"""job: durable background job queue
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 13:40:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'job',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('kind', sa.String(50), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(16), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('result', sa.String(500), nullable=True),
+        sa.Column('error', sa.String(500), nullable=True),
+        sa.Column('created', sa.DateTime()),
+        sa.Column('updated', sa.DateTime()),
+    )
+    op.create_index('ix_job_status_id', 'job', ['status', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_table('job')
@@ -0,0 +1,25 @@
+"""index blob.path for orphan file lookups
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 14:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_blob_path', 'blob', ['path'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_blob_path', table_name='blob')
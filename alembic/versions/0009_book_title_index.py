@@ -0,0 +1,25 @@
+"""index book.title for fuzzy search lookups
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 21:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_book_title_id', 'book', ['title', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_book_title_id', table_name='book')
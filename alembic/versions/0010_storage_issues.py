@@ -0,0 +1,38 @@
+"""storage_issue: files the integrity scrubber found missing or corrupt
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 23:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'storage_issue',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('path', sa.String(200), nullable=False, unique=True),
+        sa.Column('kind', sa.String(16), nullable=False),
+        sa.Column('expected', sa.String(64), nullable=True),
+        sa.Column('actual', sa.String(64), nullable=True),
+        sa.Column('detail', sa.String(500), nullable=True),
+        sa.Column('detected', sa.DateTime()),
+        sa.Column('checked', sa.DateTime()),
+        sa.Column('resolved', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_storage_issue_resolved_id', 'storage_issue', ['resolved', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_table('storage_issue')
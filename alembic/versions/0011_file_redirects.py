@@ -0,0 +1,33 @@
+"""file_redirect: former paths of moved files, for redirecting old links
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'file_redirect',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('old_path', sa.String(200), nullable=False, unique=True),
+        sa.Column('new_path', sa.String(200), nullable=False),
+        sa.Column('moved', sa.DateTime()),
+    )
+    op.create_index('ix_file_redirect_new_path', 'file_redirect', ['new_path'])
+
+
+def downgrade() -> None:
+    op.drop_table('file_redirect')
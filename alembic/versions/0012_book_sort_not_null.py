@@ -0,0 +1,39 @@
+"""book: sort columns NOT NULL, so keyset pages never skip a row
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (field, id) < (value, id) is never true for a NULL value, so such rows fell
+# out of keyset pages. NULLs become the values that sorted the same way in
+# the DESC listings (last), and the columns refuse new ones.
+COLUMNS = (
+    ('title', sa.String(100), "''"),
+    ('autor', sa.String(100), "''"),
+    ('category', sa.String(100), "''"),
+    ('date_created', sa.DateTime(), "'1970-01-01 00:00:00'"),
+)
+
+
+def upgrade() -> None:
+    for name, type_, empty in COLUMNS:
+        op.execute(f"UPDATE book SET {name} = {empty} WHERE {name} IS NULL")
+        op.alter_column('book', name, existing_type=type_, nullable=False)
+
+
+def downgrade() -> None:
+    for name, type_, _ in COLUMNS:
+        op.alter_column('book', name, existing_type=type_, nullable=True)
@@ -1,32 +1,190 @@
+import asyncio
 import jwt
 import hashlib
 from functools import wraps
 from datetime import datetime, timedelta, timezone
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature, BadData
 import os
-from quart import Quart, request, render_template, send_from_directory, jsonify, redirect, url_for, session
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import sessionmaker
-from shemas.repository import Repo, engine
+import re
+import time
+from quart import Quart, Response, request, render_template, jsonify, redirect, url_for, session, g, send_file
+from shemas.repository import Repo, engine, new_session
+from shemas.queries import EXPORT_COLUMNS
+from shemas import uow
+from shemas.pagination import decode_cursor
+from shemas.search import parse_query
+from shemas.cache import catalog_cache
+from werkzeug.exceptions import NotFound
+from services.delivery import send_stored_file, content_digest, StoredFileResponse
+from services.export import FORMATS as EXPORT_FORMATS, render as render_export
+from services.extraction import text_extractor
+from services.jobs import job_queue
+from services.resumable import resumable_uploads, UploadError
+from services.suggest import suggest_index, KINDS
+from services.fuzzy import fuzzy_index
+from services.terms import term_refresher
+from services.page_cache import page_cache
+from services.warmup import warm_up, WARMUP_TIMEOUT
+from services.metrics import registry, request_latency, upload_bytes, uploads, Gauge, slow_queries, SLOW_QUERY_MS
+from services.scrub import Scrubber
+from services.gc import remove_released
+from services.profiling import request_profiler, PROFILE_HEADER, PROFILE_SALT, PROFILE_TOKEN_SECONDS
+from services.storage import (receive_upload, move_into_place, discard, remove_file,
+                              layout, ALLOWED_EXTENSIONS)
 
 
 app = Quart(__name__)
-app.secret_key = os.urandom(24)
+app.response_class = StoredFileResponse
+# Every worker process must sign sessions and tokens with the same key; the random
+# fallback only suits a single development process.
+app.secret_key = os.getenv('SECRET_KEY') or os.urandom(24)
 serializer = URLSafeTimedSerializer(app.secret_key)
 
-async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-
 UPLOAD_FOLDER = 'files'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
-ALLOWED_EXTENSIONS = {'doc', 'pdf'}
+MAX_BULK_DELETE = 1000
+PROFILE_SORTS = ('cumulative', 'tottime', 'calls')
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 
+registry.register(Gauge(
+    'catalog_cache', 'Catalog cache counters.', ('stat',),
+    callback=lambda: [({'stat': key}, value) for key, value in catalog_cache.stats().items()]))
+registry.register(Gauge(
+    'page_cache', 'Rendered page cache counters.', ('stat',),
+    callback=lambda: [({'stat': key}, value) for key, value in page_cache.stats().items()]))
+
+
+@app.before_request
+async def start_timer():
+    """Remembers when the request started, for the latency histogram."""
+    g.request_started = time.perf_counter()
+
+
+def valid_profile_token(value):
+    """Whether ``value`` is a profiling token issued by the admin page and not expired."""
+    if not value:
+        return False
+    try:
+        serializer.loads(value, salt=PROFILE_SALT, max_age=PROFILE_TOKEN_SECONDS)
+        return True
+    except BadData:
+        return False
+
+
+@app.before_request
+async def start_profile():
+    """Profiles the request if it carries a signed X-Profile header or the profiler is armed."""
+    signed = valid_profile_token(request.headers.get(PROFILE_HEADER))
+    if request_profiler.wanted(request.endpoint or 'unmatched', signed):
+        g.profile = request_profiler.start()
+
+
+@app.after_request
+async def save_profile(response):
+    """Saves the request's profile; registered first, so it runs after the other after_request hooks."""
+    profile = g.pop('profile', None)
+    if profile is not None:
+        response.headers[PROFILE_HEADER] = request_profiler.stop(
+            profile, request.endpoint or 'unmatched', time.perf_counter() - g.request_started)
+    return response
+
+
+@app.teardown_request
+async def cancel_profile(exc):
+    """Stops the profiler of a request that failed before save_profile."""
+    profile = g.pop('profile', None)
+    if profile is not None:
+        request_profiler.cancel(profile)
+
+
+@app.before_request
+async def open_unit_of_work():
+    """Every Repo call of the request shares one session (and at most one pooled connection)."""
+    uow.begin_request(new_session)
+
+
+@app.after_request
+async def commit_unit_of_work(response):
+    """Commits the request's transaction unless the response is an error."""
+    if response.status_code < 400:
+        await uow.commit()
+    return response
+
+
+@app.teardown_request
+async def close_unit_of_work(exc):
+    """Rolls back whatever was not committed and returns the connection to the pool."""
+    await uow.end_request()
+
+
+@app.after_request
+async def record_latency(response):
+    """Observes request latency per route."""
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        request_latency.observe(time.perf_counter() - started, route=route,
+                                method=request.method, status=response.status_code)
+    return response
+
+
+@app.route('/metrics')
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return registry.render(), 200, {'Content-Type': registry.content_type}
+
+
+async def resume_text_extraction():
+    """Picks up text extraction left unfinished by a previous run."""
+    await text_extractor.run_pending()
+
+
+@app.before_serving
+async def warm_up_worker():
+    """Opens pooled connections, compiles templates and fills caches before the first request."""
+    try:
+        print("warm-up", await asyncio.wait_for(warm_up(app, engine), WARMUP_TIMEOUT))
+    except Exception as e:
+        print("error", e)
+
+
+@app.before_serving
+async def start_background_work():
+    """Starts background processing once the server is up."""
+    await job_queue.start()
+    term_refresher.start()
+    app.add_background_task(resume_text_extraction)
+
+
+@app.after_serving
+async def stop_background_work():
+    """Stops the job workers, the index refreshes and the extraction process pool."""
+    await job_queue.stop()
+    await term_refresher.stop()
+    text_extractor.shutdown()
+
+
 @app.route('/files/<path:filename>')
 async def serve_file(filename):
-    """The path to the destination files."""
-    return await send_from_directory('files', filename)
+    """The path to the destination files (Range, ETag and immutable caching).
+
+        Links to a path the file has been moved from (storage layout change,
+        legacy book adopted by a blob) are redirected permanently to its current
+        path, recorded in file_redirect; files moved before that table existed
+        are found by the SHA-256 in their name.
+        """
+    try:
+        return await send_stored_file(app.config['UPLOAD_FOLDER'], filename)
+    except NotFound:
+        path = await Repo.redirect_path(filename)
+        if path is None:
+            digest = content_digest(filename)
+            path = await Repo.blob_path(digest) if digest else None
+        if path is None or path == filename:
+            raise
+        return redirect(url_for('serve_file', filename=path), 301)
 
 
 def generate_token(username):
@@ -43,7 +201,7 @@ def verify_token(token):
     if not token:
         return False, None
     try:
-        payload = jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=['HS256'])
+        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         username = payload.get('username')
         return True, username
     except (jwt.InvalidTokenError, jwt.ExpiredSignatureError):
@@ -114,6 +272,17 @@ async def logout():
     response.set_cookie('token', '', expires=0)
     return response
 
+async def page_cursor(page, per_page, link=None, name=None):
+    """Cursor for the requested page: ?cursor= if given, otherwise a jump via page anchors."""
+    cursor = decode_cursor(request.args.get('cursor'))
+    if cursor is not None or page <= 1:
+        return cursor
+    anchors = await Repo.page_anchors(per_page, link, name)
+    if not anchors:
+        return None
+    return anchors[min(page, len(anchors)) - 1], "at"
+
+
 @app.route('/')
 async def index():
     """Main page."""
@@ -121,16 +290,21 @@ async def index():
     access = verify_token(token)
     page = int(request.args.get('page', 1))
     per_page = 20
-    async with async_session() as sessions:
-        async with sessions.begin():
-            category = await Repo.category(sessions)
-            books = await Repo.sorted_recent(sessions, page, per_page)
-            total_books = await Repo.count_books(sessions)
+
+    async def render():
+        category = await Repo.category()
+        cursor = await page_cursor(page, per_page)
+        books = await Repo.sorted_recent(per_page, cursor)
+        total_books = await Repo.count_books()
         return await render_template(
-            'index.html', book_all=books, total_books=total_books, access=access,
+            'index.html', book_all=books.items, total_books=total_books, access=access,
                                            page=page, per_page=per_page, category=category,
+            next_cursor=books.next_cursor, prev_cursor=books.prev_cursor,
         )
 
+    key = ('index', page, None, None, access, request.args.get('cursor'))
+    return await page_cache.respond(key, render)
+
 
 @app.route("/select_category", methods=['GET'])
 async def query_method():
@@ -141,42 +315,111 @@ async def query_method():
     link = request.args.get("link")
     page = int(request.args.get('page', 1))
     per_page = 20
-    async with async_session() as sessions:
-        async with sessions.begin():
-            category = await Repo.category(sessions)
-            books = await Repo.all_query(sessions, page, per_page, link, name)
-            total_books = await Repo.count_books(sessions)
+
+    async def render():
+        category = await Repo.category()
+        cursor = await page_cursor(page, per_page, link, name)
+        books = await Repo.all_query(per_page, link, name, cursor)
+        total_books = await Repo.count_books(name)
         return await render_template(
-            'index.html', book_all=books, total_books=total_books, name=name, access=access,
-            page=page, per_page=per_page, link=link, category=category
+            'index.html', book_all=books.items, total_books=total_books, name=name, access=access,
+            page=page, per_page=per_page, link=link, category=category,
+            next_cursor=books.next_cursor, prev_cursor=books.prev_cursor,
         )
 
+    key = ('select_category', page, name, link, access, request.args.get('cursor'))
+    return await page_cache.respond(key, render)
+
+
+def parse_date(value):
+    """ISO date/datetime from a query argument, None if absent."""
+    return datetime.fromisoformat(value) if value else None
+
 
-@app.route('/search', methods=['POST'])
+@app.route('/export.<export_format>')
+async def export_books(export_format):
+    """Streams the catalog as NDJSON, JSON or CSV.
+
+    Filters: ?category=, ?author=, ?date_from=, ?date_to= (ISO dates).
+    """
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"message": f"Неизвестный формат '{export_format}'"}), 404
+    try:
+        date_from = parse_date(request.args.get('date_from'))
+        date_to = parse_date(request.args.get('date_to'))
+    except ValueError:
+        return jsonify({"message": "Неверный формат даты, ожидается YYYY-MM-DD"}), 400
+    batches = Repo.stream_books(category=request.args.get('category'), author=request.args.get('author'),
+                                date_from=date_from, date_to=date_to)
+    columns = [column.key for column in EXPORT_COLUMNS]
+    response = Response(render_export(export_format, batches, columns),
+                        mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="catalog.{export_format}"'
+    return response
+
+
+@app.route('/cache/stats')
+async def cache_stats():
+    """Hit/miss counters of the catalog cache."""
+    return jsonify({**catalog_cache.stats(), "pages": page_cache.stats(),
+                    "suggest": suggest_index.stats(), "fuzzy": fuzzy_index.stats()})
+
+
+@app.route('/suggest')
+async def suggest():
+    """Search-as-you-type: titles, authors and categories starting with ?q= (served from memory)."""
+    query = request.args.get('q', '')
+    kind = request.args.get('kind')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 20)
+    suggestions = suggest_index.suggest(query, limit, kind)
+    return jsonify({"q": query,
+                    "suggestions": [{"kind": found, "text": text} for found, text in suggestions]})
+
+
+@app.route('/search', methods=['GET', 'POST'])
 async def search_book_author():
     """Search."""
     token = session.get('token')
     access = verify_token(token)
-    form_data = await request.form
+    form_data = await request.form if request.method == 'POST' else request.args
     search = form_data.get('search')
-    search_type = form_data.get('search_type')
-    async with async_session() as sessions:
-        async with sessions.begin():
-            books = await Repo.search_book(search, search_type)
-            category = await Repo.category(sessions)
-            if books is None:
-                return await render_template('search.html', err='По запросу ничего не найдено,'
-                                                                  ' измените параметры поиска')
-    return await render_template('search.html',books=books, access=access, category=category)
-
-
-def generate_file_hash(file):
-    """Generating a hash of the file name."""
-    hash_md5 = hashlib.md5()
-    for chunk in iter(lambda: file.read(4096), b""):
-        hash_md5.update(chunk)
-    file.seek(0)
-    return hash_md5.hexdigest()
+    search_type = form_data.get('search_type', 'all')
+    page = int(request.args.get('page', 1))
+    per_page = 20
+    books = await Repo.search_book(search, search_type, page, per_page)
+    category = await Repo.category()
+    fuzzy = False
+    if not books and books is not False and not await Repo.count_search(search, search_type):
+        books, total_books = await fuzzy_books(search, search_type, page, per_page)
+        fuzzy = True
+    if not books or isinstance(books, str):
+        return await render_template('search.html', err='По запросу ничего не найдено,'
+                                                          ' измените параметры поиска',
+                                     access=access, category=category)
+    if not fuzzy:
+        total_books = await Repo.count_search(search, search_type)
+    return await render_template('search.html', books=books, access=access, category=category,
+                                 search=search, search_type=search_type, page=page,
+                                 per_page=per_page, total_books=total_books, fuzzy=fuzzy)
+
+
+async def fuzzy_books(search, search_type, page, per_page):
+    """Books whose title, author or category is close to the query: typos, Latin for Cyrillic.
+
+    Used when the full-text search finds nothing. Terms are matched per field
+    (field prefixes work as in the full-text search), books are ranked by their
+    best matching value.
+
+    Returns:
+        tuple: (books on the page, number of books found).
+    """
+    scores = {}
+    for field, terms in parse_query(search or '', search_type).items():
+        kinds = tuple(KINDS) if field == 'all' else (field,) if field in KINDS else ()
+        for score, kind, value in fuzzy_index.search(' '.join(terms), kinds) if kinds else ():
+            scores[(kind, value)] = max(score, scores.get((kind, value), 0))
+    return (await Repo.books_by_values(scores, page, per_page),
+            await Repo.count_by_values(scores))
 
 
 @app.route('/upload')
@@ -190,17 +433,6 @@ async def upload_form():
     return await render_template("login.html")
 
 
-def create_directory(now):
-    """Create new directory (if not)."""
-    create_folder = now.strftime("%Y-%m-%d")
-    dir_name = os.path.join(f"files/{create_folder[:4]}", create_folder)
-    try:
-        os.makedirs(dir_name, exist_ok=True)
-        return create_folder
-    except OSError as e:
-        return f"Ошибка при создании директории: {str(e)}"
-
-
 def allowed_file(filename):
     """Checking valid file types."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -211,7 +443,6 @@ def allowed_file(filename):
 async def upload_file():
     """Upload file."""
     now = datetime.now()
-    date = now.strftime("%Y-%m-%d-%H-%M-%S")
     files = await request.files
     if 'file' not in files:
         q = 'Нет файла для загрузки'
@@ -228,6 +459,10 @@ async def upload_file():
         q = 'Нет выбранного файла'
         return await render_template("upload.html", success=q)
 
+    if not (title and author and category):
+        q = 'Название, автор и категория обязательны'
+        return await render_template("upload.html", success=q)
+
     if not allowed_file(file.filename):
         q = "Недопустимый тип файла. Пожалуйста, загрузите файл с одним из следующих расширений: '.pdf'"
         return await render_template("upload.html", success=q)
@@ -236,18 +471,199 @@ async def upload_file():
         q = 'Файл слишком большой. Максимальный размер файла 16MB.'
         return await render_template("upload.html", success=q)
 
-    file_hash = generate_file_hash(file)
+    if job_queue.full():
+        uploads.inc(result='rejected')
+        q = 'Сервер перегружен, повторите загрузку через минуту.'
+        return await render_template("upload.html", success=q), 503, {'Retry-After': '60'}
+
+    tmp_path, file_hash, size = await receive_upload(file)
+    upload_bytes.inc(size)
     file_extension = file.filename.rsplit('.', 1)[1].lower()
-    dir_name = create_directory(now)
-    new_filename = f"{dir_name[:4]}/{dir_name}/{title}_{file_hash}.{file_extension}"
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], new_filename)
-    await file.save(file_path)
+    fields = {'title': title, 'autor': author, 'category': category, 'describe': description}
+    try:
+        job_id = await store_upload(tmp_path, file_hash, size, file_extension, fields, now)
+    except OSError as e:
+        await discard(tmp_path)
+        return await render_template("upload.html", success=f"Ошибка при сохранении файла: {str(e)}")
+
+    q = f'Файл сохранён и поставлен в обработку (задача {job_id})'
+    return await render_template("upload.html", success=q, job_id=job_id)
+
+
+async def store_upload(tmp_path, file_hash, size, file_extension, fields, now):
+    """Moves a received file into the store and queues its ingest job.
+
+    Content that is already stored is not moved: the temp file is discarded
+    and the book will point at the existing copy.
+
+    Returns:
+        int: Id of the ingest job.
+
+    Raises:
+        OSError: If the file cannot be moved into place (the temp file is left for the caller).
+    """
+    new_filename = await Repo.blob_path(file_hash)
+    stored = new_filename is None
+    if stored:
+        new_filename = layout.path(file_hash, file_extension, now, fields['title'])
+        await move_into_place(tmp_path, new_filename)
+    else:
+        await discard(tmp_path)
+    items = {**fields, 'hashed': new_filename, 'date_created': now.isoformat()}
+    return await job_queue.submit('ingest', items=items, digest=file_hash, size=size, stored=stored)
+
 
-    items = [title, author, category, description, new_filename, date]
-    await Repo.insert_new_book(items)
+def upload_error(e: UploadError):
+    """JSON answer for a rejected resumable upload operation."""
+    body = {"message": str(e)}
+    if e.offset is not None:
+        body["offset"] = e.offset
+    return jsonify(body), e.status
 
-    q = 'Файл успешно загружен'
-    return await render_template("upload.html", success=q)
+
+@app.route('/uploads', methods=['POST'])
+@token_required
+async def create_upload():
+    """Starts a resumable upload.
+
+    Expects JSON {"filename", "size", "title", "author", "category", "description"}.
+    The file is then sent with PUT /uploads/<id>?offset=N in chunks of at most
+    chunk_size bytes and completed with POST /uploads/<id>/finish.
+    """
+    data = await request.get_json(silent=True) or {}
+    filename = str(data.get('filename') or '')
+    fields = {'title': data.get('title'), 'autor': data.get('author'),
+              'category': data.get('category'), 'describe': data.get('description') or ''}
+    if not all(fields[key] for key in ('title', 'autor', 'category')):
+        return jsonify({"message": "Название, автор и категория обязательны"}), 400
+    if not allowed_file(filename):
+        return jsonify({"message": "Недопустимый тип файла"}), 400
+    try:
+        size = int(data.get('size'))
+        upload_id = await resumable_uploads.create(
+            size, {'extension': filename.rsplit('.', 1)[1].lower(), 'fields': fields})
+    except (TypeError, ValueError):
+        return jsonify({"message": "Не указан размер файла"}), 400
+    except UploadError as e:
+        return upload_error(e)
+    return jsonify({"id": upload_id, "offset": 0, "size": size,
+                    "chunk_size": resumable_uploads.chunk_size}), 201, {
+        'Location': url_for('upload_status', upload_id=upload_id)}
+
+
+@app.route('/uploads/<upload_id>')
+@token_required
+async def upload_status(upload_id):
+    """Progress of a resumable upload: bytes received so far."""
+    try:
+        state = await resumable_uploads.status(upload_id)
+    except UploadError as e:
+        return upload_error(e)
+    return jsonify({"id": upload_id, "offset": state['offset'], "size": state['size'],
+                    "complete": state['offset'] == state['size']})
+
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+@token_required
+async def upload_chunk(upload_id):
+    """Writes a chunk at ?offset=N (the current offset, see GET /uploads/<id>)."""
+    try:
+        start = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({"message": "Не указано смещение"}), 400
+    try:
+        offset = await resumable_uploads.write(upload_id, start, request.body, request.content_length)
+    except UploadError as e:
+        return upload_error(e)
+    upload_bytes.inc(offset - start)
+    return jsonify({"id": upload_id, "offset": offset})
+
+
+@app.route('/uploads/<upload_id>/finish', methods=['POST'])
+@token_required
+async def finish_upload(upload_id):
+    """Completes a resumable upload: stores the file and queues its ingest job."""
+    if job_queue.full():
+        uploads.inc(result='rejected')
+        return jsonify({"message": "Сервер перегружен, повторите через минуту"}), 503, {'Retry-After': '60'}
+    try:
+        data_path, file_hash, size, meta = await resumable_uploads.finish(upload_id)
+        job_id = await store_upload(data_path, file_hash, size, meta['extension'], meta['fields'],
+                                    datetime.now())
+    except UploadError as e:
+        return upload_error(e)
+    except OSError as e:
+        return jsonify({"message": f"Ошибка при сохранении файла: {str(e)}"}), 500
+    await resumable_uploads.forget(upload_id)
+    return jsonify({"id": upload_id, "job_id": job_id,
+                    "status_url": url_for('job_status', job_id=job_id)})
+
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+@token_required
+async def abort_upload(upload_id):
+    """Cancels a resumable upload and removes what was received."""
+    try:
+        await resumable_uploads.status(upload_id)
+    except UploadError as e:
+        return upload_error(e)
+    await resumable_uploads.forget(upload_id)
+    return jsonify({"id": upload_id, "deleted": True})
+
+
+@job_queue.handler('ingest')
+async def ingest_upload(job, items, digest, size, stored=True):
+    """Registers a stored upload: blob reference, book row, counters, text extraction queue.
+
+    ``stored`` is False for a duplicate whose temp file was discarded: its
+    existing copy may have been dropped since, so the file is checked first
+    and the job fails rather than insert a book without a file. A file stored
+    while the same content was stored concurrently is removed after commit,
+    the book points at the other copy.
+    """
+    items = {**items, 'date_created': datetime.fromisoformat(items['date_created'])}
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], items['hashed'])
+    if not await asyncio.to_thread(os.path.exists, file_path):
+        raise FileNotFoundError(f"Файл {items['hashed']} не найден")
+    path = await Repo.insert_new_book(items, digest, size, session=job.session)
+
+    async def after_commit():
+        if stored and path != items['hashed']:
+            await remove_file(items['hashed'])
+        uploads.inc(result='stored' if stored and path == items['hashed'] else 'duplicate')
+        await job_queue.submit_once('extract_text')
+
+    job.after_commit(after_commit)
+    return path
+
+
+@job_queue.handler('extract_text')
+async def extract_text(job):
+    """Runs text extraction for every pending book_text row.
+
+    Ingests queue it with submit_once, so a burst of uploads leaves a single
+    queued trigger; if a pass is already running here it picks the new rows
+    up and this job ends at once instead of holding a job worker.
+    """
+    return await text_extractor.run_pending(wait=False)
+
+
+@app.route('/jobs/<int:job_id>')
+async def job_status(job_id):
+    """Status of a background job."""
+    job = await Repo.get_job(job_id)
+    if job is None:
+        return jsonify({"message": f"Задача {job_id} не найдена"}), 404
+    return jsonify({
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.error,
+        "created": job.created.isoformat() if job.created else None,
+        "updated": job.updated.isoformat() if job.updated else None,
+    })
 
 
 @app.route('/delete')
@@ -269,15 +685,111 @@ async def drop_file():
     access = verify_token(token)
     form_data = await request.form
     ssid = form_data.get('id')
-    answer = await Repo.drop_file(ssid)
-    if answer is not None:
-        file_path = os.path.join('files/', answer)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        else:
-            print(f"Файл {file_path} не найден.")
+    since = time.time()
+    answer, orphan = await Repo.drop_file(ssid)
+    await uow.commit()
+    if orphan is not None:
+        await remove_released([orphan], since)
+    return await render_template('delete.html', answer=answer, access=access)
+
+
+def parse_ids(value):
+    """Book ids from a form field: numbers separated by commas, spaces or newlines."""
+    return [int(part) for part in re.split(r'[\s,;]+', value or '') if part]
+
+
+@app.route('/drop_files', methods=['POST'])
+@token_required
+async def drop_files():
+    """Bulk delete: form field ``ids`` or JSON ``{"ids": [...]}``."""
+    token = session.get('token')
+    access = verify_token(token)
+    payload = await request.get_json(silent=True)
+    try:
+        ids = [int(i) for i in payload['ids']] if payload is not None else parse_ids((await request.form).get('ids'))
+    except (TypeError, ValueError, KeyError):
+        ids = None
+    if not ids or len(ids) > MAX_BULK_DELETE:
+        message = f"Укажите от 1 до {MAX_BULK_DELETE} числовых идентификаторов."
+        if payload is not None:
+            return jsonify({"message": message}), 400
+        return await render_template('delete.html', answer=message, access=access), 400
+
+    since = time.time()
+    deleted, orphans = await Repo.drop_books(ids)
+    await uow.commit()
+    removed = await remove_released(orphans, since)
+    missing = sorted(set(ids) - set(deleted))
+    if payload is not None:
+        return jsonify({"deleted": deleted, "missing": missing, "files_removed": len(removed)})
+    answer = f"Удалено записей: {len(deleted)}, файлов: {len(removed)}."
+    if missing:
+        answer += f" Не найдены: {', '.join(map(str, missing))}."
     return await render_template('delete.html', answer=answer, access=access)
 
 
+@app.route('/storage/issues')
+@token_required
+async def storage_issues():
+    """Integrity report: files the scrubber found missing or corrupt (?resolved=1 adds resolved ones)."""
+    opened, issues = await Repo.storage_issues(bool(request.args.get('resolved')),
+                                               min(max(request.args.get('limit', 500, type=int), 1), 5000))
+    return jsonify({
+        "open": opened,
+        "scrub": await asyncio.to_thread(Scrubber().load_state),
+        "issues": [{
+            "path": issue.path,
+            "kind": issue.kind,
+            "expected": issue.expected,
+            "actual": issue.actual,
+            "detail": issue.detail,
+            "books": books,
+            "detected": issue.detected.isoformat() if issue.detected else None,
+            "checked": issue.checked.isoformat() if issue.checked else None,
+            "resolved": issue.resolved.isoformat() if issue.resolved else None,
+        } for issue, books in issues],
+    })
+
+
+@app.route('/profiling')
+@token_required
+async def profiling():
+    """Admin page: request profiler controls, saved profiles and slow Repo statements with their plans."""
+    token = session.get('token')
+    access = verify_token(token)
+    endpoints = sorted({rule.endpoint for rule in app.url_map.iter_rules()} - {'static'})
+    return await render_template(
+        'profiling.html', access=access, profiler=request_profiler, profiles=request_profiler.profiles(),
+        slow_queries=slow_queries.entries(), slow_query_ms=SLOW_QUERY_MS, endpoints=endpoints,
+        header=PROFILE_HEADER, profile_token=serializer.dumps('profile', salt=PROFILE_SALT),
+        token_minutes=PROFILE_TOKEN_SECONDS // 60)
+
+
+@app.route('/profiling', methods=['POST'])
+@token_required
+async def configure_profiling():
+    """Arms the profiler for the next requests (form: count, endpoint) or clears the slow statements."""
+    form_data = await request.form
+    if form_data.get('action') == 'clear':
+        slow_queries.clear()
+    else:
+        request_profiler.arm(form_data.get('count', 0, type=int), form_data.get('endpoint'))
+    return redirect(url_for('profiling'))
+
+
+@app.route('/profiling/<name>')
+@token_required
+async def profile_report(name):
+    """A saved profile: text report sorted by ?sort=, or the pstats file with ?download=1."""
+    path = request_profiler.path(name)
+    if path is None:
+        return jsonify({"message": "Профиль не найден"}), 404
+    if request.args.get('download'):
+        return await send_file(path, as_attachment=True, attachment_filename=name)
+    sort = request.args.get('sort')
+    report = request_profiler.report(name, sort if sort in PROFILE_SORTS else 'cumulative')
+    return report, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+
 if __name__ == '__main__':
     app.run(debug=False)
@@ -0,0 +1,409 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlsplit, urlencode, quote
+
+from benchmarks.run import configure
+
+
+ROUTES = ('index', 'category', 'search', 'file', 'upload')
+DEFAULT_MIX = 'index=40,category=25,search=20,file=13,upload=2'
+MAX_PAGE = 50
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест запущенного приложения: задержки p50/p95/p99 по маршрутам.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help="адрес запущенного сервера")
+    parser.add_argument('--rows', type=int, default=10_000,
+                        help="число книг в тестовой базе (та же база, с которой запущен сервер)")
+    parser.add_argument('--database-url', default=None,
+                        help="URL базы сервера (по умолчанию SQLite в benchmarks/.data, как у benchmarks.run)")
+    parser.add_argument('--seed-database', action='store_true', help="заполнить базу, если в ней другое число книг")
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f"доли маршрутов, по умолчанию {DEFAULT_MIX} (маршруты: {', '.join(ROUTES)})")
+    parser.add_argument('--concurrency', type=int, default=32, help="одновременных соединений")
+    parser.add_argument('--rps', type=float, default=None,
+                        help="целевая частота запросов (открытая модель); без неё каждое соединение "
+                             "шлёт запросы подряд")
+    parser.add_argument('--duration', type=float, default=30, help="длительность замера, секунд")
+    parser.add_argument('--warmup', type=float, default=5, help="разогрев перед замером, секунд")
+    parser.add_argument('--files', type=int, default=200,
+                        help="сколько файлов книг создать в files/ для маршрута file")
+    parser.add_argument('--file-size', type=int, default=256 * 1024, help="размер создаваемых файлов, байт")
+    parser.add_argument('--upload-size', type=int, default=64 * 1024, help="размер загружаемых файлов, байт")
+    parser.add_argument('--user', default=os.getenv('LOAD_USER'), help="пользователь для /upload")
+    parser.add_argument('--password', default=os.getenv('LOAD_PASSWORD'), help="пароль для /upload")
+    parser.add_argument('--timeout', type=float, default=30, help="таймаут одного запроса, секунд")
+    parser.add_argument('--random-seed', type=int, default=1, help="зерно выбора маршрутов и параметров")
+    parser.add_argument('--output', default='load_results.json', help="файл с результатами")
+    return parser.parse_args()
+
+
+def parse_mix(mix: str):
+    """``"index=40,search=20"`` -> {'index': 40.0, 'search': 20.0}."""
+    weights = {}
+    for part in filter(None, (item.strip() for item in mix.split(','))):
+        route, _, weight = part.partition('=')
+        if route not in ROUTES:
+            raise SystemExit(f"Неизвестный маршрут '{route}', допустимы: {', '.join(ROUTES)}")
+        weights[route] = float(weight or 1)
+    return {route: weight for route, weight in weights.items() if weight > 0}
+
+
+class HTTPError(Exception):
+    """Malformed or interrupted HTTP response."""
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection on plain asyncio streams.
+
+        Only what the load test needs: Content-Length and chunked bodies,
+        reconnect when the server closes the connection.
+        """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method: str, target: str, headers: dict = None, body: bytes = b''):
+        """Sends a request and reads the whole response.
+
+            Returns:
+                tuple: (status code, headers dict with lower-case names, body bytes).
+            """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        try:
+            await self.writer.drain()
+            status, response_headers, response_body = await self._read_response(method)
+        except (OSError, asyncio.IncompleteReadError, HTTPError):
+            await self.close()
+            raise
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, response_body
+
+    async def _read_response(self, method: str):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise HTTPError("соединение закрыто сервером")
+        parts = status_line.decode('latin-1').split(' ', 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise HTTPError(f"неверная строка статуса: {status_line!r}")
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        status = int(parts[1])
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return status, headers, b''
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                body += await self.reader.readexactly(size)
+                await self.reader.readexactly(2)
+            return status, headers, bytes(body)
+        if 'content-length' in headers:
+            return status, headers, await self.reader.readexactly(int(headers['content-length']))
+        body = await self.reader.read()
+        await self.close()
+        return status, headers, body
+
+
+def multipart(fields: dict, filename: str, content: bytes):
+    """multipart/form-data body of the upload form."""
+    boundary = f"----load{random.getrandbits(64):016x}"
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+             for name, value in fields.items()]
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 f'Content-Type: application/pdf\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return f"multipart/form-data; boundary={boundary}", b''.join(parts)
+
+
+class Traffic:
+    """Builds requests of every route from the seeded catalog."""
+
+    def __init__(self, context: dict, weights: dict, rng: random.Random, upload_size: int):
+        self.context = context
+        self.routes = list(weights)
+        self.weights = list(weights.values())
+        self.rng = rng
+        self.upload_size = upload_size
+
+    def next(self):
+        """Returns (route, method, target, headers, body) of a random request."""
+        route = self.rng.choices(self.routes, self.weights)[0]
+        return (route,) + getattr(self, route)()
+
+    def _page(self, pages: int):
+        # Most visitors stay on the first pages.
+        return min(pages, MAX_PAGE, 1 + int(self.rng.expovariate(0.5)))
+
+    def index(self):
+        query = urlencode({'page': self._page(self.context['pages'])})
+        return 'GET', f"/?{query}", {}, b''
+
+    def category(self):
+        name = self.rng.choice(self.context['categories'])
+        query = urlencode({'name': name, 'link': self.rng.choice(('title', 'autor', 'date_created')),
+                           'page': self._page(self.context['category_pages'].get(name, 1))})
+        return 'GET', f"/select_category?{query}", {}, b''
+
+    def search(self):
+        query = urlencode({'search': self.rng.choice(self.context['words']),
+                           'search_type': self.rng.choice(('all', 'title', 'author'))})
+        return 'GET', f"/search?{query}", {}, b''
+
+    def file(self):
+        return 'GET', f"/files/{quote(self.rng.choice(self.context['files']))}", {}, b''
+
+    def upload(self):
+        content = b'%PDF-1.4\n' + self.rng.randbytes(self.upload_size)
+        content_type, body = multipart({'title': f"Нагрузка {self.rng.getrandbits(32):08x}",
+                                        'author': 'Нагрузочный тест', 'category': 'нагрузка',
+                                        'description': ''}, 'load.pdf', content)
+        return 'POST', '/upload', {'Content-Type': content_type, 'Cookie': self.context['cookie']}, body
+
+
+class Recorder:
+    """Latencies and outcomes per route, counted only inside the measurement window."""
+
+    def __init__(self):
+        self.timings = {}
+        self.statuses = {}
+        self.errors = {}
+        self.window = None
+
+    def record(self, route: str, started: float, finished: float, status=None, error=None):
+        if self.window is None or not self.window[0] <= started < self.window[1]:
+            return
+        self.timings.setdefault(route, []).append(finished - started)
+        if error is not None:
+            self.errors.setdefault(route, {}).setdefault(error, 0)
+            self.errors[route][error] += 1
+        else:
+            counts = self.statuses.setdefault(route, {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+
+    def report(self, duration: float):
+        routes = {}
+        for route, timings in sorted(self.timings.items()):
+            ordered = sorted(timings)
+            failed = sum(self.errors.get(route, {}).values()) + sum(
+                count for status, count in self.statuses.get(route, {}).items() if int(status) >= 400)
+            routes[route] = {
+                'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+                'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+                'min_ms': round(ordered[0] * 1000, 3),
+                'max_ms': round(ordered[-1] * 1000, 3),
+                'requests': len(ordered),
+                'throughput_rps': round(len(ordered) / duration, 2),
+                'error_rate': round(failed / len(ordered), 4),
+                'statuses': self.statuses.get(route, {}),
+                'errors': self.errors.get(route, {}),
+            }
+        total = sum(route['requests'] for route in routes.values())
+        failed = sum(route['requests'] * route['error_rate'] for route in routes.values())
+        return {'routes': routes, 'requests': total, 'throughput_rps': round(total / duration, 2),
+                'error_rate': round(failed / total, 4) if total else 0.0}
+
+
+def percentile(ordered, fraction: float):
+    """Nearest-rank percentile of a sorted list."""
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+async def send(connection: Connection, request, recorder: Recorder, timeout: float, started: float = None):
+    route, method, target, headers, body = request
+    started = time.perf_counter() if started is None else started
+    try:
+        status, _, _ = await asyncio.wait_for(connection.request(method, target, headers, body), timeout)
+    except asyncio.TimeoutError:
+        await connection.close()
+        recorder.record(route, started, time.perf_counter(), error='timeout')
+    except (OSError, asyncio.IncompleteReadError, HTTPError) as e:
+        recorder.record(route, started, time.perf_counter(), error=type(e).__name__)
+    else:
+        recorder.record(route, started, time.perf_counter(), status=status)
+
+
+async def closed_loop(connections, traffic: Traffic, recorder: Recorder, until: float, timeout: float):
+    """Every connection sends its next request as soon as the previous one is answered."""
+    async def worker(connection):
+        while time.perf_counter() < until:
+            await send(connection, traffic.next(), recorder, timeout)
+    await asyncio.gather(*(worker(connection) for connection in connections))
+
+
+async def open_loop(connections, traffic: Traffic, recorder: Recorder, until: float, timeout: float,
+                    rps: float):
+    """Requests arrive at ``rps`` whatever the server does (Poisson arrivals).
+
+        Latency is measured from the scheduled arrival, so time spent waiting for
+        a free connection counts: a slow server cannot hide its backlog
+        (no coordinated omission).
+        """
+    idle = asyncio.Queue()
+    for connection in connections:
+        idle.put_nowait(connection)
+    pending = set()
+
+    async def one(request, scheduled):
+        connection = await idle.get()
+        try:
+            await send(connection, request, recorder, timeout, scheduled)
+        finally:
+            idle.put_nowait(connection)
+
+    scheduled = time.perf_counter()
+    while scheduled < until:
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        task = asyncio.create_task(one(traffic.next(), scheduled))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        scheduled += traffic.rng.expovariate(rps)
+    await asyncio.gather(*pending)
+
+
+async def prepare(args):
+    """Reads the catalog shape from the server's database and creates files for the file route.
+
+        Returns:
+            dict: Targets for Traffic (categories, page counts, words, file paths).
+        """
+    from benchmarks import sqlite_compat  # noqa: F401  MATCH ... AGAINST on SQLite
+    from benchmarks.seed import seed, WORDS
+    from sqlalchemy import select
+    from shemas.database import DBook
+    from shemas.repository import Repo, engine, new_session
+    from services.storage import UPLOAD_FOLDER
+
+    try:
+        if args.seed_database and await seed(engine, args.rows):
+            print(f"База заполнена: {args.rows} строк", file=sys.stderr)
+        categories = list(await Repo.category())
+        sizes = {name: await Repo.count_books(name) for name in categories}
+        async with new_session() as session:
+            paths = (await session.execute(
+                select(DBook.hashed).order_by(DBook.id.desc()).limit(args.files))).scalars().all()
+        total = await Repo.count_books()
+    finally:
+        await engine.dispose()
+
+    def create_files():
+        for path in paths:
+            full_path = os.path.join(UPLOAD_FOLDER, path)
+            if not os.path.exists(full_path):
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, 'wb') as f:
+                    f.write(os.urandom(args.file_size))
+
+    await asyncio.to_thread(create_files)
+    return {'categories': categories or [''], 'words': list(WORDS), 'files': paths,
+            'pages': max(1, -(-total // 20)),
+            'category_pages': {name: max(1, -(-size // 20)) for name, size in sizes.items()}}
+
+
+async def login(connection: Connection, user: str, password: str):
+    """Logs in through /login, returns the Cookie header value with the token."""
+    body = urlencode({'user': user, 'password': password}).encode()
+    status, headers, _ = await connection.request(
+        'POST', '/login', {'Content-Type': 'application/x-www-form-urlencoded'}, body)
+    cookie = headers.get('set-cookie', '')
+    if status >= 400 or not cookie.startswith('token='):
+        return None
+    return cookie.split(';', 1)[0]
+
+
+async def run(args, weights: dict):
+    url = urlsplit(args.url)
+    host, port = url.hostname or '127.0.0.1', url.port or 80
+    context = await prepare(args)
+    if not context['files']:
+        weights.pop('file', None)
+    if 'upload' in weights:
+        context['cookie'] = None
+        if args.user and args.password:
+            context['cookie'] = await login(Connection(host, port), args.user, args.password)
+        if context['cookie'] is None:
+            print("Маршрут upload пропущен: нужен пользователь (--user/--password или LOAD_USER/LOAD_PASSWORD)",
+                  file=sys.stderr)
+            weights.pop('upload')
+    if not weights:
+        raise SystemExit("Нет маршрутов для нагрузки")
+
+    traffic = Traffic(context, weights, random.Random(args.random_seed), args.upload_size)
+    recorder = Recorder()
+    connections = [Connection(host, port) for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    recorder.window = (started + args.warmup, started + args.warmup + args.duration)
+    until = recorder.window[1]
+    try:
+        if args.rps:
+            await open_loop(connections, traffic, recorder, until, args.timeout, args.rps)
+        else:
+            await closed_loop(connections, traffic, recorder, until, args.timeout)
+    finally:
+        await asyncio.gather(*(connection.close() for connection in connections))
+    return recorder.report(args.duration), weights
+
+
+def main():
+    args = parse_args()
+    configure(args)
+    weights = parse_mix(args.mix)
+    results, weights = asyncio.run(run(args, weights))
+    report = {
+        'url': args.url,
+        'rows': args.rows,
+        'mix': weights,
+        'concurrency': args.concurrency,
+        'target_rps': args.rps,
+        'duration_s': args.duration,
+        'python': platform.python_version(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        **results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"{'маршрут':<10} {'запросов':>9} {'rps':>8} {'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9} {'ошибки':>7}")
+    for route, stats in results['routes'].items():
+        print(f"{route:<10} {stats['requests']:>9} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['error_rate']:>7.2%}")
+    print(f"Всего: {results['requests']} запросов, {results['throughput_rps']:.1f} rps, "
+          f"ошибок {results['error_rate']:.2%}; подробности в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, func
+from shemas.database import Model, DBook, DBookCount
+
+
+SEED = 20240101
+BATCH_SIZE = 10_000
+CATEGORIES = ('проза', 'поэзия', 'история', 'философия', 'математика', 'физика', 'химия',
+              'биология', 'медицина', 'экономика', 'право', 'психология', 'педагогика',
+              'искусство', 'музыка', 'техника', 'программирование', 'география', 'языки', 'детская')
+WORDS = ('война', 'мир', 'история', 'теория', 'практика', 'основы', 'введение', 'курс', 'анализ',
+         'система', 'метод', 'природа', 'человек', 'общество', 'время', 'память', 'город', 'море',
+         'жизнь', 'наука', 'искусство', 'язык', 'дорога', 'свет', 'огонь', 'земля', 'небо', 'сила',
+         'право', 'закон', 'музыка', 'книга', 'слово', 'мысль', 'путь', 'дом', 'сад', 'лес', 'река')
+SURNAMES = ('Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов',
+            'Михайлов', 'Новиков', 'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов',
+            'Егоров', 'Павлов', 'Козлов', 'Степанов', 'Николаев', 'Орлов', 'Андреев', 'Макаров')
+INITIALS = 'АБВГДЕИКЛМНОПРСТ'
+
+
+def book_rows(count: int, seed: int = SEED):
+    """Yields ``count`` deterministic DBook rows in batches of BATCH_SIZE.
+
+        Categories follow a skewed distribution (the first ones are much larger),
+        so per-category listings are measured on both big and small categories.
+        """
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(len(CATEGORIES))]
+    start = datetime(2021, 1, 1)
+    batch = []
+    for i in range(count):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).capitalize()
+        author = f"{rng.choice(INITIALS)}. {rng.choice(INITIALS)}. {rng.choice(SURNAMES)}"
+        digest = f"{rng.getrandbits(256):064x}"
+        created = start + timedelta(seconds=i * 90 + rng.randint(0, 60))
+        batch.append({
+            'title': title[:100],
+            'autor': author,
+            'category': rng.choices(CATEGORIES, weights)[0],
+            'describe': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 20))),
+            'hashed': f"{created:%Y/%m/%d}/{title[:40]}_{digest}.pdf",
+            'date_created': created,
+        })
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def seed(engine, rows: int):
+    """Creates the schema and fills it with ``rows`` books, unless it already holds exactly that many.
+
+        Returns:
+            bool: True if the database was (re)seeded.
+        """
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.create_all)
+        existing = (await conn.execute(select(func.count()).select_from(DBook))).scalar_one()
+    if existing == rows:
+        return False
+    async with engine.begin() as conn:
+        await conn.execute(delete(DBook))
+        await conn.execute(delete(DBookCount))
+        for batch in book_rows(rows):
+            await conn.execute(insert(DBook), batch)
+        counts = (await conn.execute(
+            select(DBook.category, func.count()).group_by(DBook.category))).all()
+        await conn.execute(insert(DBookCount), [
+            {'scope': 'category', 'category': category, 'total': total} for category, total in counts]
+            + [{'scope': 'total', 'category': '', 'total': rows}])
+    return True
@@ -0,0 +1,22 @@
+import re
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.ext.compiler import compiles
+
+
+BOOLEAN_TERM = re.compile(r'\+"([^"]+)"|\+([^\s*]+)\*?')
+
+
+@compiles(match, 'sqlite')
+def _match_as_like(element, compiler, **kw):
+    """Renders MATCH ... AGAINST (boolean mode) as LIKE on the SQLite stand-in.
+
+        Every mandatory term of the expression built by shemas.search becomes
+        ``(col1 LIKE '%term%' OR col2 LIKE ...)``, AND-ed together. The result is
+        a 0/1 score, enough for the search queries to run; the timings are those
+        of a table scan, not of a full-text index.
+        """
+    columns = element.left.clauses
+    terms = [phrase or word for phrase, word in BOOLEAN_TERM.findall(element.right.value)]
+    condition = and_(*(or_(*(column.like(f'%{term}%') for column in columns)) for term in terms))
+    return compiler.process(condition, **kw)
@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from dotenv import load_dotenv
+from shemas.repository import Repo, engine
+from services.storage import ALLOWED_EXTENSIONS, copy_into_place, remove_file, layout, file_digest
+load_dotenv()
+
+CHECKPOINT_NAME = '.bulk_import.checkpoint'
+DEFAULT_CATEGORY = 'без категории'
+COPY_CONCURRENCY = 8
+
+
+def scan(root: str):
+    """Yields paths (relative to root) of importable files in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for name in sorted(filenames):
+            if name.startswith('.') or '.' not in name:
+                continue
+            if name.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS:
+                yield os.path.relpath(os.path.join(dirpath, name), root)
+
+
+class Checkpoint:
+    """Append-only list of imported files, fsynced after every committed batch."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = {line.rstrip('\n') for line in f if line.strip()}
+
+    def add(self, relative_paths):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.writelines(f"{path}\n" for path in relative_paths)
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(relative_paths)
+
+
+class Progress:
+    """Single-line progress display on stderr."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.imported = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    def render(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.imported / elapsed if elapsed else 0
+        left = (self.total - self.imported - self.failed) / rate if rate else 0
+        sys.stderr.write(f"\r{self.imported}/{self.total} файлов, дубликатов {self.duplicates}, "
+                         f"ошибок {self.failed}, {rate:.0f} файл/с, осталось ~{left:.0f} с   ")
+        sys.stderr.flush()
+
+
+def book_items(relative_path: str, args, now):
+    """Book metadata derived from the file location."""
+    parts = relative_path.split(os.sep)
+    title = os.path.splitext(parts[-1])[0][:100]
+    category = args.category or (parts[0] if len(parts) > 1 else DEFAULT_CATEGORY)
+    return {'title': title, 'autor': args.author, 'category': category[:100],
+            'describe': '', 'date_created': now}
+
+
+async def hash_batch(pool, root: str, batch, progress: Progress):
+    """Hashes a batch of files in the process pool, skipping unreadable ones."""
+    loop = asyncio.get_running_loop()
+    futures = [loop.run_in_executor(pool, file_digest, os.path.join(root, path)) for path in batch]
+    hashed = []
+    for path, result in zip(batch, await asyncio.gather(*futures, return_exceptions=True)):
+        if isinstance(result, Exception):
+            progress.failed += 1
+            print(f"\nНе удалось прочитать {path}: {result}", file=sys.stderr)
+            continue
+        hashed.append((path, *result))
+    return hashed
+
+
+async def import_batch(root: str, hashed, args, progress: Progress):
+    """Copies new contents into the store and inserts the batch metadata."""
+    now = datetime.now()
+    known = await Repo.blob_paths({digest for _, digest, _ in hashed})
+    books = []
+    copies = {}
+    for path, digest, size in hashed:
+        items = book_items(path, args, now)
+        if digest not in known and digest not in copies:
+            extension = path.rsplit('.', 1)[1].lower()
+            copies[digest] = (path, layout.path(digest, extension, now, items['title']))
+        else:
+            progress.duplicates += 1
+        items['hashed'] = known.get(digest) or copies[digest][1]
+        books.append((items, digest, size))
+
+    semaphore = asyncio.Semaphore(COPY_CONCURRENCY)
+
+    async def copy(source, target):
+        async with semaphore:
+            await copy_into_place(os.path.join(root, source), target)
+
+    await asyncio.gather(*(copy(source, target) for source, target in copies.values()))
+    paths = await Repo.insert_books(books)
+    for digest, (_, target) in copies.items():
+        if paths[digest] != target:
+            await remove_file(target)
+    progress.imported += len(books)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Массовый импорт документов из каталога.")
+    parser.add_argument('directory', help="каталог с документами")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="число процессов для хеширования")
+    parser.add_argument('--batch-size', type=int, default=500, help="строк в одной вставке")
+    parser.add_argument('--category', default=None,
+                        help="категория (по умолчанию имя подкаталога верхнего уровня)")
+    parser.add_argument('--author', default='', help="автор для всех файлов")
+    parser.add_argument('--checkpoint', default=None,
+                        help=f"файл контрольной точки (по умолчанию <directory>/{CHECKPOINT_NAME})")
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.directory)
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(root, CHECKPOINT_NAME))
+    pending = [path for path in scan(root) if path not in checkpoint.done]
+    print(f"Найдено файлов: {len(pending)} (уже импортировано: {len(checkpoint.done)})")
+    batches = [pending[i:i + args.batch_size] for i in range(0, len(pending), args.batch_size)]
+    progress = Progress(len(pending))
+
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            next_hash = asyncio.ensure_future(hash_batch(pool, root, batches[0], progress)) if batches else None
+            for i in range(len(batches)):
+                hashed = await next_hash
+                if i + 1 < len(batches):
+                    next_hash = asyncio.ensure_future(hash_batch(pool, root, batches[i + 1], progress))
+                await import_batch(root, hashed, args, progress)
+                checkpoint.add([path for path, _, _ in hashed])
+                progress.render()
+    finally:
+        await engine.dispose()
+    print(f"\nИмпортировано: {progress.imported}, дубликатов: {progress.duplicates}, "
+          f"ошибок: {progress.failed}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from dotenv import load_dotenv
+from shemas.database import DBook
+from shemas.pagination import SORT_FIELDS, keyset_query, anchor_query
+from shemas.queries import (
+    TOTAL_SCOPE, CATEGORY_SCOPE, VERSION_SCOPE, TERM_COLUMNS, export_query, category_query,
+    book_count_query, term_query, stored_counts_query, category_counts_query, redirect_query,
+    redirects_to_query, blob_paths_query, release_blobs_query, referenced_blobs_query,
+    referenced_books_query, books_at_path_query, unreferenced_blobs_query, drop_blobs_query,
+    repoint_books_query, blobs_after_query, books_after_query, books_without_blob_query,
+    issues_at_query, resolve_issues_query, open_issues_count_query, storage_issues_query,
+    books_at_paths_query, claim_text_query, text_attempts_query, reset_text_query,
+    missing_text_query, user_query, job_query, queued_jobs_query, reset_jobs_query)
+from shemas.repository import engine
+from shemas.search import search_query, count_query, fuzzy_query, fuzzy_count_query
+load_dotenv()
+
+PER_PAGE = 20
+# Statements that read a whole table by design: the counters (a handful of
+# rows) and the one-off pass queueing text extraction for blobs without it.
+FULL_SCANS = {"Repo.reconcile_counts stored", "Repo.queue_missing_text"}
+
+
+def query_shapes(sample):
+    """Every statement shape Repo issues, with representative parameters.
+
+        The statements come from the builders Repo itself calls (shemas.queries,
+        shemas.pagination, shemas.search), so what is explained here is what runs.
+
+        Args:
+            sample: A DBook row used for filter values and cursor keys.
+
+        Returns:
+            list: (name, statement, filesort allowed) tuples. Filesort is only
+                accepted where the order cannot come from a B-tree: relevance
+                ranking of full-text matches, the index merge behind fuzzy
+                search lookups, the per-value counts of suggest_terms and the
+                one-off page anchor pass.
+        """
+    category = sample.category if sample else 'category'
+    word = (sample.title.split() or ['книга'])[0] if sample and sample.title else 'книга'
+    path = sample.hashed if sample else 'x'
+    digest = sample.file_hash if sample and sample.file_hash else '0' * 64
+    fuzzy_sample = {('title', sample.title if sample else 'x'): 1.0,
+                    ('author', sample.autor if sample else 'x'): 0.5}
+    stale = datetime.now() - timedelta(hours=1)
+    shapes = [
+        ("Repo.category", category_query(), False),
+        ("Repo.count_books", book_count_query(TOTAL_SCOPE), False),
+        ("Repo.count_books by category", book_count_query(CATEGORY_SCOPE, category), False),
+        ("Repo.catalog_version", book_count_query(VERSION_SCOPE), False),
+        ("Repo.reconcile_counts stored", stored_counts_query(), False),
+        ("Repo.reconcile_counts actual", category_counts_query(), False),
+        ("Repo.sorted_recent first page", keyset_query(DBook.id, PER_PAGE)[0], False),
+        ("Repo.page_anchors main", anchor_query(DBook.id, PER_PAGE), True),
+    ]
+    shapes += [(f"Repo.suggest_terms {kind}", term_query(column), True) for kind, column in TERM_COLUMNS]
+    if sample is not None:
+        shapes.append(("Repo.sorted_recent next page",
+                       keyset_query(DBook.id, PER_PAGE, ((sample.id, sample.id), 'after'))[0], False))
+    for link in ("id", "title", "autor", "category", "date_created"):
+        field = SORT_FIELDS[link]
+        shapes.append((f"Repo.all_query by {link}", keyset_query(field, PER_PAGE, None, category)[0], False))
+        if sample is not None:
+            key = (getattr(sample, field.key), sample.id)
+            shapes.append((f"Repo.all_query by {link} next page",
+                           keyset_query(field, PER_PAGE, (key, 'after'), category)[0], False))
+            shapes.append((f"Repo.all_query by {link} previous page",
+                           keyset_query(field, PER_PAGE, (key, 'before'), category)[0], False))
+        shapes.append((f"Repo.page_anchors by {link}", anchor_query(field, PER_PAGE, category), True))
+    for search_type in ("all", "title", "author", "category", "content"):
+        shapes.append((f"Repo.search_book {search_type}", search_query(word, search_type, 1, PER_PAGE), True))
+        shapes.append((f"Repo.count_search {search_type}", count_query(word, search_type), False))
+    shapes += [
+        ("Repo.stream_books by category", export_query(category=category), False),
+        ("Repo.stream_books by author", export_query(author=sample.autor if sample else ''), False),
+        ("Repo.stream_books by date",
+         export_query(date_from=datetime(2024, 1, 1), date_to=datetime(2024, 2, 1)), False),
+        ("Repo.books_by_values", fuzzy_query(fuzzy_sample, 1, PER_PAGE), True),
+        ("Repo.count_by_values", fuzzy_count_query(fuzzy_sample), False),
+        ("Repo.redirect_path", redirect_query(path), False),
+        ("Repo._record_redirect", redirects_to_query(path, path, stale), False),
+        ("Repo.blob_path", blob_paths_query([digest]), False),
+        ("Repo.blob_paths", blob_paths_query([digest, '1' * 64]), False),
+        ("Repo._release_blobs", release_blobs_query([digest]), False),
+        ("Repo.referenced_paths blobs", referenced_blobs_query([path, 'y']), False),
+        ("Repo.referenced_paths books", referenced_books_query([path, 'y']), False),
+        ("Repo.adopt_blob books at path", books_at_path_query(path), False),
+        ("Repo.unreferenced_blobs", unreferenced_blobs_query(0, PER_PAGE), False),
+        ("Repo.drop_blobs", drop_blobs_query([1, 2]), False),
+        ("Repo.move_blobs books", repoint_books_query(digest, path), False),
+        ("Repo.blobs_after", blobs_after_query(0, PER_PAGE), False),
+        ("Repo.books_after", books_after_query(0, PER_PAGE), False),
+        ("Repo.books_without_blob", books_without_blob_query(0, PER_PAGE), False),
+        ("Repo.record_issues", issues_at_query([path]), False),
+        ("Repo.resolve_issues", resolve_issues_query([path], ('missing',), stale), False),
+        ("Repo.storage_issues open count", open_issues_count_query(), False),
+        ("Repo.storage_issues", storage_issues_query(False, 500), False),
+        ("Repo.storage_issues resolved", storage_issues_query(True, 500), False),
+        ("Repo.storage_issues books", books_at_paths_query([path]), False),
+        ("Repo.claim_text_jobs", claim_text_query(20), False),
+        ("Repo.fail_text", text_attempts_query(digest), False),
+        ("Repo.reset_text_jobs", reset_text_query(stale), False),
+        ("Repo.queue_missing_text", missing_text_query(stale), False),
+        ("Repo.select_user", user_query('user', 'x'), False),
+        ("Repo.get_job", job_query(1), False),
+        ("Repo.queued_jobs", queued_jobs_query(PER_PAGE), False),
+        ("Repo.queued_job", queued_jobs_query(1, 'extract_text'), False),
+        ("Repo.reset_jobs", reset_jobs_query(stale), False),
+    ]
+    return shapes
+
+
+async def explain(conn, statement):
+    """Runs EXPLAIN for a statement and returns the plan rows as dicts."""
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup or ())
+    result = await conn.exec_driver_sql("EXPLAIN " + str(compiled), params)
+    return [dict(row._mapping) for row in result]
+
+
+def problems(plan, allow_filesort: bool, allow_full_scan: bool = False):
+    """Full scans and filesorts found in an EXPLAIN plan, unless allowed."""
+    found = []
+    for row in plan:
+        table = str(row.get('table') or '')
+        if table.startswith('<'):
+            continue
+        extra = str(row.get('Extra') or '')
+        if row.get('type') == 'ALL' and not allow_full_scan:
+            found.append(f"полный просмотр таблицы {table}")
+        if 'Using filesort' in extra and not allow_filesort:
+            found.append(f"filesort по {table}")
+    return found
+
+
+async def main():
+    failed = 0
+    try:
+        async with engine.connect() as conn:
+            sample = (await conn.execute(select(DBook).order_by(DBook.id.desc()).limit(1))).first()
+            if sample is None:
+                print("Таблица book пуста: планы на пустой таблице не показательны.")
+            for name, statement, allow_filesort in query_shapes(sample):
+                plan = await explain(conn, statement)
+                found = problems(plan, allow_filesort, name in FULL_SCANS)
+                keys = ', '.join(str(row.get('key')) for row in plan)
+                if found:
+                    failed += 1
+                    print(f"FAIL {name}: {'; '.join(found)} (key: {keys})")
+                else:
+                    print(f"ok   {name} (key: {keys})")
+    finally:
+        await engine.dispose()
+    if failed:
+        print(f"\nЗапросов без подходящего индекса: {failed}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
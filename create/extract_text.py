@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import os
+from dotenv import load_dotenv
+from shemas.repository import Repo, engine
+from services.extraction import TextExtractor, EXTRACT_WORKERS, EXTRACT_TIMEOUT
+from services.storage import UPLOAD_FOLDER, remove_file, file_digest
+load_dotenv()
+
+BATCH_SIZE = 200
+
+
+async def adopt_legacy_books():
+    """Hashes files of books stored before content addressing and registers their blobs.
+
+        Returns:
+            int: Number of books attached to the blob store.
+        """
+    adopted = 0
+    last_id = 0
+    while True:
+        batch = await Repo.books_without_blob(BATCH_SIZE, last_id)
+        if not batch:
+            return adopted
+        for book_id, path in batch:
+            last_id = book_id
+            try:
+                digest, size = await asyncio.to_thread(file_digest, os.path.join(UPLOAD_FOLDER, path))
+            except OSError as e:
+                print(f"Файл {path} (ID {book_id}) недоступен: {e}")
+                continue
+            orphan = await Repo.adopt_blob(book_id, digest, size)
+            if orphan is not None:
+                await remove_file(orphan)
+            adopted += 1
+        print(f"Обработано книг без хеша: {adopted}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Извлечение текста из сохранённых файлов для поиска.")
+    parser.add_argument('--workers', type=int, default=EXTRACT_WORKERS, help="число процессов")
+    parser.add_argument('--timeout', type=int, default=EXTRACT_TIMEOUT, help="лимит секунд на документ")
+    parser.add_argument('--skip-adopt', action='store_true', help="не хешировать старые записи без file_hash")
+    args = parser.parse_args()
+
+    if not args.skip_adopt:
+        await adopt_legacy_books()
+    queued = await Repo.queue_missing_text()
+    print(f"Поставлено в очередь: {queued}")
+    await Repo.reset_text_jobs()
+
+    extractor = TextExtractor(workers=args.workers, timeout=args.timeout)
+    try:
+        done = await extractor.run_pending()
+        print(f"Обработано документов: {done}")
+    finally:
+        extractor.shutdown()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
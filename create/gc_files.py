@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+from dotenv import load_dotenv
+from shemas.repository import engine
+from services.gc import GarbageCollector, GC_GRACE_SECONDS
+load_dotenv()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Удаление файлов и записей blob, на которые ничего не ссылается.")
+    parser.add_argument('--batch-size', type=int, default=500, help="путей на один запрос к базе")
+    parser.add_argument('--rate', type=float, default=1000, help="не больше стольких файлов в секунду")
+    parser.add_argument('--max-files', type=int, default=None,
+                        help="проверить не больше стольких файлов за запуск (продолжение в следующий раз)")
+    parser.add_argument('--grace', type=int, default=GC_GRACE_SECONDS,
+                        help="не трогать файлы моложе стольких секунд")
+    parser.add_argument('--dry-run', action='store_true', help="только показать, что было бы удалено")
+    args = parser.parse_args()
+
+    collector = GarbageCollector(batch_size=args.batch_size, rate=args.rate, grace=args.grace,
+                                 dry_run=args.dry_run)
+    try:
+        blobs = await collector.sweep_blobs()
+        files = await collector.sweep_files(args.max_files)
+        temp = await collector.sweep_temp()
+    finally:
+        await engine.dispose()
+    verb = "к удалению" if args.dry_run else "удалено"
+    print(f"blob без книг: {verb} {blobs['removed']}")
+    print(f"Файлы: проверено {files['checked']}, {verb} {files['removed']}"
+          + ("" if files['finished'] else " (обход не завершён, следующий запуск продолжит)"))
+    print(f"Незавершённые загрузки: {verb} {temp['removed']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,12 +3,16 @@ import hashlib
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from shemas.database import DBook, DUser
-from sqlalchemy import text, select
+from sqlalchemy import text, select, inspect
+from alembic import command
+from alembic.config import Config
 from dotenv import load_dotenv
 from shemas.repository import engine
 import os
 load_dotenv()
 
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'alembic.ini')
+
 engine_base = create_async_engine(
     f"mysql+asyncmy://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
     f"@{os.getenv('DB_HOST')}/",
@@ -46,7 +50,12 @@ async def create_database_if_not_exists():
 
 
 async def create_tables():
-    """Creates DBook and DUser tables in the database.
+    """Creates the tables of a fresh database.
+
+        A fresh schema gets every table and is stamped with the latest Alembic
+        revision. An existing one is left untouched: creating the tables added
+        since would make ``alembic upgrade head`` fail on them, so it has to be
+        brought up to date by the migrations alone.
 
         Returns:
             None
@@ -57,9 +66,15 @@ async def create_tables():
         """
     try:
         async with engine.begin() as conn:
-            await conn.run_sync(DBook.metadata.create_all)
-            await conn.run_sync(DUser.metadata.create_all)
-            print("Таблицы успешно созданы.")
+            existed = await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(DBook.__tablename__))
+            if not existed:
+                await conn.run_sync(DBook.metadata.create_all)
+                print("Таблицы успешно созданы.")
+        if existed:
+            print("Схема уже существует, таблицы не создаются: выполните 'alembic upgrade head' "
+                  "(для базы без таблицы alembic_version сначала 'alembic stamp 0001').")
+        else:
+            command.stamp(Config(ALEMBIC_INI), 'head')
     except SQLAlchemyError as e:
         print(f"Произошла ошибка при создании таблиц: {e}")
     except Exception as e:
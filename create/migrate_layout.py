@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+from dotenv import load_dotenv
+from shemas.repository import engine, Repo
+from services.relayout import LayoutMigration
+from services.storage import LAYOUTS, STORAGE_LAYOUT
+load_dotenv()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Перенос файлов в другую схему хранения без остановки сайта.")
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), default=STORAGE_LAYOUT,
+                        help="целевая схема (по умолчанию STORAGE_LAYOUT)")
+    parser.add_argument('--batch-size', type=int, default=200, help="файлов на одну транзакцию")
+    parser.add_argument('--rate', type=float, default=200, help="не больше стольких файлов в секунду")
+    parser.add_argument('--max-blobs', type=int, default=None,
+                        help="проверить не больше стольких файлов за запуск (продолжение в следующий раз)")
+    parser.add_argument('--dry-run', action='store_true', help="только показать, что было бы перенесено")
+    args = parser.parse_args()
+
+    migration = LayoutMigration(args.layout, batch_size=args.batch_size, rate=args.rate,
+                                dry_run=args.dry_run)
+    try:
+        stats = await migration.run(args.max_blobs)
+        legacy = await Repo.books_without_blob(1)
+    finally:
+        await engine.dispose()
+    verb = "к переносу" if args.dry_run else "перенесено"
+    print(f"Файлы: проверено {stats['checked']}, {verb} {stats['moved']}, "
+          f"книг обновлено {stats['books']}, не найдено на диске {stats['missing']}"
+          + ("" if stats['finished'] else " (обход не завершён, следующий запуск продолжит)"))
+    if legacy:
+        print("Есть книги без file_hash: сначала выполните python -m create.extract_text (он добавит им хеш), затем повторите перенос")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
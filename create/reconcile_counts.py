@@ -0,0 +1,19 @@
+import asyncio
+from dotenv import load_dotenv
+from shemas.repository import Repo, engine
+load_dotenv()
+
+
+async def main():
+    try:
+        drift = await Repo.reconcile_counts()
+    finally:
+        await engine.dispose()
+    for scope, category, stored, actual in drift:
+        name = "всего" if scope == 'total' else category
+        print(f"{name}: было {stored}, стало {actual}")
+    print(f"Счётчики пересчитаны, расхождений: {len(drift)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
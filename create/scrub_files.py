@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import os
+from dotenv import load_dotenv
+from shemas.repository import engine
+from services.scrub import Scrubber, SCRUB_RATE, SCRUB_WORKERS
+load_dotenv()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Проверка хранимых файлов по их хешам.")
+    parser.add_argument('--rate-mb', type=float, default=SCRUB_RATE / 1024 / 1024,
+                        help="читать не больше стольких МБ в секунду (все потоки вместе)")
+    parser.add_argument('--workers', type=int, default=SCRUB_WORKERS, help="потоков хеширования")
+    parser.add_argument('--batch-size', type=int, default=100, help="записей на один запрос к базе")
+    parser.add_argument('--max-files', type=int, default=None,
+                        help="проверить не больше стольких файлов за запуск (продолжение в следующий раз)")
+    parser.add_argument('--loop', type=float, default=None, metavar='HOURS',
+                        help="работать постоянно, начиная новый проход через столько часов после предыдущего")
+    parser.add_argument('--nice', type=int, default=10, help="понизить приоритет процесса (0 — не менять)")
+    args = parser.parse_args()
+
+    if args.nice:
+        os.nice(args.nice)
+    scrubber = Scrubber(rate=args.rate_mb * 1024 * 1024, workers=args.workers, batch_size=args.batch_size)
+    try:
+        while True:
+            stats = await scrubber.run(args.max_files)
+            print(f"Проверено файлов: {stats['checked']}, прочитано {stats['bytes'] / 1024 / 1024:.1f} МБ; "
+                  f"нет на диске: {stats['missing']}, не совпал хеш: {stats['corrupt']}, "
+                  f"ошибки чтения: {stats['unreadable']}"
+                  + ("" if stats['finished'] else " (проход не завершён, следующий запуск продолжит)"))
+            if args.loop is None:
+                break
+            if stats['finished']:
+                await asyncio.sleep(args.loop * 3600)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,20 @@
+"""Hypercorn settings for production: hypercorn -c file:hypercorn_conf.py app:app"""
+import os
+from dotenv import load_dotenv
+
+
+load_dotenv()
+# Workers sign sessions and JWT tokens independently; without a shared key a token
+# issued by one worker is rejected by the others.
+if not os.getenv('SECRET_KEY'):
+    raise SystemExit("SECRET_KEY must be set (.env or environment) to run several workers")
+
+bind = os.getenv('BIND', '0.0.0.0:8000').split(',')
+workers = int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1))
+worker_class = 'asyncio'
+backlog = int(os.getenv('BACKLOG', 2048))
+keep_alive_timeout = float(os.getenv('KEEP_ALIVE_TIMEOUT', 5))
+# In-flight requests (uploads included) get this long to finish on restart.
+graceful_timeout = float(os.getenv('GRACEFUL_TIMEOUT', 30))
+accesslog = os.getenv('ACCESS_LOG', '-') or None
+errorlog = '-'
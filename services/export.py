@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+    'csv': 'text/csv',
+}
+
+
+def _record(row):
+    record = dict(row._mapping)
+    if isinstance(record.get('date_created'), datetime):
+        record['date_created'] = record['date_created'].isoformat()
+    return record
+
+
+async def render_ndjson(batches):
+    """One JSON object per line."""
+    async for batch in batches:
+        yield ''.join(json.dumps(_record(row), ensure_ascii=False) + '\n' for row in batch).encode()
+
+
+async def render_json(batches):
+    """A single JSON array, written element by element."""
+    yield b'['
+    first = True
+    async for batch in batches:
+        chunk = ','.join(json.dumps(_record(row), ensure_ascii=False) for row in batch)
+        if chunk:
+            yield (chunk if first else ',' + chunk).encode()
+            first = False
+    yield b']'
+
+
+async def render_csv(batches, columns):
+    """CSV with a header row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode()
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_record(row).values() for row in batch)
+        yield buffer.getvalue().encode()
+
+
+def render(export_format: str, batches, columns):
+    """Async iterator of encoded chunks for an export format."""
+    if export_format == 'csv':
+        return render_csv(batches, columns)
+    if export_format == 'json':
+        return render_json(batches)
+    return render_ndjson(batches)
@@ -0,0 +1,278 @@
+import asyncio
+import multiprocessing
+import os
+import resource
+import signal
+import time
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from shemas.repository import Repo
+from services.storage import UPLOAD_FOLDER
+
+
+EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+EXTRACT_TIMEOUT = int(os.getenv('EXTRACT_TIMEOUT', 120))
+EXTRACT_MEMORY = int(os.getenv('EXTRACT_MEMORY_MB', 2048)) * 1024 * 1024
+EXTRACT_TASKS_PER_CHILD = 50
+MAX_TEXT_CHARS = 1_000_000
+MAX_ATTEMPTS = 2
+BATCH_SIZE = 20
+# A claimed batch takes at most this long; rows running for longer were left by a dead process.
+STALE_SECONDS = BATCH_SIZE * (EXTRACT_TIMEOUT + 30)
+
+
+class ExtractionError(Exception):
+    """Raised when a document cannot be parsed within its limits."""
+
+
+class ExtractionInterrupted(Exception):
+    """Raised when the worker pool broke under a document because of another one.
+
+        Attributes:
+            suspect (bool): The document that broke the pool is not known; this
+                one must run alone next time to find out.
+        """
+
+    def __init__(self, message: str, suspect: bool = False):
+        super().__init__(message)
+        self.suspect = suspect
+
+
+_started = None
+
+
+def _limit_worker(memory: int, started):
+    """Pool initializer: caps the address space of the worker process.
+
+        ``started`` is the shared array _run writes execution start times to.
+        """
+    global _started
+    _started = started
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+
+def _run(slot: int, function, *args):
+    """Runs ``function`` in a pool process, first recording when it started in slot ``slot``."""
+    _started[slot] = time.time()
+    return function(*args)
+
+
+def extract_pdf_text(file_path: str, timeout: int):
+    """Extracts the text of every page of a PDF. Runs inside a pool process.
+
+        SIGALRM keeps its default action, so a document that is still parsing
+        after ``timeout`` seconds kills the worker even inside native code.
+
+        Args:
+            file_path (str): Absolute or working-directory relative path of the PDF.
+            timeout (int): Wall-clock limit in seconds.
+
+        Returns:
+            str: Extracted text, truncated to MAX_TEXT_CHARS.
+        """
+    signal.signal(signal.SIGALRM, signal.SIG_DFL)
+    signal.alarm(timeout)
+    try:
+        from spire.pdf import PdfDocument, PdfTextExtractor, PdfTextExtractOptions
+        document = PdfDocument()
+        document.LoadFromFile(file_path)
+        try:
+            parts = []
+            length = 0
+            options = PdfTextExtractOptions()
+            for i in range(document.Pages.Count):
+                text = PdfTextExtractor(document.Pages.get_Item(i)).ExtractText(options)
+                parts.append(text)
+                length += len(text)
+                if length >= MAX_TEXT_CHARS:
+                    break
+            return "\n".join(parts)[:MAX_TEXT_CHARS]
+        finally:
+            document.Close()
+    finally:
+        signal.alarm(0)
+
+
+class TextExtractor:
+    """Runs text extraction for pending DBookText rows in a process pool.
+
+        Progress lives in the book_text table (pending -> running -> done/failed),
+        so an interrupted run is picked up again by the next run_pending().
+
+        At most ``workers`` documents are submitted at a time, so a document
+        starts executing as soon as it is submitted and its timeout counts
+        execution only. A document that hits a limit kills its worker process
+        and breaks the pool for every document running beside it. Only the one
+        that ran out of time (or that ran alone) is charged the attempt. The
+        others go back to 'pending' uncharged. When the culprit cannot be told
+        apart (a memory or native crash with several documents running), all
+        of them become suspects and are retried one at a time.
+        """
+
+    def __init__(self, workers: int = EXTRACT_WORKERS, timeout: int = EXTRACT_TIMEOUT,
+                 memory: int = EXTRACT_MEMORY, function=extract_pdf_text):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory = memory
+        self.function = function
+        self._pool = None
+        self._lock = asyncio.Lock()
+        self._again = False
+        # max_tasks_per_child needs a non-fork start method; the start times are
+        # shared memory of the same context, handed to every worker at startup.
+        self._context = multiprocessing.get_context('spawn')
+        self._started = self._context.Array('d', workers, lock=False)
+        self._slots = asyncio.Semaphore(workers)
+        self._free = list(range(workers))
+        self._exclusive = asyncio.Lock()
+        self._running = {}
+        self._broken = {}
+        self._suspects = set()
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                             initializer=_limit_worker,
+                                             initargs=(self.memory, self._started),
+                                             max_tasks_per_child=EXTRACT_TASKS_PER_CHILD)
+        return self._pool
+
+    def _reset_pool(self, pool):
+        if self._pool is pool:
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @asynccontextmanager
+    async def _slot(self, alone: bool):
+        """A pool slot (its index), holding all of them when the document must run alone."""
+        count = self.workers if alone else 1
+        async with self._exclusive if alone else nullcontext():
+            for _ in range(count):
+                await self._slots.acquire()
+        slot = self._free.pop()
+        self._started[slot] = 0
+        try:
+            yield slot
+        finally:
+            self._free.append(slot)
+            for _ in range(count):
+                self._slots.release()
+
+    def _blame(self, pool, slot: int):
+        """Decides who broke ``pool``, from the documents running in it when it broke.
+
+            Every document has the same alarm, so when one runs out of time it is
+            the one that started executing first (start times come from the
+            workers, so waiting for a worker process to start does not count).
+
+            Raises:
+                ExtractionError: This document hit a limit.
+                ExtractionInterrupted: Another document did, or it cannot be told.
+            """
+        if pool not in self._broken:
+            now = time.time()
+            self._broken[pool] = {running: now - self._started[running] if self._started[running] else 0
+                                  for running in self._running[pool]}
+        elapsed = self._broken[pool]
+        oldest = max(elapsed, key=elapsed.get)
+        if elapsed[oldest] >= self.timeout - 1:
+            if slot == oldest:
+                raise ExtractionError("Превышен лимит времени")
+            raise ExtractionInterrupted("Обработчик остановлен из-за другого документа")
+        if len(elapsed) == 1:
+            raise ExtractionError("Обработчик остановлен: превышен лимит памяти или сбой разбора")
+        raise ExtractionInterrupted("Обработчик остановлен, виновник не определён", suspect=True)
+
+    async def extract(self, file_path: str, alone: bool = False):
+        """Extracts one document.
+
+            Args:
+                file_path (str): Path of the PDF.
+                alone (bool): Run with no other document in the pool.
+
+            Raises:
+                ExtractionError: The document hit a limit.
+                ExtractionInterrupted: Another document broke the pool under it.
+            """
+        loop = asyncio.get_running_loop()
+        async with self._slot(alone) as slot:
+            pool = self._get_pool()
+            running = self._running.setdefault(pool, set())
+            running.add(slot)
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(pool, _run, slot, self.function, file_path, self.timeout),
+                    self.timeout + 30)
+            except BrokenProcessPool:
+                self._reset_pool(pool)
+                self._blame(pool, slot)
+            except asyncio.TimeoutError:
+                self._reset_pool(pool)
+                raise ExtractionError("Превышен лимит времени")
+            finally:
+                running.discard(slot)
+                if not running:
+                    self._running.pop(pool, None)
+                    self._broken.pop(pool, None)
+
+    async def _process(self, digest: str, path: str):
+        if not path.lower().endswith('.pdf'):
+            await Repo.save_text(digest, None, status='skipped')
+            return
+        try:
+            text = await self.extract(os.path.join(UPLOAD_FOLDER, path), alone=digest in self._suspects)
+        except ImportError:
+            await Repo.fail_text(digest, "spire.pdf не установлен", MAX_ATTEMPTS)
+            return
+        except ExtractionInterrupted as e:
+            if e.suspect:
+                self._suspects.add(digest)
+            await Repo.release_text(digest)
+            return
+        except Exception as e:
+            self._suspects.discard(digest)
+            await Repo.fail_text(digest, str(e)[:500], MAX_ATTEMPTS)
+            return
+        self._suspects.discard(digest)
+        await Repo.save_text(digest, text)
+
+    async def run_pending(self, wait: bool = True):
+        """Processes pending rows batch by batch until none are left.
+
+            Rows a dead process left 'running' for longer than STALE_SECONDS are
+            taken back first; rows other live processes are working on are not.
+
+            Args:
+                wait (bool): If a pass is already running in this process, wait
+                    for it and run another one. With False the running pass is
+                    asked to look for new rows once more before it ends and the
+                    call returns at once (a job worker is not held up waiting).
+
+            Returns:
+                int: Number of documents processed.
+            """
+        if not wait and self._lock.locked():
+            self._again = True
+            return 0
+        done = 0
+        async with self._lock:
+            await Repo.reset_text_jobs(datetime.now() - timedelta(seconds=STALE_SECONDS))
+            while True:
+                self._again = False
+                batch = await Repo.claim_text_jobs(BATCH_SIZE)
+                if not batch:
+                    if self._again:
+                        continue
+                    return done
+                await asyncio.gather(*(self._process(digest, path) for digest, path in batch))
+                done += len(batch)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+text_extractor = TextExtractor()
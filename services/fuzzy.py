@@ -0,0 +1,165 @@
+import asyncio
+import os
+import re
+from array import array
+from math import ceil
+from shemas.repository import on_catalog_commit
+from services.suggest import KINDS
+
+
+FUZZY_THRESHOLD = float(os.getenv('FUZZY_THRESHOLD', 0.5))
+FUZZY_MAX_CANDIDATES = int(os.getenv('FUZZY_MAX_CANDIDATES', 20_000))
+CYRILLIC = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh',
+    'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+}
+TRANSLITERATION = str.maketrans(CYRILLIC)
+# Spellings that differ between transliteration systems, folded to one form:
+# Tolstoi/Tolstoj/Tolstoy, Chekhov/Chehov, Dostoevsky/Dostoevskiy, Sch/Sh.
+SPELLINGS = ((re.compile(r'(?:iy|ij|yj|yi|ii|j)\b'), 'y'), (re.compile(r'(?<=\w)i\b'), 'y'),
+             (re.compile(r'kh'), 'h'), (re.compile(r'w'), 'v'), (re.compile(r'x'), 'ks'),
+             (re.compile(r'ck'), 'k'), (re.compile(r'sch'), 'sh'), (re.compile(r'ph'), 'f'))
+NOT_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def latinize(text: str):
+    """Lower-case Latin form of a Cyrillic or Latin string, so both spellings compare equal."""
+    text = text.casefold().translate(TRANSLITERATION)
+    text = NOT_WORD.sub(' ', text)
+    for pattern, replacement in SPELLINGS:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+def _trigrams(latin: str):
+    grams = set()
+    for word in latin.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigrams(text: str):
+    """Trigrams of every word of the latinized text, padded like pg_trgm ("  w", " wo", "wor", "rd ")."""
+    return _trigrams(latinize(text))
+
+
+class FuzzyIndex:
+    """Trigram index of titles, authors and categories for typo-tolerant search.
+
+        Values are compared in a transliterated Latin form, so "Толстой",
+        "Tolstoy" and "Tolstoi" share their trigrams. The score of a value is the
+        share of the query's trigrams found in it (pg_trgm word_similarity), ties
+        broken by the share of all trigrams in common.
+
+        Candidates come from posting lists (trigram -> value ids). A value
+        sharing at least ``need`` of the query's ``n`` trigrams must contain one
+        of any ``n - need + 1`` of them, so only the rarest ones are read; the
+        work depends on how common the query's trigrams are, not on the catalog
+        size. Distinct values are indexed, not books, and book counts decide
+        when a value stops matching. Like SuggestIndex it is loaded at startup
+        and periodically by services.terms, from the same terms, and follows
+        commits of this process.
+
+        Args:
+            threshold (float): Minimum score of a match.
+            max_candidates (int): Upper bound on values scored per query.
+        """
+
+    def __init__(self, threshold: float = FUZZY_THRESHOLD, max_candidates: int = FUZZY_MAX_CANDIDATES):
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self._values = []
+        self._ids = {}
+        self._counts = array('I')
+        self._postings = {}
+        self.ready = False
+
+    @staticmethod
+    def _index(values, ids, counts, postings, kind: str, value: str, count: int):
+        value_id = len(values)
+        latin = latinize(value)
+        values.append((kind, value, latin))
+        ids[(kind, value)] = value_id
+        counts.append(count)
+        for gram in _trigrams(latin):
+            postings.setdefault(gram, array('I')).append(value_id)
+
+    def _build(self, terms):
+        values, ids, counts, postings = [], {}, array('I'), {}
+        for kind, value, count in terms:
+            self._index(values, ids, counts, postings, kind, value, count)
+        return values, ids, counts, postings
+
+    async def load(self, terms):
+        """Replaces the index with ``terms`` (see Repo.suggest_terms)."""
+        self._values, self._ids, self._counts, self._postings = await asyncio.to_thread(self._build, terms)
+        self.ready = True
+
+    def add(self, kind: str, value: str):
+        """Counts one more book with this value, indexing the value if it is new."""
+        if not value:
+            return
+        value_id = self._ids.get((kind, value))
+        if value_id is None:
+            self._index(self._values, self._ids, self._counts, self._postings, kind, value, 1)
+        else:
+            self._counts[value_id] += 1
+
+    def remove(self, kind: str, value: str):
+        """Counts one book less with this value; a value without books no longer matches."""
+        value_id = self._ids.get((kind, value))
+        if value_id is not None and self._counts[value_id] > 0:
+            self._counts[value_id] -= 1
+
+    def apply(self, added, removed):
+        """Catalog commit listener: counts inserted and deleted books."""
+        for books, change in ((added, self.add), (removed, self.remove)):
+            for book in books:
+                for kind, column in KINDS.items():
+                    change(kind, book[column])
+
+    def _candidates(self, grams, need: int):
+        lists = sorted((self._postings.get(gram, ()) for gram in grams), key=len)
+        candidates = set()
+        for postings in lists[:len(grams) - need + 1]:
+            candidates.update(postings)
+            if len(candidates) >= self.max_candidates:
+                break
+        return candidates
+
+    def search(self, query: str, kinds=tuple(KINDS), limit: int = 50):
+        """Values similar to ``query``.
+
+            Args:
+                query (str): Search string, Cyrillic or Latin, possibly misspelt.
+                kinds: Value kinds to consider ('title', 'author', 'category').
+                limit (int): Maximum number of values.
+
+            Returns:
+                list: (score, kind, value) tuples, best first.
+            """
+        grams = trigrams(query or '')
+        if not grams:
+            return []
+        need = max(1, ceil(self.threshold * len(grams)))
+        scored = []
+        for value_id in self._candidates(grams, need):
+            kind, value, latin = self._values[value_id]
+            if kind not in kinds or not self._counts[value_id]:
+                continue
+            value_grams = _trigrams(latin)
+            common = len(grams & value_grams)
+            if common >= need:
+                scored.append((common / len(grams), common / len(grams | value_grams), kind, value))
+        scored.sort(reverse=True)
+        return [(score, kind, value) for score, _, kind, value in scored[:limit]]
+
+    def stats(self):
+        return {"values": len(self._values), "trigrams": len(self._postings), "ready": self.ready}
+
+
+fuzzy_index = FuzzyIndex()
+on_catalog_commit(fuzzy_index.apply)
@@ -0,0 +1,193 @@
+import asyncio
+import os
+import time
+from itertools import islice
+from shemas.repository import Repo
+from services.storage import UPLOAD_FOLDER, TMP_FOLDER, _discard
+from services.resumable import RESUMABLE_FOLDER, RESUMABLE_EXPIRE_SECONDS
+
+
+GC_GRACE_SECONDS = int(os.getenv('GC_GRACE_SECONDS', 3600))
+STATE_NAME = '.gc_state'
+
+
+def _walk(root: str, after: str = None):
+    """Yields stored file paths (relative to root) in a stable order, resuming after ``after``.
+
+        Dot directories (.tmp) and dot files (.gc_state) are skipped.
+        """
+    resume = tuple(after.split('/')) if after else ()
+    for dirpath, dirnames, filenames in os.walk(root):
+        relative_dir = os.path.relpath(dirpath, root)
+        parts = () if relative_dir == '.' else tuple(relative_dir.split(os.sep))
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.')
+                             and parts + (d,) >= resume[:len(parts) + 1])
+        for name in sorted(filenames):
+            if not name.startswith('.') and parts + (name,) > resume:
+                yield '/'.join(parts + (name,))
+
+
+def _stale(root: str, relative_paths, grace: int):
+    """Keeps the paths whose files were last modified more than ``grace`` seconds ago.
+
+        The inode change time counts too: a new hard link keeps its source's
+        mtime, but linking updates st_ctime.
+        """
+    return [path for path in relative_paths if _untouched(os.path.join(root, path), time.time() - grace)]
+
+
+def _untouched(path: str, limit: float):
+    """True if the file exists and neither its contents nor its inode changed since ``limit``."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return max(stat.st_mtime, stat.st_ctime) < limit
+
+
+def _discard_untouched(root: str, relative_paths, limit: float):
+    """Unlinks the files untouched since ``limit``, each right after its check; returns them."""
+    removed = []
+    for path in relative_paths:
+        if _untouched(os.path.join(root, path), limit):
+            _discard(os.path.join(root, path))
+            removed.append(path)
+    return removed
+
+
+async def remove_released(relative_paths, since: float, root: str = UPLOAD_FOLDER):
+    """Removes the files of dropped books once their drop has committed.
+
+        The hashed layout gives the same content the same path, so a re-upload
+        of a dropped book's file may already have moved a new copy there. The
+        references are checked again after the commit and a file touched since
+        the drop started (``since``, a time.time() value) is left to sweep_files,
+        which removes it after the grace period if it is still unreferenced.
+
+        Returns:
+            list: Paths that were removed.
+        """
+    paths = sorted(set(relative_paths) - await Repo.referenced_paths(relative_paths))
+    return await asyncio.to_thread(_discard_untouched, root, paths, since)
+
+
+class GarbageCollector:
+    """Reclaims stored files and blobs nothing references any more.
+
+        Files are checked in batches against DBlob.path and DBook.hashed; only
+        files older than ``grace`` seconds are removed, so an upload whose ingest
+        job has not committed yet is never touched. The sweep is rate-limited
+        and incremental: the last checked path is saved after every batch and the
+        next run continues from there.
+
+        Args:
+            root (str): Root of the file store.
+            batch_size (int): Paths checked per database round trip.
+            rate (float): Maximum number of files checked per second.
+            grace (int): Minimum age in seconds of a file that may be removed.
+            dry_run (bool): Only report what would be removed.
+        """
+
+    def __init__(self, root: str = UPLOAD_FOLDER, batch_size: int = 500, rate: float = 1000,
+                 grace: int = GC_GRACE_SECONDS, dry_run: bool = False):
+        self.root = root
+        self.batch_size = batch_size
+        self.rate = rate
+        self.grace = grace
+        self.dry_run = dry_run
+        self.state_path = os.path.join(root, STATE_NAME)
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _save_state(self, last_path):
+        if last_path is None:
+            _discard(self.state_path)
+            return
+        tmp_path = self.state_path + '.part'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(last_path)
+        os.replace(tmp_path, self.state_path)
+
+    async def _unlink(self, relative_paths):
+        await asyncio.gather(*(asyncio.to_thread(_discard, os.path.join(self.root, path))
+                               for path in relative_paths))
+
+    async def _throttle(self, count: int, started: float):
+        await asyncio.sleep(max(0.0, count / self.rate - (time.monotonic() - started)))
+
+    async def sweep_files(self, max_files: int = None):
+        """Removes unreferenced files, continuing from the previous run.
+
+            Args:
+                max_files (int): Stop after checking this many files (None: whole tree).
+
+            Returns:
+                dict: Counters: checked, removed, and finished (whole tree walked).
+            """
+        stats = {'checked': 0, 'removed': 0, 'finished': False}
+        paths = _walk(self.root, await asyncio.to_thread(self._load_state))
+        while max_files is None or stats['checked'] < max_files:
+            started = time.monotonic()
+            size = self.batch_size if max_files is None else min(self.batch_size, max_files - stats['checked'])
+            batch = await asyncio.to_thread(lambda: list(islice(paths, size)))
+            if not batch:
+                stats['finished'] = True
+                await asyncio.to_thread(self._save_state, None)
+                break
+            candidates = await asyncio.to_thread(_stale, self.root, batch, self.grace)
+            orphans = sorted(set(candidates) - await Repo.referenced_paths(candidates))
+            if not self.dry_run:
+                await self._unlink(orphans)
+            stats['checked'] += len(batch)
+            stats['removed'] += len(orphans)
+            await asyncio.to_thread(self._save_state, batch[-1])
+            await self._throttle(len(batch), started)
+        return stats
+
+    async def sweep_blobs(self):
+        """Deletes blob rows no book points at, and their files.
+
+            Returns:
+                dict: Counters: removed.
+            """
+        stats = {'removed': 0}
+        after_id = 0
+        while True:
+            started = time.monotonic()
+            blobs = await Repo.unreferenced_blobs(self.batch_size, after_id)
+            if not blobs:
+                return stats
+            after_id = blobs[-1][0]
+            if self.dry_run:
+                stats['removed'] += len(blobs)
+            else:
+                paths = await Repo.drop_blobs([blob_id for blob_id, _ in blobs])
+                paths = sorted(set(paths) - await Repo.referenced_paths(paths))
+                await self._unlink(paths)
+                stats['removed'] += len(paths)
+            await self._throttle(len(blobs), started)
+
+    async def sweep_temp(self):
+        """Removes temp files of uploads that never completed.
+
+            Resumable uploads are kept for RESUMABLE_EXPIRE_SECONDS after their
+            last chunk, so a client can come back after a long break.
+
+            Returns:
+                dict: Counters: removed.
+            """
+        removed = 0
+        for folder, grace in ((TMP_FOLDER, self.grace),
+                              (RESUMABLE_FOLDER, max(self.grace, RESUMABLE_EXPIRE_SECONDS))):
+            folder = os.path.join(self.root, os.path.basename(folder))
+            names = await asyncio.to_thread(lambda: os.listdir(folder) if os.path.isdir(folder) else [])
+            stale = await asyncio.to_thread(_stale, folder, names, grace)
+            if not self.dry_run:
+                await asyncio.to_thread(lambda: [_discard(os.path.join(folder, name)) for name in stale])
+            removed += len(stale)
+        return {'removed': removed}
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from shemas import uow
+from shemas.repository import Repo, new_session
+
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', 100))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 5))
+# A running job whose heartbeat is older than this belongs to a dead process.
+JOB_STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', 300))
+MAX_ATTEMPTS = 3
+
+
+class Job:
+    """A running job as seen by its handler.
+
+        Attributes:
+            id (int): DJob id.
+            session (AsyncSession): Session whose transaction also marks the job done,
+                so the handler's database effects and the status change commit together.
+        """
+
+    def __init__(self, job_id: int, session):
+        self.id = job_id
+        self.session = session
+        self._after_commit = []
+
+    def after_commit(self, callback):
+        """Registers a coroutine function to run once the job's transaction is committed."""
+        self._after_commit.append(callback)
+
+
+class JobQueue:
+    """In-process job queue with a bounded worker pool, backed by the job table.
+
+        submit() stores the job before queueing its id, so a restart loses
+        nothing: a feeder loop loads queued jobs from the table whenever the
+        in-memory queue has room. Several worker processes can share the table:
+        start_job() lets only one of them run a job, running jobs send a
+        heartbeat, and only jobs whose heartbeat stopped for ``stale_after``
+        seconds (their process died) are returned to 'queued'.
+        The in-memory queue is bounded; full() lets request handlers push back
+        before accepting more work.
+        """
+
+    def __init__(self, workers: int = JOB_WORKERS, size: int = JOB_QUEUE_SIZE,
+                 poll_interval: float = JOB_POLL_INTERVAL, stale_after: float = JOB_STALE_SECONDS):
+        self.workers = workers
+        self.size = size
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.handlers = {}
+        self._queue = None
+        self._known = set()
+        self._tasks = []
+
+    def handler(self, kind: str):
+        """Decorator registering ``async def handler(job, **payload)`` for a job kind."""
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    def full(self):
+        """True if no more work should be accepted right now."""
+        return self._queue is not None and self._queue.full()
+
+    async def submit(self, kind: str, **payload):
+        """Durably queues a job and wakes a worker.
+
+            Inside a request the job row is committed together with everything
+            the request did so far.
+
+            Returns:
+                int: Job id (see /jobs/<id>).
+            """
+        job_id = await Repo.enqueue_job(kind, json.dumps(payload, ensure_ascii=False))
+        await uow.commit()
+        self._offer(job_id)
+        return job_id
+
+    async def submit_once(self, kind: str, **payload):
+        """Queues a job unless one of the same kind is still waiting to start.
+
+            For triggers whose handler does all outstanding work (extract_text):
+            a burst of submissions leaves one queued job instead of one per call.
+
+            Returns:
+                int: Id of the new or of the already queued job.
+            """
+        job_id = await Repo.queued_job(kind)
+        if job_id is not None:
+            return job_id
+        return await self.submit(kind, **payload)
+
+    def _offer(self, job_id: int):
+        if self._queue is None or job_id in self._known or self._queue.full():
+            return
+        self._known.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    async def start(self):
+        """Starts the workers and the feeder."""
+        self._queue = asyncio.Queue(maxsize=self.size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._feeder()))
+
+    async def stop(self):
+        """Cancels the workers; jobs they were running are requeued once their heartbeat is stale."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._known.clear()
+
+    async def _feeder(self):
+        while True:
+            try:
+                await Repo.reset_jobs(datetime.now() - timedelta(seconds=self.stale_after))
+            except Exception as e:
+                print("error", e)
+            free = self.size - self._queue.qsize()
+            if free > 0:
+                for job_id in await Repo.queued_jobs(free + len(self._known)):
+                    self._offer(job_id)
+            await asyncio.sleep(self.poll_interval)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print("error", e)
+            finally:
+                self._known.discard(job_id)
+                self._queue.task_done()
+
+    async def _run(self, job_id: int):
+        started = await Repo.start_job(job_id)
+        if started is None:
+            return
+        kind, payload = started
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            handler = self.handlers[kind]
+            async with new_session() as session:
+                async with session.begin():
+                    job = Job(job_id, session)
+                    result = await handler(job, **json.loads(payload))
+                    await Repo.finish_job(job_id, None if result is None else str(result)[:500],
+                                          session=session)
+        except Exception as e:
+            # Back to 'queued' until MAX_ATTEMPTS; the feeder retries it on its next pass.
+            await Repo.fail_job(job_id, f"{type(e).__name__}: {e}"[:500], MAX_ATTEMPTS)
+            return
+        finally:
+            heartbeat.cancel()
+        for callback in job._after_commit:
+            await callback()
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(self.stale_after / 3)
+            try:
+                await Repo.touch_job(job_id)
+            except Exception as e:
+                print("error", e)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,293 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from functools import wraps
+from inspect import iscoroutinefunction
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+SLOW_QUERY_BUFFER = int(os.getenv('SLOW_QUERY_BUFFER', 100))
+EXPLAINABLE = re.compile(r'\s*(SELECT|WITH|UPDATE|DELETE)\b', re.IGNORECASE)
+# Bind parameters of these methods are credentials and are never stored.
+REDACTED_QUERIES = {'Repo.select_user'}
+
+slow_query_log = logging.getLogger('library.slow_query')
+current_query = contextvars.ContextVar('current_query', default='other')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """Base class: a named family of time series keyed by label values."""
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(Metric):
+    """Value that can go up and down, optionally read from a callback at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self):
+        if self.callback is not None:
+            for labels, value in self.callback():
+                self.set(value, **labels)
+        lines = self.header()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram of observed values (seconds, bytes, ...)."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        lines = self.header()
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text exposition format."""
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+request_latency = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route.',
+    ('route', 'method', 'status')))
+query_latency = registry.register(Histogram(
+    'db_query_duration_seconds', 'SQL statement execution time, by Repo method.', ('query',)))
+pool_wait = registry.register(Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.'))
+upload_bytes = registry.register(Counter(
+    'upload_bytes_total', 'Bytes received through uploads.'))
+uploads = registry.register(Counter(
+    'uploads_total', 'Uploaded files, by outcome.', ('result',)))
+
+
+class SlowQueries:
+    """Ring buffer of the last slow statements issued by Repo methods.
+
+        Each entry keeps the statement, its bind parameters and its EXPLAIN
+        plan. The plan is fetched afterwards by a separate task on another
+        pooled connection, so the slow request itself is not delayed. At most
+        one EXPLAIN runs at a time; statements that go slow while it runs are
+        kept without a plan.
+
+        Args:
+            maxlen (int): Number of entries kept, the oldest are dropped.
+        """
+
+    def __init__(self, maxlen: int = SLOW_QUERY_BUFFER):
+        self._entries = deque(maxlen=maxlen)
+        self._explaining = False
+
+    def record(self, engine, tag: str, elapsed: float, statement: str, parameters, rows: int):
+        """Stores a slow statement and schedules its EXPLAIN."""
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'query': tag,
+            'duration_ms': round(elapsed * 1000, 2),
+            'statement': ' '.join(statement.split()),
+            'parameters': 'скрыты' if tag in REDACTED_QUERIES else repr(parameters)[:1000],
+            'rows': rows,
+            'plan': None,
+            'plan_error': None,
+        }
+        self._entries.appendleft(entry)
+        if not EXPLAINABLE.match(statement):
+            entry['plan_error'] = 'EXPLAIN не поддерживается для этого запроса'
+        elif self._explaining:
+            entry['plan_error'] = 'пропущено: выполняется другой EXPLAIN'
+        else:
+            self._explaining = True
+            asyncio.get_running_loop().create_task(self._explain(engine, entry, statement, parameters))
+
+    async def _explain(self, engine, entry: dict, statement: str, parameters):
+        current_query.set('explain')
+        prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+        try:
+            async with engine.connect() as connection:
+                result = await connection.exec_driver_sql(prefix + statement, parameters)
+                entry['plan'] = {'columns': list(result.keys()),
+                                 'rows': [[str(value) for value in row] for row in result.all()]}
+        except Exception as e:
+            entry['plan_error'] = f"{type(e).__name__}: {e}"[:500]
+        finally:
+            self._explaining = False
+
+    def entries(self):
+        """Buffered entries, newest first."""
+        return list(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+
+slow_queries = SlowQueries()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each checkout waited."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait.observe(time.perf_counter() - started)
+
+
+def track_queries(cls):
+    """Class decorator: tags SQL issued inside each async classmethod with its name.
+
+        The tag ends up as the ``query`` label of db_query_duration_seconds and in
+        the slow query log.
+        """
+    for name, attribute in list(vars(cls).items()):
+        if isinstance(attribute, classmethod) and iscoroutinefunction(attribute.__func__):
+            setattr(cls, name, classmethod(_tagged(attribute.__func__, f"{cls.__name__}.{name}")))
+    return cls
+
+
+def _tagged(fn, tag):
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = current_query.set(tag)
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            current_query.reset(token)
+    return wrapper
+
+
+def instrument_engine(engine):
+    """Hooks statement timing, the slow query log (and slow_queries) and pool gauges into an engine."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        tag = current_query.get()
+        query_latency.observe(elapsed, query=tag)
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            slow_query_log.warning(json.dumps({
+                'query': tag,
+                'duration_ms': round(elapsed * 1000, 2),
+                'statement': ' '.join(statement.split()),
+                'rows': cursor.rowcount,
+            }, ensure_ascii=False))
+            if tag.startswith('Repo.') and not executemany:
+                slow_queries.record(engine, tag, elapsed, statement, parameters, cursor.rowcount)
+
+    if sync_engine not in _engines:
+        _engines.append(sync_engine)
+
+
+def _pool_state():
+    for sync_engine in _engines:
+        pool = sync_engine.pool
+        if not hasattr(pool, 'checkedout'):
+            continue
+        name = sync_engine.url.database or 'default'
+        yield {'pool': name, 'state': 'size'}, pool.size()
+        yield {'pool': name, 'state': 'checked_out'}, pool.checkedout()
+        yield {'pool': name, 'state': 'overflow'}, max(0, pool.overflow())
+        yield {'pool': name, 'state': 'idle'}, pool.checkedin()
+
+
+_engines = []
+registry.register(Gauge('db_pool_connections', 'Connection pool state.', ('pool', 'state'),
+                        callback=_pool_state))
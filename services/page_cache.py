@@ -0,0 +1,115 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from quart import request, Response
+from shemas.cache import TTLCache, MISSING, catalog_cache
+from shemas.repository import Repo
+
+
+TEMPLATE_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+
+class PageCache:
+    """Rendered listing pages, valid while the catalog version stays the same.
+
+        The version (Repo.catalog_version) lives in the database and is
+        incremented by every transaction that changes the catalog, whichever
+        process commits it: a worker, bulk import or a CLI delete. Every
+        request reads it. It is part of the ETag and stored with every page, so
+        a change made anywhere changes the ETags of all workers and makes their
+        stored pages re-render. Clients revalidating with If-None-Match /
+        If-Modified-Since get a fresh page exactly when needed. The ETag does
+        not depend on the process: every worker running the same templates
+        confirms the same copy. Only the committing process clears its
+        catalog_cache on commit, so the others clear theirs here, when they
+        first see the new version, before rendering with it.
+
+        Args:
+            version: Coroutine function returning the current catalog version.
+            salt (str): Mixed into ETags; changes with the templates, so pages
+                cached by clients before a deploy are not confirmed after it.
+            maxsize (int): Maximum number of stored pages.
+            ttl (float): Seconds a stored page is kept.
+            caches: In-process caches the pages are built from (counts,
+                categories, page anchors), cleared when the version changes.
+
+        Attributes:
+            version (int): Catalog version last seen by this process.
+            last_modified (datetime): When this process first saw that version.
+        """
+
+    def __init__(self, version, salt: str = '', maxsize: int = 512, ttl: float = 300.0, caches=()):
+        self._current_version = version
+        self._salt = salt
+        self._caches = caches
+        self.version = None
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self._pages = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def bump(self):
+        """Drops the pages stored by this process (they re-render on the next request)."""
+        self._pages.clear()
+
+    def etag(self, key, version: int):
+        """Strong ETag of a page in a catalog version."""
+        return hashlib.sha1(repr((self._salt, version, key)).encode()).hexdigest()
+
+    def stats(self):
+        return {**self._pages.stats(), "version": self.version}
+
+    async def _seen(self):
+        version = await self._current_version()
+        if version != self.version:
+            # Last-Modified never goes back for a version this process has not
+            # served yet, so If-Modified-Since from an older version misses.
+            self.version = version
+            self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+            for cache in self._caches:
+                cache.clear()
+        return version
+
+    async def respond(self, key, render):
+        """Answers from the cache, rendering the page only on a miss.
+
+            Args:
+                key (tuple): Request shape (route, page, category, sort, access, cursor).
+                render: Coroutine function producing the HTML body.
+
+            Returns:
+                Response: 200 with the page, or 304 if the client's copy is current.
+            """
+        version = await self._seen()
+        etag = self.etag(key, version)
+        if request.if_none_match.contains(etag):
+            return self._headers(Response(b"", status=304), etag)
+        stored = self._pages.get(key)
+        if stored is MISSING or stored[0] != version:
+            body = (await render()).encode()
+            self._pages.set(key, (version, body))
+        else:
+            body = stored[1]
+        response = self._headers(Response(body, mimetype='text/html'), etag)
+        await response.make_conditional(request)
+        return response
+
+    def _headers(self, response, etag):
+        response.set_etag(etag)
+        response.last_modified = self.last_modified
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response
+
+
+def templates_digest(folder: str = TEMPLATE_FOLDER):
+    """Hash of the template files, the same in every worker running the same code."""
+    hasher = hashlib.sha1()
+    for name in sorted(os.listdir(folder)) if os.path.isdir(folder) else ():
+        with open(os.path.join(folder, name), 'rb') as f:
+            hasher.update(name.encode() + b'\0' + f.read())
+    return hasher.hexdigest()
+
+
+page_cache = PageCache(Repo.catalog_version, salt=templates_digest(),
+                       maxsize=int(os.getenv("PAGE_CACHE_MAXSIZE", 512)),
+                       ttl=float(os.getenv("PAGE_CACHE_TTL", 300)),
+                       caches=(catalog_cache,))
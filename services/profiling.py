@@ -0,0 +1,116 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+from datetime import datetime
+
+
+PROFILE_FOLDER = os.getenv('PROFILE_FOLDER', 'profiles')
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 50))
+PROFILE_TOKEN_SECONDS = int(os.getenv('PROFILE_TOKEN_SECONDS', 3600))
+PROFILE_HEADER = 'X-Profile'
+PROFILE_SALT = 'profile'
+PROFILE_NAME = re.compile(r'[\w.-]+\.prof')
+
+
+class RequestProfiler:
+    """cProfile of single requests, saved to disk as pstats files.
+
+        A request is profiled when it carries a valid signed PROFILE_HEADER or
+        when the profiler has been armed from the admin page for the next
+        ``count`` requests (optionally of one endpoint only). Armed counts live
+        in the worker process that served the admin page; the header works on
+        any worker.
+
+        cProfile follows the thread, not the request: while the profiled
+        request awaits the database, the event loop runs other requests and
+        their calls end up in the same profile. Only one request of a process
+        is profiled at a time, so at least profiles never overlap.
+
+        Args:
+            folder (str): Where profiles are written (outside the served files/).
+            keep (int): Number of profiles kept, older ones are deleted.
+        """
+
+    def __init__(self, folder: str = PROFILE_FOLDER, keep: int = PROFILE_KEEP):
+        self.folder = folder
+        self.keep = keep
+        self.armed = 0
+        self.endpoint = None
+        self._active = None
+
+    def arm(self, count: int, endpoint: str = None):
+        """Profiles the next ``count`` requests (of ``endpoint`` only, if given)."""
+        self.armed = max(0, count)
+        self.endpoint = endpoint or None
+
+    def wanted(self, endpoint: str, signed: bool):
+        """Whether to profile a request; consumes one armed request if so."""
+        if self._active is not None:
+            return False
+        if signed:
+            return True
+        if self.armed and self.endpoint in (None, endpoint):
+            self.armed -= 1
+            return True
+        return False
+
+    def start(self):
+        """Starts profiling the current request."""
+        self._active = cProfile.Profile()
+        self._active.enable()
+        return self._active
+
+    def cancel(self, profile):
+        """Stops a profile without saving it (the request failed before finishing)."""
+        profile.disable()
+        if self._active is profile:
+            self._active = None
+
+    def stop(self, profile, endpoint: str, elapsed: float):
+        """Stops a profile and saves it.
+
+            Returns:
+                str: File name of the profile, relative to the profile folder.
+            """
+        self.cancel(profile)
+        os.makedirs(self.folder, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{endpoint}-{round(elapsed * 1000)}ms.prof"
+        profile.dump_stats(os.path.join(self.folder, name))
+        self._prune()
+        return name
+
+    def _prune(self):
+        for name in self.profiles()[self.keep:]:
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError as e:
+                print("error", e)
+
+    def profiles(self):
+        """Saved profile names, newest first."""
+        try:
+            names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return []
+        return sorted((name for name in names if PROFILE_NAME.fullmatch(name)), reverse=True)
+
+    def path(self, name: str):
+        """Path of a saved profile, or None if the name is not one of them."""
+        if not PROFILE_NAME.fullmatch(name):
+            return None
+        path = os.path.join(self.folder, name)
+        return path if os.path.isfile(path) else None
+
+    def report(self, name: str, sort: str = 'cumulative', limit: int = 60):
+        """Text report of a saved profile: the ``limit`` most expensive functions."""
+        path = self.path(name)
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+request_profiler = RequestProfiler()
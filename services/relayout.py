@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+from shemas.repository import Repo
+from services.storage import UPLOAD_FOLDER, link_into_place, remove_files, get_layout
+
+
+STATE_NAME = '.layout_state'
+
+
+class LayoutMigration:
+    """Moves stored files to another storage layout while the site keeps running.
+
+        Blobs are walked in id order in batches. For every blob stored under a
+        path the target layout would not produce, the file first gets a hard
+        link at the new path, then the blob and its books are repointed in one
+        transaction, and only then is the old name removed (if nothing else
+        still references it). At every moment the path in the database exists
+        on disk; links to old paths are redirected by /files. The last handled
+        blob id is saved after every batch, so an interrupted run continues
+        where it stopped.
+
+        Args:
+            layout_name (str): Target layout (STORAGE_LAYOUT by default).
+            batch_size (int): Blobs per transaction.
+            rate (float): Maximum number of files moved per second.
+            dry_run (bool): Only report what would be moved.
+        """
+
+    def __init__(self, layout_name: str = None, batch_size: int = 200, rate: float = 200,
+                 dry_run: bool = False):
+        self.layout = get_layout(layout_name)
+        self.batch_size = batch_size
+        self.rate = rate
+        self.dry_run = dry_run
+        self.state_path = os.path.join(UPLOAD_FOLDER, STATE_NAME)
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _save_state(self, after_id):
+        if after_id is None:
+            try:
+                os.unlink(self.state_path)
+            except FileNotFoundError:
+                pass
+            return
+        tmp_path = self.state_path + '.part'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(after_id))
+        os.replace(tmp_path, self.state_path)
+
+    def target(self, digest: str, path: str):
+        """Path of a blob in the target layout (the extension is kept)."""
+        extension = os.path.splitext(path)[1].lstrip('.') or 'bin'
+        return self.layout.path(digest, extension)
+
+    async def _link(self, moves):
+        """Links every move, returning the ones whose source file exists."""
+        linked = []
+        for move, result in zip(moves, await asyncio.gather(
+                *(link_into_place(old_path, new_path) for _, old_path, new_path in moves),
+                return_exceptions=True)):
+            if isinstance(result, FileNotFoundError):
+                if os.path.exists(os.path.join(UPLOAD_FOLDER, move[2])):
+                    linked.append(move)
+                else:
+                    print("error", f"файл не найден: {move[1]}")
+            elif isinstance(result, Exception):
+                print("error", result)
+            else:
+                linked.append(move)
+        return linked
+
+    async def run(self, max_blobs: int = None):
+        """Migrates the store, continuing from the previous run.
+
+            Args:
+                max_blobs (int): Stop after checking this many blobs (None: all of them).
+
+            Returns:
+                dict: Counters: checked, moved, books (repointed), missing
+                      (files not on disk) and finished (all blobs walked).
+            """
+        stats = {'checked': 0, 'moved': 0, 'books': 0, 'missing': 0, 'finished': False}
+        after_id = await asyncio.to_thread(self._load_state)
+        while max_blobs is None or stats['checked'] < max_blobs:
+            started = time.monotonic()
+            size = self.batch_size if max_blobs is None else min(self.batch_size, max_blobs - stats['checked'])
+            blobs = await Repo.blobs_after(after_id, size)
+            if not blobs:
+                stats['finished'] = True
+                await asyncio.to_thread(self._save_state, None)
+                break
+            after_id = blobs[-1][0]
+            stats['checked'] += len(blobs)
+            moves = [(digest, path, self.target(digest, path)) for _, digest, path in blobs
+                     if path != self.target(digest, path)]
+            if self.dry_run:
+                stats['moved'] += len(moves)
+            elif moves:
+                linked = await self._link(moves)
+                stats['missing'] += len(moves) - len(linked)
+                stats['books'] += await Repo.move_blobs(linked)
+                stats['moved'] += len(linked)
+                old_paths = [old_path for _, old_path, _ in linked]
+                await remove_files(sorted(set(old_paths) - await Repo.referenced_paths(old_paths)))
+            if not self.dry_run:
+                await asyncio.to_thread(self._save_state, after_id)
+            await asyncio.sleep(max(0.0, len(moves) / self.rate - (time.monotonic() - started)))
+        return stats
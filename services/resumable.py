@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import secrets
+import time
+from services.storage import UPLOAD_FOLDER, CHUNK_SIZE, _discard
+
+
+RESUMABLE_FOLDER = os.path.join(UPLOAD_FOLDER, '.uploads')
+RESUMABLE_MAX_SIZE = int(os.getenv('RESUMABLE_MAX_SIZE', 1024 * 1024 * 1024))
+RESUMABLE_CHUNK_SIZE = int(os.getenv('RESUMABLE_CHUNK_SIZE', 8 * 1024 * 1024))
+RESUMABLE_EXPIRE_SECONDS = int(os.getenv('RESUMABLE_EXPIRE_SECONDS', 24 * 3600))
+UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(Exception):
+    """Rejected upload operation.
+
+        Attributes:
+            status (int): HTTP status to answer with.
+            offset (int): Current offset of the upload, if known.
+        """
+
+    def __init__(self, message: str, status: int = 400, offset: int = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def _hash_prefix(path: str, length: int, algorithm: str):
+    """Hashes the first ``length`` bytes of a file (after a restart lost the running hash)."""
+    hasher = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            length -= len(chunk)
+    return hasher
+
+
+class ResumableUploads:
+    """Uploads sent in pieces, resumable after a dropped connection.
+
+        An upload is a ``<id>.part`` data file plus a ``<id>.json`` sidecar with
+        the declared size and the book fields, both under ``folder``. The size of
+        the data file is the upload offset: a chunk is accepted only at that
+        offset, so a client that lost a response asks for progress and continues.
+        Chunks are written in CHUNK_SIZE blocks (bounded memory) and fed to a
+        running hash; the hash lives in memory, and if it is missing or behind
+        (restart, another worker) it is rebuilt from the data on disk.
+
+        Args:
+            folder (str): Directory of unfinished uploads.
+            max_size (int): Largest accepted file.
+            chunk_size (int): Largest accepted chunk (must stay below MAX_CONTENT_LENGTH).
+            algorithm (str): hashlib algorithm of the content digest.
+        """
+
+    def __init__(self, folder: str = RESUMABLE_FOLDER, max_size: int = RESUMABLE_MAX_SIZE,
+                 chunk_size: int = RESUMABLE_CHUNK_SIZE, algorithm: str = 'sha256'):
+        self.folder = folder
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.algorithm = algorithm
+        self._hashers = {}
+        self._locks = {}
+
+    def _paths(self, upload_id: str):
+        if not UPLOAD_ID.match(upload_id or ''):
+            raise UploadError("Загрузка не найдена", 404)
+        base = os.path.join(self.folder, upload_id)
+        return base + '.part', base + '.json'
+
+    def _lock(self, upload_id: str):
+        return self._locks.setdefault(upload_id, asyncio.Lock())
+
+    def _create(self, size: int, meta: dict):
+        os.makedirs(self.folder, exist_ok=True)
+        upload_id = secrets.token_hex(16)
+        data_path, meta_path = self._paths(upload_id)
+        open(data_path, 'xb').close()
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'size': size, 'meta': meta, 'created': time.time()}, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+        return upload_id
+
+    def _state(self, upload_id: str):
+        data_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                state = json.load(f)
+            state['offset'] = os.path.getsize(data_path)
+        except FileNotFoundError:
+            raise UploadError("Загрузка не найдена", 404) from None
+        return state
+
+    def _write(self, upload_id: str, offset: int, data: bytes):
+        """Writes a block at ``offset`` and feeds it to the running hash (worker thread)."""
+        data_path, _ = self._paths(upload_id)
+        offset_hashed, hasher = self._hashers.get(upload_id, (0, None))
+        if hasher is None or offset_hashed != offset:
+            hasher = _hash_prefix(data_path, offset, self.algorithm)
+        with open(data_path, 'r+b') as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate()
+            f.flush()
+        hasher.update(data)
+        self._hashers[upload_id] = (offset + len(data), hasher)
+
+    def _sync(self, upload_id: str):
+        data_path, meta_path = self._paths(upload_id)
+        with open(data_path, 'rb') as f:
+            os.fsync(f.fileno())
+        # Both files age together, the collector expires them as a pair.
+        os.utime(meta_path)
+
+    async def create(self, size: int, meta: dict):
+        """Registers a new upload of ``size`` bytes.
+
+            Args:
+                size (int): Declared file size.
+                meta (dict): Book fields and the original file name, kept until finish().
+
+            Returns:
+                str: Upload id.
+
+            Raises:
+                UploadError: If the size is not acceptable.
+            """
+        if size <= 0:
+            raise UploadError("Пустой файл")
+        if size > self.max_size:
+            raise UploadError(f"Файл слишком большой. Максимальный размер {self.max_size // (1024 * 1024)}MB.", 413)
+        return await asyncio.to_thread(self._create, size, meta)
+
+    async def status(self, upload_id: str):
+        """Returns the upload state: size, meta, created and offset (bytes received)."""
+        return await asyncio.to_thread(self._state, upload_id)
+
+    async def write(self, upload_id: str, offset: int, body, length: int = None):
+        """Appends a chunk streamed from ``body`` at ``offset``.
+
+            Args:
+                upload_id (str): Upload id.
+                offset (int): Position of the chunk, must equal the current offset.
+                body: Async iterable of bytes (request.body).
+                length (int): Declared chunk length (Content-Length), if known.
+
+            Returns:
+                int: New offset.
+
+            Raises:
+                UploadError: 404 for an unknown upload, 409 (with the current
+                    offset) for a chunk at the wrong position, 413 for a chunk
+                    that is too large or runs past the declared size.
+            """
+        async with self._lock(upload_id):
+            state = await self.status(upload_id)
+            if offset != state['offset']:
+                raise UploadError("Неверное смещение", 409, state['offset'])
+            if length is not None and (length > self.chunk_size or offset + length > state['size']):
+                raise UploadError("Слишком большой фрагмент", 413, offset)
+            start = offset
+            buffer = bytearray()
+            received = 0
+            try:
+                async for data in body:
+                    received += len(data)
+                    if received > self.chunk_size or start + received > state['size']:
+                        raise UploadError("Слишком большой фрагмент", 413, start)
+                    buffer += data
+                    if len(buffer) >= CHUNK_SIZE:
+                        await asyncio.to_thread(self._write, upload_id, offset, bytes(buffer))
+                        offset += len(buffer)
+                        buffer.clear()
+            finally:
+                # What arrived before an error or a dropped connection is kept,
+                # the client resumes from the offset it reads back.
+                if buffer:
+                    await asyncio.to_thread(self._write, upload_id, offset, bytes(buffer))
+                    offset += len(buffer)
+                await asyncio.to_thread(self._sync, upload_id)
+            return offset
+
+    async def finish(self, upload_id: str):
+        """Completes an upload whose data has fully arrived.
+
+            Returns:
+                tuple: (data file path, hex digest, size, meta). The caller moves
+                       the data file into place and then calls forget().
+
+            Raises:
+                UploadError: 404 for an unknown upload, 409 if data is missing.
+            """
+        async with self._lock(upload_id):
+            state = await self.status(upload_id)
+            if state['offset'] != state['size']:
+                raise UploadError("Файл получен не полностью", 409, state['offset'])
+            data_path, _ = self._paths(upload_id)
+            offset_hashed, hasher = self._hashers.get(upload_id, (0, None))
+            if hasher is None or offset_hashed != state['size']:
+                hasher = await asyncio.to_thread(_hash_prefix, data_path, state['size'], self.algorithm)
+            return data_path, hasher.hexdigest(), state['size'], state['meta']
+
+    async def forget(self, upload_id: str):
+        """Removes an upload's files and in-memory state (after finish() or on abort)."""
+        data_path, meta_path = self._paths(upload_id)
+        self._hashers.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+        await asyncio.to_thread(lambda: (_discard(data_path), _discard(meta_path)))
+
+
+resumable_uploads = ResumableUploads()
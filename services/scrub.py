@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from shemas.repository import Repo
+from services.delivery import content_digest
+from services.storage import UPLOAD_FOLDER, CHUNK_SIZE
+
+
+SCRUB_RATE = float(os.getenv('SCRUB_RATE_MB', 20)) * 1024 * 1024
+SCRUB_WORKERS = int(os.getenv('SCRUB_WORKERS', 2))
+STATE_NAME = '.scrub_state'
+PHASES = ('blob', 'book')
+
+
+class ByteRate:
+    """Token bucket shared by the hashing threads: at most ``rate`` bytes per second in total."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, size: int):
+        """Blocks the calling thread until ``size`` more bytes may be read."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + size / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+def _verify(root: str, path: str, expected: str, rate: ByteRate):
+    """Checks one stored file; runs in a hashing thread.
+
+        Args:
+            root (str): Root of the file store.
+            path (str): Path relative to the root.
+            expected (str): SHA-256 (64 hex) or MD5 (32 hex, legacy names) of the
+                contents; None to only check that the file exists.
+            rate (ByteRate): Read budget shared with the other threads.
+
+        Returns:
+            tuple: (issue dict or None, bytes read).
+        """
+    issue = {'path': path, 'expected': expected, 'actual': None, 'detail': None}
+    full_path = os.path.join(root, path)
+    if expected is None:
+        if os.path.isfile(full_path):
+            return None, 0
+        return {**issue, 'kind': 'missing'}, 0
+    hasher = hashlib.new('md5' if len(expected) == 32 else 'sha256')
+    size = 0
+    try:
+        with open(full_path, 'rb') as f:
+            while True:
+                rate.acquire(CHUNK_SIZE)
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                size += len(chunk)
+    except FileNotFoundError:
+        return {**issue, 'kind': 'missing'}, size
+    except OSError as e:
+        return {**issue, 'kind': 'unreadable', 'detail': str(e)[:500]}, size
+    actual = hasher.hexdigest()
+    if actual != expected:
+        return {**issue, 'kind': 'corrupt', 'actual': actual}, size
+    return None, size
+
+
+class Scrubber:
+    """Re-verifies stored files against their hashes, a little at a time.
+
+        Two phases per pass: every blob file is re-hashed and compared with its
+        SHA-256 digest, then every book path is checked. A legacy book (no
+        file_hash) is re-hashed against the hash in its file name (MD5 or
+        SHA-256), or only checked for existence if its name carries none;
+        other books share their blob's file, so only its existence is checked.
+
+        Files are read in CHUNK_SIZE blocks by ``workers`` threads sharing one
+        ``rate`` byte budget, so a pass never takes more disk bandwidth than
+        that, however large the store. Findings go to the storage_issue table;
+        a file that verifies again closes its issue. Progress (phase and last
+        row id) is saved after every batch, so a restarted scrubber continues
+        the pass it was in.
+
+        Args:
+            root (str): Root of the file store.
+            rate (float): Maximum bytes read per second, all threads together.
+            workers (int): Hashing threads.
+            batch_size (int): Rows per database round trip.
+        """
+
+    def __init__(self, root: str = UPLOAD_FOLDER, rate: float = SCRUB_RATE, workers: int = SCRUB_WORKERS,
+                 batch_size: int = 100):
+        self.root = root
+        self.rate = ByteRate(rate)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.state_path = os.path.join(root, STATE_NAME)
+
+    def load_state(self):
+        """Progress of the current pass: phase, after_id, pass_started, last_finished."""
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'phase': PHASES[0], 'after_id': 0, 'pass_started': None, 'last_finished': None}
+
+    def _save_state(self, state: dict):
+        tmp_path = self.state_path + '.part'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    async def _batch(self, phase: str, after_id: int):
+        """Next rows of a phase as (id, path, expected hash or None, hash checked) tuples."""
+        if phase == 'blob':
+            return [(blob_id, path, digest, True)
+                    for blob_id, digest, path in await Repo.blobs_after(after_id, self.batch_size)]
+        checks = []
+        for book_id, path, file_hash in await Repo.books_after(after_id, self.batch_size):
+            expected = None if file_hash else content_digest(path)
+            checks.append((book_id, path, expected, expected is not None))
+        return checks
+
+    async def run(self, max_files: int = None):
+        """Verifies files, continuing the pass the previous run was in.
+
+            Args:
+                max_files (int): Stop after checking this many files (None: finish the pass).
+
+            Returns:
+                dict: Counters: checked, bytes, missing, corrupt, unreadable, and
+                    finished (a whole pass completed).
+            """
+        stats = {'checked': 0, 'bytes': 0, 'missing': 0, 'corrupt': 0, 'unreadable': 0, 'finished': False}
+        state = await asyncio.to_thread(self.load_state)
+        state['pass_started'] = state.get('pass_started') or datetime.now().isoformat(timespec='seconds')
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scrub') as pool:
+            while max_files is None or stats['checked'] < max_files:
+                checks = await self._batch(state['phase'], state['after_id'])
+                if not checks:
+                    if state['phase'] == PHASES[-1]:
+                        state = {'phase': PHASES[0], 'after_id': 0, 'pass_started': None,
+                                 'last_finished': datetime.now().isoformat(timespec='seconds')}
+                        await asyncio.to_thread(self._save_state, state)
+                        stats['finished'] = True
+                        break
+                    state['phase'] = PHASES[PHASES.index(state['phase']) + 1]
+                    state['after_id'] = 0
+                    continue
+                results = await asyncio.gather(*(
+                    loop.run_in_executor(pool, _verify, self.root, path, expected, self.rate)
+                    for _, path, expected, _ in checks))
+                issues, hashed, existing = [], [], []
+                for (_, path, _, checked), (issue, size) in zip(checks, results):
+                    stats['bytes'] += size
+                    if issue is not None:
+                        issues.append(issue)
+                    else:
+                        (hashed if checked else existing).append(path)
+                # A file dropped or moved since the batch was read is no longer an issue.
+                referenced = await Repo.referenced_paths(issue['path'] for issue in issues)
+                await Repo.resolve_issues([issue['path'] for issue in issues if issue['path'] not in referenced])
+                issues = [issue for issue in issues if issue['path'] in referenced]
+                for issue in issues:
+                    stats[issue['kind']] += 1
+                await Repo.record_issues(issues)
+                await Repo.resolve_issues(hashed)
+                await Repo.resolve_issues(existing, kinds=('missing',))
+                stats['checked'] += len(checks)
+                state['after_id'] = checks[-1][0]
+                await asyncio.to_thread(self._save_state, state)
+        return stats
@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+
+UPLOAD_FOLDER = 'files'
+TMP_FOLDER = os.path.join(UPLOAD_FOLDER, '.tmp')
+CHUNK_SIZE = 1024 * 1024
+ALLOWED_EXTENSIONS = {'doc', 'pdf'}
+
+
+def dated_path(now, filename: str):
+    """Relative path of a stored file: ``YYYY/YYYY-MM-DD/filename``."""
+    folder = now.strftime("%Y-%m-%d")
+    return f"{folder[:4]}/{folder}/{filename}"
+
+
+class DatedLayout:
+    """Original layout: ``YYYY/YYYY-MM-DD/<title>_<digest>.<ext>``, one directory per day."""
+    name = 'dated'
+
+    def path(self, digest: str, extension: str, now=None, title: str = ''):
+        return dated_path(now or datetime.now(), f"{title}_{digest}.{extension.lower()}")
+
+
+class HashedLayout:
+    """Fan-out on the content hash: ``ab/cd/<digest>.<ext>``.
+
+        With the default two levels of two hex characters a directory holds
+        1/65536 of the store, whatever the ingest rate; names do not depend on
+        user input.
+
+        Args:
+            levels (int): Number of prefix directories.
+            width (int): Hex characters per prefix directory.
+        """
+    name = 'hashed'
+
+    def __init__(self, levels: int = 2, width: int = 2):
+        self.levels = levels
+        self.width = width
+
+    def path(self, digest: str, extension: str, now=None, title: str = ''):
+        prefixes = [digest[i * self.width:(i + 1) * self.width] for i in range(self.levels)]
+        return '/'.join(prefixes + [f"{digest}.{extension.lower()}"])
+
+
+LAYOUTS = {layout.name: layout for layout in (DatedLayout, HashedLayout)}
+STORAGE_LAYOUT = os.getenv('STORAGE_LAYOUT', HashedLayout.name)
+
+
+def get_layout(name: str = None):
+    """Layout instance by name (STORAGE_LAYOUT by default)."""
+    return LAYOUTS[name or STORAGE_LAYOUT]()
+
+
+layout = get_layout()
+
+
+def file_digest(file_path: str, algorithm: str = 'sha256'):
+    """Hashes a file on disk in CHUNK_SIZE blocks.
+
+        Returns:
+            tuple: (hex digest, size in bytes)
+        """
+    hasher = hashlib.new(algorithm)
+    size = 0
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+def _stream_to_temp(stream, algorithm: str):
+    """Copies a file-like object into a temp file, hashing it on the way.
+
+        Runs in a worker thread: one pass over the data, memory bounded by CHUNK_SIZE.
+
+        Returns:
+            tuple: (temp file path, hex digest, size in bytes)
+        """
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    hasher = hashlib.new(algorithm)
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=TMP_FOLDER, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                hasher.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path, hasher.hexdigest(), size
+
+
+def _copy_into_place(source: str, relative_path: str):
+    """Copies an external file into UPLOAD_FOLDER via a temp file and an atomic rename."""
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=TMP_FOLDER, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out, open(source, 'rb') as src:
+            shutil.copyfileobj(src, out, CHUNK_SIZE)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return _move_into_place(tmp_path, relative_path)
+
+
+def _move_into_place(tmp_path: str, relative_path: str):
+    """Atomically renames a temp file to its place under UPLOAD_FOLDER.
+
+        The target directory is fsynced too, so the rename survives a crash.
+        """
+    file_path = os.path.join(UPLOAD_FOLDER, relative_path)
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    os.replace(tmp_path, file_path)
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return file_path
+
+
+def _link_into_place(relative_source: str, relative_path: str):
+    """Gives a stored file a second name under UPLOAD_FOLDER without copying it.
+
+        The hard link is made in TMP_FOLDER and renamed into place, so the new
+        name appears atomically; file systems without hard links get a copy.
+        The link's times are reset to now: it would otherwise keep the source's
+        old mtime and look past the GC grace period before its row commits.
+        """
+    source = os.path.join(UPLOAD_FOLDER, relative_source)
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    tmp_path = os.path.join(TMP_FOLDER, f"{os.getpid()}_{os.path.basename(relative_path)}.link")
+    try:
+        _discard(tmp_path)
+        os.link(source, tmp_path)
+        os.utime(tmp_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        return _copy_into_place(source, relative_path)
+    return _move_into_place(tmp_path, relative_path)
+
+
+def _discard(tmp_path: str):
+    """Removes a temp file that will not be stored."""
+    try:
+        os.unlink(tmp_path)
+    except FileNotFoundError:
+        pass
+
+
+async def receive_upload(file, algorithm: str = 'sha256'):
+    """Streams an uploaded file to a temp file off the event loop.
+
+        Args:
+            file: Quart FileStorage from request.files.
+            algorithm (str): hashlib algorithm used for the content digest.
+
+        Returns:
+            tuple: (temp file path, hex digest, size in bytes)
+        """
+    return await asyncio.to_thread(_stream_to_temp, file.stream, algorithm)
+
+
+async def move_into_place(tmp_path: str, relative_path: str):
+    """Moves a received upload to ``UPLOAD_FOLDER/relative_path`` off the event loop."""
+    return await asyncio.to_thread(_move_into_place, tmp_path, relative_path)
+
+
+async def copy_into_place(source: str, relative_path: str):
+    """Copies an external file to ``UPLOAD_FOLDER/relative_path`` off the event loop."""
+    return await asyncio.to_thread(_copy_into_place, source, relative_path)
+
+
+async def link_into_place(relative_source: str, relative_path: str):
+    """Links a stored file to a second path under UPLOAD_FOLDER off the event loop."""
+    return await asyncio.to_thread(_link_into_place, relative_source, relative_path)
+
+
+async def discard(tmp_path: str):
+    """Deletes a received upload off the event loop."""
+    await asyncio.to_thread(_discard, tmp_path)
+
+
+async def remove_file(relative_path: str):
+    """Deletes a stored file (one that no DBlob references any more) off the event loop."""
+    await asyncio.to_thread(_discard, os.path.join(UPLOAD_FOLDER, relative_path))
+
+
+async def remove_files(relative_paths):
+    """Deletes many stored files concurrently in the default thread pool."""
+    await asyncio.gather(*(remove_file(path) for path in relative_paths))
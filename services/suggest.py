@@ -0,0 +1,166 @@
+import asyncio
+import os
+import re
+from bisect import bisect_left, insort
+from shemas.repository import on_catalog_commit
+
+
+SUGGEST_MAX_ENTRIES = int(os.getenv('SUGGEST_MAX_ENTRIES', 300_000))
+KINDS = {'category': 'category', 'author': 'autor', 'title': 'title'}
+SEPARATOR = '\x00'
+SPACES = re.compile(r'\s+')
+
+
+def normalize(text: str):
+    """Lower case, ё as е, single spaces: the form both keys and queries are compared in."""
+    return SPACES.sub(' ', text.casefold().replace('ё', 'е')).strip()
+
+
+def _keys(kind: str, value: str):
+    """Index keys of a value: (whole-value key, keys of the suffixes starting at later words).
+
+        ``"Война и мир"`` is found by "вой" through the first key and by "мир"
+        or "и м" through the others. The kind and the original value follow the
+        normalized text, so keys of different values never collide and a match
+        carries what to show.
+        """
+    text = normalize(value)
+    tail = f"{SEPARATOR}{kind}{SEPARATOR}{value}"
+    starts = dict.fromkeys(m.end() for m in SPACES.finditer(text))
+    return text + tail, [text[start:] + tail for start in starts]
+
+
+class SuggestIndex:
+    """Prefix index of titles, authors and categories for search-as-you-type.
+
+        Keys live in two sorted lists, whole values and word suffixes; a lookup
+        is a bisect to the first key with the prefix and a short forward scan,
+        so it never touches the database.
+        load() replaces it from the catalog terms, commits of this process are
+        applied incrementally through on_catalog_commit, and the periodic
+        reload by services.terms picks up changes made by other processes (bulk
+        import, other workers).
+
+        The lists hold at most ``max_entries`` keys together. The build fills them with
+        categories first, then authors and titles by number of books, so when the
+        cap is reached it is the rarest titles that are left out.
+
+        Args:
+            max_entries (int): Memory cap, in keys.
+        """
+
+    def __init__(self, max_entries: int = SUGGEST_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._values = []
+        self._words = []
+        self._counts = {}
+        self.dropped = 0
+        self.ready = False
+
+    def __len__(self):
+        return len(self._values) + len(self._words)
+
+    def _build(self, terms):
+        values, words, counts, dropped = [], [], {}, 0
+        for kind, value, count in terms:
+            whole, inner = _keys(kind, value)
+            if len(values) + len(words) + 1 + len(inner) > self.max_entries:
+                dropped += 1
+                continue
+            values.append(whole)
+            words += inner
+            counts[(kind, value)] = count
+        values.sort()
+        words.sort()
+        return values, words, counts, dropped
+
+    async def load(self, terms):
+        """Replaces the index with ``terms`` (see Repo.suggest_terms)."""
+        self._values, self._words, self._counts, self.dropped = await asyncio.to_thread(self._build, terms)
+        self.ready = True
+
+    def add(self, kind: str, value: str):
+        """Counts one more book with this value, indexing the value if it is new."""
+        if not value:
+            return
+        key = (kind, value)
+        if key in self._counts:
+            self._counts[key] += 1
+            return
+        whole, inner = _keys(kind, value)
+        if len(self) + 1 + len(inner) > self.max_entries:
+            self.dropped += 1
+            return
+        self._counts[key] = 1
+        insort(self._values, whole)
+        for entry in inner:
+            insort(self._words, entry)
+
+    def remove(self, kind: str, value: str):
+        """Counts one book less with this value, dropping the value when none is left."""
+        key = (kind, value)
+        if key not in self._counts:
+            return
+        self._counts[key] -= 1
+        if self._counts[key] > 0:
+            return
+        del self._counts[key]
+        whole, inner = _keys(kind, value)
+        for keys, entry in [(self._values, whole)] + [(self._words, entry) for entry in inner]:
+            i = bisect_left(keys, entry)
+            if i < len(keys) and keys[i] == entry:
+                del keys[i]
+
+    def apply(self, added, removed):
+        """Catalog commit listener: indexes inserted books and unindexes deleted ones."""
+        for books, change in ((added, self.add), (removed, self.remove)):
+            for book in books:
+                for kind, column in KINDS.items():
+                    change(kind, book[column])
+
+    def _scan(self, keys, prefix: str, limit: int, kind: str, found: dict):
+        ranked = []
+        i = bisect_left(keys, prefix)
+        for entry in keys[i:i + limit * 20]:
+            if not entry.startswith(prefix):
+                break
+            _, entry_kind, value = entry.split(SEPARATOR)
+            key = (entry_kind, value)
+            if (kind is None or entry_kind == kind) and key not in found:
+                found[key] = True
+                ranked.append(key)
+        ranked.sort(key=lambda key: (-self._counts.get(key, 0), len(key[1])))
+        return ranked
+
+    def suggest(self, query: str, limit: int = 10, kind: str = None):
+        """Values starting (at a word) with ``query``.
+
+            Values starting with the query come first, then values with a later
+            word starting with it; within each group values with more books
+            come first. Only the first ``limit * 20`` keys of each group are
+            looked at, so the cost does not depend on the catalog size.
+
+            Args:
+                query (str): What has been typed so far.
+                limit (int): Maximum number of suggestions.
+                kind (str): Only 'title', 'author' or 'category' values (None: all).
+
+            Returns:
+                list: (kind, value) tuples.
+            """
+        prefix = normalize(query)
+        if not prefix or SEPARATOR in prefix:
+            return []
+        found = {}
+        ranked = self._scan(self._values, prefix, limit, kind, found)
+        if len(ranked) < limit:
+            ranked += self._scan(self._words, prefix, limit, kind, found)
+        return ranked[:limit]
+
+    def stats(self):
+        return {"entries": len(self), "values": len(self._counts), "dropped": self.dropped,
+                "max_entries": self.max_entries, "ready": self.ready}
+
+
+suggest_index = SuggestIndex()
+on_catalog_commit(suggest_index.apply)
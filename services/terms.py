@@ -0,0 +1,55 @@
+import asyncio
+import os
+from shemas.repository import Repo
+from services.suggest import suggest_index
+from services.fuzzy import fuzzy_index
+
+
+TERMS_REFRESH_SECONDS = float(os.getenv('TERMS_REFRESH_SECONDS', 600))
+
+
+class TermRefresher:
+    """Loads the catalog terms once per refresh and hands them to every term index.
+
+        Repo.suggest_terms scans title, autor and category with GROUP BY; the
+        suggest and fuzzy indexes are built from the same result, so it runs
+        once per process and interval instead of once per index.
+
+        Args:
+            indexes: Objects with ``async load(terms)``.
+            refresh (float): Seconds between reloads (0: load once).
+        """
+
+    def __init__(self, *indexes, refresh: float = TERMS_REFRESH_SECONDS):
+        self.indexes = indexes
+        self.refresh = refresh
+        self._task = None
+
+    async def load(self):
+        """Reads the terms and replaces every index."""
+        terms = await Repo.suggest_terms()
+        for index in self.indexes:
+            await index.load(terms)
+
+    async def _refresh(self):
+        while True:
+            try:
+                await self.load()
+            except Exception as e:
+                print("error", e)
+            if not self.refresh:
+                return
+            await asyncio.sleep(self.refresh)
+
+    def start(self):
+        """Loads the indexes in the background and keeps reloading them every ``refresh`` seconds."""
+        self._task = asyncio.create_task(self._refresh())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+term_refresher = TermRefresher(suggest_index, fuzzy_index)
@@ -0,0 +1,61 @@
+import os
+import time
+from contextlib import AsyncExitStack
+from sqlalchemy import text
+from shemas.repository import Repo
+
+
+WARMUP_TIMEOUT = float(os.getenv('WARMUP_TIMEOUT', 30))
+WARMUP_CONNECTIONS = int(os.getenv('WARMUP_CONNECTIONS', os.getenv('DB_POOL_SIZE', 5)))
+# Pages rendered once at startup: the listing and a jump to page 2 (page anchors).
+WARMUP_PATHS = [path for path in os.getenv('WARMUP_PATHS', '/,/?page=2').split(',') if path]
+
+
+async def open_connections(engine, count: int):
+    """Opens ``count`` pooled connections at once and returns them to the pool.
+
+        They are held together, so the pool really ends up with ``count``
+        connections instead of reusing the first one ``count`` times.
+        """
+    async with AsyncExitStack() as stack:
+        for _ in range(count):
+            connection = await stack.enter_async_context(engine.connect())
+            await connection.execute(text('SELECT 1'))
+
+
+async def prime_catalog():
+    """Fills catalog_cache with the category list and the book counts every page shows."""
+    categories = await Repo.category()
+    await Repo.count_books()
+    for category in categories:
+        await Repo.count_books(category)
+    return len(categories)
+
+
+async def warm_up(app, engine, connections: int = WARMUP_CONNECTIONS, paths=WARMUP_PATHS):
+    """Prepares a freshly started worker process before it accepts requests.
+
+        Without it the first requests of every worker pay for opening database
+        connections, compiling Jinja templates and filling the catalog and page
+        caches, which shows up as a latency spike after each deploy or restart.
+
+        Args:
+            app (Quart): Application whose templates and pages are warmed.
+            engine (AsyncEngine): Engine whose pool is filled.
+            connections (int): Number of connections to open.
+            paths (list): Pages rendered once through the test client, filling page_cache.
+
+        Returns:
+            dict: What was warmed and how long it took, in seconds.
+        """
+    started = time.perf_counter()
+    await open_connections(engine, connections)
+    templates = app.jinja_env.list_templates()
+    for name in templates:
+        app.jinja_env.get_template(name)
+    categories = await prime_catalog()
+    client = app.test_client()
+    for path in paths:
+        await client.get(path)
+    return {"connections": connections, "templates": len(templates), "categories": categories,
+            "pages": len(paths), "seconds": round(time.perf_counter() - started, 3)}
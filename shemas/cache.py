@@ -0,0 +1,82 @@
+import os
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+MISSING = object()
+
+
+class TTLCache:
+    """Small in-process cache with TTL expiry and LRU eviction.
+
+        Attributes:
+            maxsize (int): Maximum number of entries, the least recently used is evicted first.
+            ttl (float): Lifetime of an entry in seconds.
+            hits (int): Number of lookups answered from the cache.
+            misses (int): Number of lookups that had to go to the database.
+            invalidations (int): Number of explicit clear() calls.
+        """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=MISSING):
+        """Returns a live entry and marks it as recently used."""
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value):
+        """Stores an entry, evicting the least recently used ones above maxsize."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        """Drops every entry (called after writes to the catalog)."""
+        self._data.clear()
+        self.invalidations += 1
+
+    def stats(self):
+        """Counters for monitoring."""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+catalog_cache = TTLCache(maxsize=int(os.getenv("CACHE_MAXSIZE", 256)),
+                         ttl=float(os.getenv("CACHE_TTL", 300)))
+
+
+def cached(fn):
+    """Caches the result of a Repo read method in catalog_cache.
+
+        The session argument is not part of the key; every other argument is.
+        """
+    @wraps(fn)
+    async def wrapper(cls, *args, session=None, **kwargs):
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+        value = catalog_cache.get(key)
+        if value is MISSING:
+            value = await fn(cls, *args, session=session, **kwargs)
+            catalog_cache.set(key, value)
+        return value
+    return wrapper
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Index, UniqueConstraint
+from sqlalchemy.dialects.mysql import MEDIUMTEXT
 from sqlalchemy.orm import DeclarativeBase
 
 class Model(DeclarativeBase):
@@ -13,19 +14,208 @@ class DBook(Model):
             autor (str): Book author, max length 100 characters.
             category (str): Book category, max length 100 characters.
             describe (str): Book description, max length 1000 characters, nullable with default empty string.
-            hashed (str): Hashed value, max length 200 characters.
+            hashed (str): Path of the stored file relative to files/, max length 200 characters.
+            file_hash (str): SHA-256 of the file contents, points to DBlob.digest (NULL for legacy rows).
             date_created (DateTime): Date and time when the book was created.
 
         Table:
             book: The database table name.
+
+        Indexes:
+            FULLTEXT over title/autor/category/describe for multi-field search,
+            plus one FULLTEXT index per searchable field for field-restricted queries.
+            (category, <sort field>, id) for every category listing sort, (autor, id)
+            and (date_created, id) for export filters, (title, id) for fuzzy search
+            lookups by exact title, hashed for path lookups.
+            create.check_indexes verifies that every Repo query uses them.
+            The sort fields are NOT NULL: keyset pages compare (field, id) keys.
         """
     __tablename__ = "book"
-    title = Column(String(100))
-    autor = Column(String(100))
-    category = Column(String(100))
+    __table_args__ = (
+        Index("ft_book_all", "title", "autor", "category", "describe", mysql_prefix="FULLTEXT"),
+        Index("ft_book_title", "title", mysql_prefix="FULLTEXT"),
+        Index("ft_book_autor", "autor", mysql_prefix="FULLTEXT"),
+        Index("ft_book_category", "category", mysql_prefix="FULLTEXT"),
+        Index("ix_book_file_hash", "file_hash"),
+        Index("ix_book_hashed", "hashed"),
+        Index("ix_book_category_id", "category", "id"),
+        Index("ix_book_category_title", "category", "title", "id"),
+        Index("ix_book_category_autor", "category", "autor", "id"),
+        Index("ix_book_category_date", "category", "date_created", "id"),
+        Index("ix_book_autor_id", "autor", "id"),
+        Index("ix_book_title_id", "title", "id"),
+        Index("ix_book_date_id", "date_created", "id"),
+    )
+    title = Column(String(100), nullable=False)
+    autor = Column(String(100), nullable=False)
+    category = Column(String(100), nullable=False)
     describe = Column(String(1000), nullable=True, default='')
     hashed = Column(String(200))
-    date_created = Column(DateTime)
+    file_hash = Column(String(64), nullable=True)
+    date_created = Column(DateTime, nullable=False)
+
+class DBlob(Model):
+    """Represents a stored file shared by one or more books.
+
+        Attributes:
+            digest (str): SHA-256 of the contents, unique.
+            path (str): Path of the file relative to files/, max length 200 characters.
+            size (int): File size in bytes.
+            refcount (int): Number of DBook rows pointing at this blob.
+
+        Table:
+            blob: The database table name.
+
+        Indexes:
+            path, for the garbage collector's "is this file referenced" lookups.
+        """
+    __tablename__ = "blob"
+    __table_args__ = (
+        Index("ix_blob_path", "path"),
+    )
+    digest = Column(String(64), unique=True, nullable=False)
+    path = Column(String(200), nullable=False)
+    size = Column(BigInteger, default=0)
+    refcount = Column(Integer, nullable=False, default=1)
+
+class DBookText(Model):
+    """Represents text extracted from a stored file, searchable with FULLTEXT.
+
+        Keyed by blob digest, so every book sharing the same file shares one row.
+
+        Attributes:
+            digest (str): SHA-256 of the file, matches DBook.file_hash / DBlob.digest.
+            status (str): 'pending', 'running', 'done' or 'failed'.
+            attempts (int): Number of extraction attempts so far.
+            content (str): Extracted text (capped, see services.extraction.MAX_TEXT_CHARS).
+            error (str): Last error message, max length 500 characters.
+            updated (DateTime): Last status change.
+
+        Table:
+            book_text: The database table name.
+        """
+    __tablename__ = "book_text"
+    __table_args__ = (
+        Index("ft_book_text_content", "content", mysql_prefix="FULLTEXT"),
+        Index("ix_book_text_status", "status"),
+    )
+    digest = Column(String(64), unique=True, nullable=False)
+    status = Column(String(16), nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    content = Column(Text().with_variant(MEDIUMTEXT(), "mysql"), nullable=True)
+    error = Column(String(500), nullable=True)
+    updated = Column(DateTime)
+
+class DBookCount(Model):
+    """Represents a maintained book counter (whole catalog or one category).
+
+        Updated in the same transaction as every insert/delete on DBook;
+        create.reconcile_counts rebuilds it if it ever drifts.
+
+        Attributes:
+            scope (str): 'total' for the whole catalog, 'category' for one category,
+                'version' for the catalog version (see Repo.catalog_version).
+            category (str): Category name ('' for the total and version rows).
+            total (int): Number of books (the version number for the version row).
+
+        Table:
+            book_count: The database table name.
+        """
+    __tablename__ = "book_count"
+    __table_args__ = (
+        UniqueConstraint("scope", "category", name="uq_book_count_scope_category"),
+    )
+    scope = Column(String(10), nullable=False)
+    category = Column(String(100), nullable=False, default='')
+    total = Column(BigInteger, nullable=False, default=0)
+
+class DJob(Model):
+    """Represents a background job (see services.jobs), durable across restarts.
+
+        Attributes:
+            kind (str): Handler name, e.g. 'ingest'.
+            payload (str): JSON-encoded keyword arguments of the handler.
+            status (str): 'queued', 'running', 'done' or 'failed'.
+            attempts (int): Number of times the job was started.
+            result (str): Short result description, max length 500 characters.
+            error (str): Last error message, max length 500 characters.
+            created (DateTime): When the job was queued.
+            updated (DateTime): Last status change.
+
+        Table:
+            job: The database table name.
+        """
+    __tablename__ = "job"
+    __table_args__ = (
+        Index("ix_job_status_id", "status", "id"),
+    )
+    kind = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, default='queued')
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(String(500), nullable=True)
+    error = Column(String(500), nullable=True)
+    created = Column(DateTime)
+    updated = Column(DateTime)
+
+class DFileRedirect(Model):
+    """Represents a stored file's former path, for links that still point there.
+
+        Written whenever a file's books are repointed to another path (storage
+        layout migration, legacy books adopting a blob), so /files redirects
+        every old link, including legacy names whose hash is an MD5 no blob
+        digest matches.
+
+        Attributes:
+            old_path (str): Former path relative to files/, unique.
+            new_path (str): Current path of the same contents.
+            moved (DateTime): When the path changed.
+
+        Table:
+            file_redirect: The database table name.
+
+        Indexes:
+            new_path, to follow a file that moves again.
+        """
+    __tablename__ = "file_redirect"
+    __table_args__ = (
+        Index("ix_file_redirect_new_path", "new_path"),
+    )
+    old_path = Column(String(200), unique=True, nullable=False)
+    new_path = Column(String(200), nullable=False)
+    moved = Column(DateTime)
+
+class DStorageIssue(Model):
+    """Represents a stored file that failed verification (see services.scrub).
+
+        Attributes:
+            path (str): Path of the file relative to files/, unique.
+            kind (str): 'missing', 'corrupt' (contents differ from the hash) or 'unreadable'.
+            expected (str): Hash the contents should have (blob digest or the hash in the file name).
+            actual (str): Hash the contents have, for 'corrupt'.
+            detail (str): Error message, max length 500 characters.
+            detected (DateTime): When the problem was first found.
+            checked (DateTime): When it was last confirmed.
+            resolved (DateTime): When the file verified again, NULL while the issue is open.
+
+        Table:
+            storage_issue: The database table name.
+
+        Indexes:
+            (resolved, id) for the list of open issues.
+        """
+    __tablename__ = "storage_issue"
+    __table_args__ = (
+        Index("ix_storage_issue_resolved_id", "resolved", "id"),
+    )
+    path = Column(String(200), unique=True, nullable=False)
+    kind = Column(String(16), nullable=False)
+    expected = Column(String(64), nullable=True)
+    actual = Column(String(64), nullable=True)
+    detail = Column(String(500), nullable=True)
+    detected = Column(DateTime)
+    checked = Column(DateTime)
+    resolved = Column(DateTime, nullable=True)
 
 class DUser(Model):
     """Represents a user in the database.
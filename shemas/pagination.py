@@ -0,0 +1,156 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import NamedTuple
+from sqlalchemy import select, desc, asc, and_, or_, func
+from shemas.database import DBook
+
+
+SORT_FIELDS = {
+    "id": DBook.id,
+    "title": DBook.title,
+    "autor": DBook.autor,
+    "author": DBook.autor,
+    "category": DBook.category,
+    "date_created": DBook.date_created,
+}
+DIRECTIONS = ("after", "before", "at")
+
+
+class Page(NamedTuple):
+    """One page of a keyset-paginated listing."""
+    items: list
+    next_cursor: str | None
+    prev_cursor: str | None
+
+
+def sort_field(link):
+    """Maps a ``link`` request argument to a DBook column.
+
+        Raises:
+            ValueError: If the field is not sortable.
+        """
+    field = SORT_FIELDS.get(link or "id")
+    if field is None:
+        raise ValueError(f"Invalid field '{link}' for ordering")
+    return field
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(field, book, direction):
+    """Builds an opaque cursor pointing at ``book`` in the ``field`` ordering."""
+    return encode_key((getattr(book, field.key), book.id), direction)
+
+
+def encode_key(key, direction):
+    """Builds a cursor from a raw (sort value, id) key, e.g. a page anchor."""
+    payload = {"k": [_dump(key[0]), key[1]], "d": direction}
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decodes a cursor made by encode_cursor.
+
+        Returns:
+            tuple: ((sort value, id), direction), or None for a missing or tampered cursor.
+        """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value, ident = payload["k"]
+        direction = payload["d"]
+        if direction not in DIRECTIONS:
+            return None
+        return (_load(value), int(ident)), direction
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+
+
+def _seek(field, key, direction):
+    """(field, id) compared to key, expanded so MariaDB can use a range scan on the index."""
+    value, ident = key
+    if direction == "before":
+        strict, tie = field > value, DBook.id > ident
+    elif direction == "at":
+        strict, tie = field < value, DBook.id <= ident
+    else:
+        strict, tie = field < value, DBook.id < ident
+    if field is DBook.id:
+        return tie
+    return or_(strict, and_(field == value, tie))
+
+
+def keyset_query(field, per_page: int, cursor=None, category=None):
+    """Builds the statement for one page in ``field DESC, id DESC`` order.
+
+        One extra row is fetched to know whether there is another page.
+
+        Args:
+            field: DBook column to order by.
+            per_page (int): Number of items per page.
+            cursor: Decoded cursor ((value, id), direction) or None for the first page.
+            category: Optional category filter.
+
+        Returns:
+            tuple: (statement, direction)
+        """
+    q = select(DBook)
+    if category is not None:
+        q = q.where(DBook.category == category)     # type: ignore
+    direction = "after"
+    if cursor is not None:
+        key, direction = cursor
+        q = q.where(_seek(field, key, direction))
+    order = asc if direction == "before" else desc
+    if field is DBook.id:
+        q = q.order_by(order(DBook.id))
+    else:
+        q = q.order_by(order(field), order(DBook.id))
+    return q.limit(per_page + 1), direction
+
+
+def make_page(field, rows, per_page: int, direction: str, has_cursor: bool):
+    """Trims the look-ahead row and builds next/prev cursors for a fetched page."""
+    rows = list(rows)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == "before":
+        rows.reverse()
+        next_cursor = encode_cursor(field, rows[-1], "after") if rows else None
+        prev_cursor = encode_cursor(field, rows[0], "before") if rows and has_more else None
+    else:
+        next_cursor = encode_cursor(field, rows[-1], "after") if rows and has_more else None
+        prev_cursor = encode_cursor(field, rows[0], "before") if rows and has_cursor else None
+    return Page(rows, next_cursor, prev_cursor)
+
+
+def anchor_query(field, per_page: int, category=None):
+    """Keys of the first row of every page, used for jump-to-page links.
+
+        A single pass over the (category, field, id) index numbers the rows and
+        keeps every ``per_page``-th key.
+        """
+    order = (desc(DBook.id),) if field is DBook.id else (desc(field), desc(DBook.id))
+    rn = func.row_number().over(order_by=order).label("rn")
+    inner = select(field.label("v"), DBook.id.label("id"), rn)
+    if category is not None:
+        inner = inner.where(DBook.category == category)     # type: ignore
+    inner = inner.subquery()
+    return (select(inner.c.v, inner.c.id)
+            .where((inner.c.rn - 1) % per_page == 0)
+            .order_by(inner.c.rn))
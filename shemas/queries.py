@@ -0,0 +1,218 @@
+from sqlalchemy import select, update, delete, desc, func, literal
+from shemas.database import DBook, DBlob, DBookText, DBookCount, DFileRedirect, DJob, DStorageIssue, DUser
+
+
+# Statements Repo issues, built here so create.check_indexes explains exactly
+# the same ones (keyset pages, search and fuzzy search are in shemas.pagination
+# and shemas.search).
+
+TOTAL_SCOPE = 'total'
+CATEGORY_SCOPE = 'category'
+VERSION_SCOPE = 'version'
+EXPORT_COLUMNS = (DBook.id, DBook.title, DBook.autor, DBook.category, DBook.describe,
+                  DBook.hashed, DBook.file_hash, DBook.date_created)
+TERM_COLUMNS = (('category', DBook.category), ('author', DBook.autor), ('title', DBook.title))
+
+
+def export_query(category: str = None, author: str = None, date_from=None, date_to=None):
+    """Statement behind Repo.stream_books."""
+    q = select(*EXPORT_COLUMNS).order_by(DBook.id)
+    if category is not None:
+        q = q.where(DBook.category == category)     # type: ignore
+    if author is not None:
+        q = q.where(DBook.autor == author)     # type: ignore
+    if date_from is not None:
+        q = q.where(DBook.date_created >= date_from)
+    if date_to is not None:
+        q = q.where(DBook.date_created < date_to)
+    return q
+
+
+def category_query():
+    """Distinct categories (Repo.category)."""
+    return select(DBook.category).distinct()
+
+
+def book_count_query(scope: str, category: str = ''):
+    """One book_count row (Repo.count_books, Repo.catalog_version)."""
+    return select(DBookCount.total).where(DBookCount.scope == scope, DBookCount.category == category)
+
+
+def term_query(column):
+    """Distinct values of a column with their number of books, most used first (Repo.suggest_terms)."""
+    return select(column, func.count()).group_by(column).order_by(func.count().desc())
+
+
+def stored_counts_query():
+    """Stored counters except the version, locked (Repo.reconcile_counts)."""
+    return (select(DBookCount.scope, DBookCount.category, DBookCount.total)
+            .where(DBookCount.scope != VERSION_SCOPE)
+            .with_for_update())
+
+
+def category_counts_query():
+    """Actual number of books per category (Repo.reconcile_counts)."""
+    return select(DBook.category, func.count()).group_by(DBook.category)
+
+
+def redirect_query(path: str):
+    """Current path of a moved file (Repo.redirect_path)."""
+    return select(DFileRedirect.new_path).where(DFileRedirect.old_path == path)
+
+
+def redirects_to_query(path: str, new_path: str, moved):
+    """Repoints redirects that led to ``path`` (Repo._record_redirect)."""
+    return (update(DFileRedirect).where(DFileRedirect.new_path == path)
+            .values(new_path=new_path, moved=moved))
+
+
+def blob_paths_query(digests):
+    """Digest and path of known blobs (Repo.blob_path, blob_paths, insert_books, insert_new_book)."""
+    return select(DBlob.digest, DBlob.path).where(DBlob.digest.in_(list(digests)))
+
+
+def release_blobs_query(digests):
+    """Blobs whose references are released, locked (Repo._release_blobs)."""
+    return (select(DBlob.id, DBlob.digest, DBlob.path, DBlob.refcount)
+            .where(DBlob.digest.in_(list(digests))).with_for_update())
+
+
+def referenced_blobs_query(paths):
+    """Paths a blob points at (Repo.referenced_paths)."""
+    return select(DBlob.path).where(DBlob.path.in_(list(paths)))
+
+
+def referenced_books_query(paths):
+    """Paths a book points at (Repo.referenced_paths)."""
+    return select(DBook.hashed).where(DBook.hashed.in_(list(paths))).distinct()
+
+
+def books_at_path_query(path: str):
+    """Number of books stored at a path (Repo.adopt_blob)."""
+    return select(func.count()).select_from(DBook).where(DBook.hashed == path)
+
+
+def unreferenced_blobs_query(after_id: int, limit: int):
+    """Blobs no book points at, by id (Repo.unreferenced_blobs)."""
+    used = select(DBook.id).where(DBook.file_hash == DBlob.digest).exists()
+    return select(DBlob.id, DBlob.path).where(DBlob.id > after_id, ~used).order_by(DBlob.id).limit(limit)
+
+
+def drop_blobs_query(blob_ids):
+    """Deletes the given blobs that are still unreferenced (Repo.drop_blobs)."""
+    used = select(DBook.id).where(DBook.file_hash == DBlob.digest).exists()
+    return (delete(DBlob).where(DBlob.id.in_(list(blob_ids)), ~used)
+            .returning(DBlob.digest, DBlob.path)
+            .execution_options(synchronize_session=False))
+
+
+def repoint_books_query(digest: str, path: str):
+    """Points the books of a blob at its new path (Repo.move_blobs)."""
+    return (update(DBook).where(DBook.file_hash == digest).values(hashed=path)
+            .execution_options(synchronize_session=False))
+
+
+def blobs_after_query(after_id: int, limit: int):
+    """Batch of blobs by id (Repo.blobs_after)."""
+    return (select(DBlob.id, DBlob.digest, DBlob.path)
+            .where(DBlob.id > after_id).order_by(DBlob.id).limit(limit))
+
+
+def books_after_query(after_id: int, limit: int):
+    """Batch of book paths by id (Repo.books_after)."""
+    return (select(DBook.id, DBook.hashed, DBook.file_hash)
+            .where(DBook.id > after_id).order_by(DBook.id).limit(limit))
+
+
+def books_without_blob_query(after_id: int, limit: int):
+    """Batch of legacy books without file_hash, by id (Repo.books_without_blob)."""
+    return (select(DBook.id, DBook.hashed)
+            .where(DBook.file_hash.is_(None), DBook.id > after_id)
+            .order_by(DBook.id)
+            .limit(limit))
+
+
+def issues_at_query(paths):
+    """Recorded issues of paths (Repo.record_issues)."""
+    return select(DStorageIssue).where(DStorageIssue.path.in_(list(paths)))
+
+
+def resolve_issues_query(paths, kinds, resolved):
+    """Closes the open issues of paths, of some kinds only if given (Repo.resolve_issues)."""
+    q = update(DStorageIssue).where(DStorageIssue.path.in_(list(paths)), DStorageIssue.resolved.is_(None))
+    if kinds is not None:
+        q = q.where(DStorageIssue.kind.in_(kinds))
+    return q.values(resolved=resolved)
+
+
+def open_issues_count_query():
+    """Number of open issues (Repo.storage_issues)."""
+    return select(func.count()).select_from(DStorageIssue).where(DStorageIssue.resolved.is_(None))
+
+
+def storage_issues_query(resolved: bool, limit: int):
+    """Newest issues, open ones only unless ``resolved`` (Repo.storage_issues)."""
+    q = select(DStorageIssue).order_by(desc(DStorageIssue.id)).limit(limit)
+    if not resolved:
+        q = q.where(DStorageIssue.resolved.is_(None))
+    return q
+
+
+def books_at_paths_query(paths):
+    """Ids and paths of the books stored at paths (Repo.storage_issues)."""
+    return select(DBook.id, DBook.hashed).where(DBook.hashed.in_(list(paths)))
+
+
+def claim_text_query(limit: int):
+    """Pending text extraction rows, locked without waiting (Repo.claim_text_jobs)."""
+    return (select(DBookText.digest, DBlob.path)
+            .join(DBlob, DBlob.digest == DBookText.digest)
+            .where(DBookText.status == 'pending')
+            .limit(limit)
+            .with_for_update(skip_locked=True, of=DBookText))
+
+
+def text_attempts_query(digest: str):
+    """Attempts of a text extraction row (Repo.fail_text)."""
+    return select(DBookText.attempts).where(DBookText.digest == digest)
+
+
+def reset_text_query(stale_before=None):
+    """Running text extraction rows back to pending (Repo.reset_text_jobs)."""
+    q = update(DBookText).where(DBookText.status == 'running')
+    if stale_before is not None:
+        q = q.where(DBookText.updated < stale_before)
+    return q.values(status='pending')
+
+
+def missing_text_query(now):
+    """Rows to queue for blobs without a text extraction row (Repo.queue_missing_text)."""
+    return (select(DBlob.digest, literal('pending'), literal(0), literal(now))
+            .outerjoin(DBookText, DBookText.digest == DBlob.digest)
+            .where(DBookText.id.is_(None)))
+
+
+def user_query(username: str, password: str):
+    """User with these credentials (Repo.select_user)."""
+    return select(DUser).where(DUser.username == username, DUser.password == password)
+
+
+def job_query(job_id: int):
+    """A job by id (Repo.get_job, start_job, fail_job)."""
+    return select(DJob).where(DJob.id == job_id)
+
+
+def queued_jobs_query(limit: int, kind: str = None):
+    """Oldest queued jobs, of one kind if given (Repo.queued_jobs, queued_job)."""
+    q = select(DJob.id).where(DJob.status == 'queued')
+    if kind is not None:
+        q = q.where(DJob.kind == kind)
+    return q.order_by(DJob.id).limit(limit)
+
+
+def reset_jobs_query(stale_before=None):
+    """Running jobs back to queued (Repo.reset_jobs)."""
+    q = update(DJob).where(DJob.status == 'running')
+    if stale_before is not None:
+        q = q.where(DJob.updated < stale_before)
+    return q.values(status='queued')
@@ -1,25 +1,121 @@
-from sqlalchemy import select, insert, delete, and_, desc, func
-from sqlalchemy.exc import NoResultFound, IntegrityError, SQLAlchemyError
+from contextlib import asynccontextmanager
+from sqlalchemy import select, insert, update, delete, event, case
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from shemas.database import DBook, DUser
+from sqlalchemy.orm import Session
+from shemas.database import DBook, DBlob, DBookText, DBookCount, DFileRedirect, DJob, DStorageIssue
+from shemas.search import search_query, count_query, fuzzy_query, fuzzy_count_query
+from shemas.queries import (
+    TOTAL_SCOPE, CATEGORY_SCOPE, VERSION_SCOPE, TERM_COLUMNS, export_query, category_query,
+    book_count_query, term_query, stored_counts_query, category_counts_query, redirect_query,
+    redirects_to_query, blob_paths_query, release_blobs_query, referenced_blobs_query,
+    referenced_books_query, books_at_path_query, unreferenced_blobs_query, blobs_after_query,
+    books_after_query, books_without_blob_query, issues_at_query, open_issues_count_query,
+    drop_blobs_query, repoint_books_query, resolve_issues_query, missing_text_query,
+    storage_issues_query, books_at_paths_query, claim_text_query, text_attempts_query,
+    reset_text_query, user_query, job_query, queued_jobs_query, reset_jobs_query)
+from shemas.pagination import keyset_query, make_page, anchor_query, sort_field
+from shemas.cache import cached, catalog_cache
+from shemas.uow import current as current_unit_of_work
+from services.metrics import TimedQueuePool, instrument_engine, track_queries
 import os
+from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
 
 
-engine = create_async_engine(f"mysql+asyncmy://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
-                                   f"@{os.getenv('DB_HOST')}/{os.getenv('DB_DATABASE')}", echo=True)
+# DATABASE_URL overrides the MariaDB settings (tests run against sqlite+aiosqlite).
+engine = create_async_engine(os.getenv('DATABASE_URL')
+                             or f"mysql+asyncmy://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+                                f"@{os.getenv('DB_HOST')}/{os.getenv('DB_DATABASE')}",
+                             poolclass=TimedQueuePool,
+                             # Per worker process: the server needs workers * (size + overflow) connections.
+                             pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+                             max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+                             # Below MariaDB's wait_timeout, so idle pooled connections are never found closed.
+                             pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 3600)))
+instrument_engine(engine)
 new_session = async_sessionmaker(engine, expire_on_commit=False)
 
 
+@asynccontextmanager
+async def session_scope(session: AsyncSession = None):
+    """Session a Repo method runs its statements in.
+
+        An explicitly passed session is used as is. Inside a request the
+        request's unit of work is joined (see shemas.uow), so a whole request
+        checks out at most one connection. Otherwise a new session is opened and
+        its transaction committed on exit. On error the transaction is rolled back.
+        """
+    if session is None:
+        uow = current_unit_of_work()
+        session = uow.session if uow is not None else None
+    if session is None:
+        async with new_session() as session:
+            async with session.begin():
+                yield session
+        return
+    try:
+        yield session
+    except Exception:
+        await session.rollback()
+        raise
+
+
+catalog_listeners = []
+
+
+def catalog_changed(session: AsyncSession, added=(), removed=()):
+    """Marks the session's transaction as changing the catalog; catalog_cache is cleared on commit.
+
+        Args:
+            session (AsyncSession): Session whose transaction changes the catalog.
+            added: Book dicts (title, autor, category) inserted by the transaction.
+            removed: Book rows or dicts (title, autor, category) deleted by it.
+        """
+    session.info['catalog_changed'] = True
+    session.info.setdefault('catalog_added', []).extend(added)
+    session.info.setdefault('catalog_removed', []).extend(removed)
+
+
+def on_catalog_commit(callback):
+    """Registers ``callback(added, removed)``, called after every commit that changed the catalog."""
+    catalog_listeners.append(callback)
+    return callback
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_catalog(session):
+    if session.info.pop('catalog_changed', False):
+        catalog_cache.clear()
+        added = session.info.pop('catalog_added', [])
+        removed = session.info.pop('catalog_removed', [])
+        for callback in catalog_listeners:
+            try:
+                callback(added, removed)
+            except Exception as e:
+                print("error", e)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _keep_catalog(session):
+    for key in ('catalog_changed', 'catalog_added', 'catalog_removed'):
+        session.info.pop(key, None)
+
+
+@track_queries
 class Repo:
 
     @classmethod
-    async def category(cls, session: AsyncSession):
+    @cached
+    async def category(cls, *, session: AsyncSession = None):
         """Fetches unique categories from DBook table.
 
+            Cached in catalog_cache, invalidated by insert_new_book and drop_file.
+
             Args:
-                session (AsyncSession): Async SQLAlchemy session.
+                session (AsyncSession): Session to use, defaults to the request's unit of work.
 
             Returns:
                 list: Unique category values from DBook.
@@ -28,163 +124,691 @@ class Repo:
                 SQLAlchemyError: If query execution fails.
                 Exception: For unexpected errors.
             """
-        q = select(DBook.category).distinct()
-        result = await session.execute(q)
-        return result.scalars().all()
+        async with session_scope(session) as session:
+            result = await session.execute(category_query())
+            return result.scalars().all()
 
 
     @classmethod
-    async def count_books(cls, session: AsyncSession):
-        """Counts the total number of books in the DBook table.
+    @cached
+    async def count_books(cls, category: str = None, *, session: AsyncSession = None):
+        """Returns the number of books in the catalog or in one category.
+
+            Reads the maintained book_count row (a single unique-key lookup)
+            instead of running COUNT(*) over DBook. Cached in catalog_cache,
+            invalidated by insert_new_book and drop_file.
 
             Args:
-                session (AsyncSession): Async SQLAlchemy session.
+                category (str): Category name, None for the whole catalog.
+                session (AsyncSession): Session to use, defaults to the request's unit of work.
 
             Returns:
-                int: Total count of books.
+                int: Number of books.
 
             Raises:
                 SQLAlchemyError: If query execution fails.
                 Exception: For unexpected errors.
             """
-        q = select(func.count()).select_from(DBook)
-        result = await session.execute(q)
-        return result.scalar_one()
+        async with session_scope(session) as session:
+            scope = TOTAL_SCOPE if category is None else CATEGORY_SCOPE
+            result = await session.execute(book_count_query(scope, category or ''))
+            return result.scalar_one_or_none() or 0
+
+
+    @classmethod
+    async def suggest_terms(cls, *, session: AsyncSession = None):
+        """Distinct categories, authors and titles with their number of books, most used first.
+
+            Returns:
+                list: (kind, value, count) tuples, kind is 'category', 'author' or 'title'.
+            """
+        terms = []
+        async with session_scope(session) as session:
+            for kind, column in TERM_COLUMNS:
+                result = await session.execute(term_query(column))
+                terms += [(kind, value, count) for value, count in result.all() if value]
+        return terms
 
 
     @classmethod
-    async def sorted_recent(cls, session: AsyncSession, page: int, per_page):
-        """Fetches books sorted by recent ID with pagination.
+    async def _bump_counts(cls, session: AsyncSession, deltas: dict):
+        """Applies per-category deltas (and their sum) to book_count in the caller's transaction.
+
+            Args:
+                session (AsyncSession): Session with an open transaction.
+                deltas (dict): category -> change in the number of books.
+            """
+        deltas = {category: delta for category, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        rows = [{'scope': CATEGORY_SCOPE, 'category': category, 'total': delta}
+                for category, delta in deltas.items()]
+        rows.append({'scope': TOTAL_SCOPE, 'category': '', 'total': sum(deltas.values())})
+        rows.append({'scope': VERSION_SCOPE, 'category': '', 'total': 1})
+        q = mysql_insert(DBookCount).values(rows)
+        await session.execute(q.on_duplicate_key_update(total=DBookCount.total + q.inserted.total))
+
+
+    @classmethod
+    async def _bump_version(cls, session: AsyncSession):
+        """Increments the catalog version in the caller's transaction (see catalog_version)."""
+        result = await session.execute(
+            update(DBookCount).where(DBookCount.scope == VERSION_SCOPE, DBookCount.category == '')
+            .values(total=DBookCount.total + 1))
+        if result.rowcount == 0:
+            await session.execute(insert(DBookCount).values(scope=VERSION_SCOPE, category='', total=1))
+
+
+    @classmethod
+    async def _record_redirect(cls, session: AsyncSession, old_path: str, new_path: str):
+        """Remembers that the file at old_path now lives at new_path (see redirect_path).
+
+            Redirects that led to old_path are repointed too, so a file moved
+            twice still takes a single redirect.
+            """
+        now = datetime.now()
+        await session.execute(redirects_to_query(old_path, new_path, now))
+        await session.execute(delete(DFileRedirect).where(DFileRedirect.old_path == new_path))
+        result = await session.execute(
+            update(DFileRedirect).where(DFileRedirect.old_path == old_path)
+            .values(new_path=new_path, moved=now))
+        if result.rowcount == 0:
+            await session.execute(
+                insert(DFileRedirect).values(old_path=old_path, new_path=new_path, moved=now))
+
+
+    @classmethod
+    async def redirect_path(cls, path: str, *, session: AsyncSession = None):
+        """Returns the current path of a file that has been moved.
+
+            Args:
+                path (str): Former path relative to files/.
+
+            Returns:
+                str: Path the file was moved to, None if it never was.
+            """
+        async with session_scope(session) as session:
+            result = await session.execute(redirect_query(path))
+            return result.scalar_one_or_none()
+
+
+    @classmethod
+    async def catalog_version(cls, *, session: AsyncSession = None):
+        """Returns the catalog version, shared by all processes.
+
+            The 'version' row of book_count is incremented by every transaction
+            that changes what the listing pages show (_bump_counts, moves of
+            stored files), so it changes as soon as any process commits such a
+            change. Deliberately not cached: it is what tells this process that
+            its cached pages are stale.
+
+            Returns:
+                int: Current version (0 before the first change).
+            """
+        async with session_scope(session) as session:
+            result = await session.execute(book_count_query(VERSION_SCOPE))
+            return result.scalar_one_or_none() or 0
+
+
+    @classmethod
+    async def reconcile_counts(cls, *, session: AsyncSession = None):
+        """Rebuilds book_count from DBook and reports the rows that had drifted.
+
+            The counter rows are locked first, so writers that bump them wait for
+            the rebuild and the COUNT(*) snapshot taken afterwards includes every
+            book they committed before.
+
+            Returns:
+                list: (scope, category, stored, actual) tuples for counters that differed.
+            """
+        async with session_scope(session) as session:
+            stored = {(scope, category): total for scope, category, total in (await session.execute(
+                stored_counts_query())).all()}
+            actual = {(CATEGORY_SCOPE, category): total for category, total in (await session.execute(
+                category_counts_query())).all()}
+            actual[(TOTAL_SCOPE, '')] = sum(actual.values())
+            drift = [(scope, category, stored.get((scope, category), 0), total)
+                     for (scope, category), total in actual.items()
+                     if stored.get((scope, category)) != total]
+            drift += [(scope, category, total, 0) for (scope, category), total in stored.items()
+                      if (scope, category) not in actual]
+            await session.execute(delete(DBookCount).where(DBookCount.scope != VERSION_SCOPE))
+            await session.execute(insert(DBookCount).values(
+                [{'scope': scope, 'category': category, 'total': total}
+                 for (scope, category), total in actual.items()]))
+            await cls._bump_version(session)
+            catalog_changed(session)
+        return drift
+
+
+    @classmethod
+    async def sorted_recent(cls, per_page: int, cursor=None, *, session: AsyncSession = None):
+        """Fetches books sorted by recent ID with keyset pagination.
+
+            The page is located by seeking on the primary key instead of OFFSET,
+            so every page costs the same regardless of its depth.
 
             Args:
                 cls: Class reference (unused).
-                session (AsyncSession): Async SQLAlchemy session.
-                page (int): Page number for pagination.
                 per_page (int): Number of items per page.
+                cursor: Decoded cursor (see shemas.pagination.decode_cursor), None for the first page.
+                session (AsyncSession): Session to use, defaults to the request's unit of work.
 
             Returns:
-                list: List of DBook objects sorted by ID in descending order.
+                Page: DBook objects sorted by ID in descending order with next/prev cursors.
 
             Raises:
                 SQLAlchemyError: If query execution fails.
                 Exception: For unexpected errors.
             """
-        offset = (page - 1) * per_page
-        q = select(DBook).order_by(desc(DBook.id)).offset(offset).limit(per_page)
-        result = await session.execute(q)
-        return result.scalars().all()
+        async with session_scope(session) as session:
+            q, direction = keyset_query(DBook.id, per_page, cursor)
+            result = await session.execute(q)
+            return make_page(DBook.id, result.scalars().all(), per_page, direction, cursor is not None)
+
+
+    @classmethod
+    @cached
+    async def page_anchors(cls, per_page: int, link: str = None, name: str = None, *,
+                           session: AsyncSession = None):
+        """Returns the (sort value, id) key of the first row of every page.
+
+            Anchors are computed in one pass and kept in catalog_cache until the
+            catalog changes, so jump-to-page links stay cheap.
+
+            Args:
+                per_page (int): Number of items per page.
+                link (str): Sort field, None for the main listing (by ID).
+                name (str): Category filter, None for the main listing.
+                session (AsyncSession): Session to use, defaults to the request's unit of work.
+
+            Returns:
+                list: Anchor keys, anchors[n - 1] starts page n.
+            """
+        async with session_scope(session) as session:
+            result = await session.execute(anchor_query(sort_field(link), per_page, name))
+            return [tuple(row) for row in result.all()]
+
+
+    @classmethod
+    async def blob_path(cls, digest: str, *, session: AsyncSession = None):
+        """Returns the stored path of a blob by content digest.
+
+            Args:
+                digest (str): SHA-256 of the file contents.
+
+            Returns:
+                str: Path relative to files/, None if the content is not stored yet.
+            """
+        async with session_scope(session) as session:
+            row = (await session.execute(blob_paths_query([digest]))).first()
+            return row.path if row else None
 
 
     @classmethod
-    async def insert_new_book(cls, items):
-        """Inserts a new book into the DBook table.
+    async def insert_new_book(cls, items: dict, digest: str = None, size: int = 0, *,
+                              session: AsyncSession = None):
+        """Inserts a new book into the DBook table and references its blob.
+
+            The blob row is upserted in the same transaction: a new digest is
+            registered with refcount 1, a known one gets its refcount incremented
+            and the book points at the already stored path. A pending DBookText
+            row is queued for text extraction.
 
             Args:
                 cls: Class reference (unused).
-                items: Dictionary or list of dictionaries with book data to insert.
+                items (dict): Book data; ``hashed`` is the path the file was stored under.
+                digest (str): SHA-256 of the file contents, None for books without a blob.
+                size (int): File size in bytes.
+
+            Returns:
+                str: Path the book points at (differs from items['hashed'] if the
+                     same content was stored concurrently under another path).
 
             Raises:
                 Exception: If insertion fails, with rollback performed.
             """
-        async with new_session() as session:
-            async with session.begin():
-                try:
-                    q = insert(DBook).values(items)
-                    await session.execute(q)
-                    await session.commit()
-                    return
-                except Exception as e:
-                    await session.rollback()
-                    raise e
+        async with session_scope(session) as session:
+            if digest is not None:
+                q = (mysql_insert(DBlob)
+                     .values(digest=digest, path=items['hashed'], size=size, refcount=1)
+                     .on_duplicate_key_update(refcount=DBlob.refcount + 1))
+                await session.execute(q)
+                path = (await session.execute(blob_paths_query([digest]))).one().path
+                items = {**items, 'hashed': path, 'file_hash': digest}
+                await session.execute(
+                    mysql_insert(DBookText).prefix_with('IGNORE')
+                    .values(digest=digest, status='pending', updated=datetime.now()))
+            await session.execute(insert(DBook).values(items))
+            await cls._bump_counts(session, {items['category']: 1})
+            catalog_changed(session, added=[items])
+        return items['hashed']
+
+
+    @classmethod
+    async def blob_paths(cls, digests, *, session: AsyncSession = None):
+        """Returns the stored paths of already known digests.
+
+            Args:
+                digests: Iterable of SHA-256 digests.
+
+            Returns:
+                dict: digest -> path for the digests that are stored.
+            """
+        digests = list(digests)
+        if not digests:
+            return {}
+        async with session_scope(session) as session:
+            result = await session.execute(blob_paths_query(digests))
+            return {digest: path for digest, path in result.all()}
+
+
+    @classmethod
+    async def insert_books(cls, books, *, session: AsyncSession = None):
+        """Inserts many books and their blobs in one transaction with multi-row statements.
+
+            Args:
+                cls: Class reference (unused).
+                books: List of (items dict, digest, size) tuples, ``items['hashed']``
+                    is the path the file was stored under.
+
+            Returns:
+                dict: digest -> path the books now point at.
+
+            Raises:
+                Exception: If insertion fails, with rollback performed.
+            """
+        if not books:
+            return {}
+        blobs = {}
+        for items, digest, size in books:
+            blob = blobs.setdefault(digest, {'digest': digest, 'path': items['hashed'],
+                                             'size': size, 'refcount': 0})
+            blob['refcount'] += 1
+        async with session_scope(session) as session:
+            q = mysql_insert(DBlob).values(list(blobs.values()))
+            await session.execute(q.on_duplicate_key_update(
+                refcount=DBlob.refcount + q.inserted.refcount))
+            result = await session.execute(blob_paths_query(blobs))
+            paths = {digest: path for digest, path in result.all()}
+            rows = [{**items, 'hashed': paths[digest], 'file_hash': digest}
+                    for items, digest, _ in books]
+            await session.execute(insert(DBook).values(rows))
+            deltas = {}
+            for row in rows:
+                deltas[row['category']] = deltas.get(row['category'], 0) + 1
+            await cls._bump_counts(session, deltas)
+            now = datetime.now()
+            await session.execute(
+                mysql_insert(DBookText).prefix_with('IGNORE')
+                .values([{'digest': digest, 'status': 'pending', 'updated': now} for digest in blobs]))
+            catalog_changed(session, added=rows)
+        return paths
 
 
     @classmethod
-    async def drop_file(cls, ssid):
-        """Deletes a book record from the DBook table by ID.
+    async def drop_file(cls, ssid, *, session: AsyncSession = None):
+        """Deletes a book record from the DBook table by ID and releases its blob.
+
+            The blob refcount is decremented in the same transaction; when it
+            reaches zero the blob row is removed and its path is returned so the
+            caller can unlink the file.
 
             Args:
                 cls: Class reference (unused).
                 ssid: ID of the book record to delete (converted to int).
+                session (AsyncSession): Session to use, defaults to the request's unit of work.
 
             Returns:
-                str: Success message if deletion succeeds, error message if record not found,
-                     False if an exception occurs.
+                tuple: (message, path of the file to remove or None). The message is
+                       False if an exception occurs.
 
             Raises:
                 ValueError: If ssid cannot be converted to an integer.
-                NoResultFound: If no record matches the given ID.
-                IntegrityError: If deletion violates database constraints.
-                SQLAlchemyError: If other database errors occur.
             """
         ssid = int(ssid)
-        async with new_session() as session:
-            try:
-                query = select(DBook).where(DBook.id == int(ssid))   # type: ignore
-                result = await session.execute(query)
-                record = result.scalar_one_or_none()
-                if record is None:
-                    return f"Файл с указанным идентификатором {ssid} не найден."
-                delete_query = delete(DBook).where(DBook.id == int(ssid))   # type: ignore
-                await session.execute(delete_query)
-                await session.commit()
-                return f"Файл с указанным идентификатором {ssid} успешно удалён!"
-
-            except (ValueError, NoResultFound, IntegrityError, SQLAlchemyError) as e:
-                print("error", e)
-                await session.rollback()
-                return False
+        try:
+            deleted, orphans = await cls.drop_books([ssid], session=session)
+        except (IntegrityError, SQLAlchemyError) as e:
+            print("error", e)
+            return False, None
+        if not deleted:
+            return f"Файл с указанным идентификатором {ssid} не найден.", None
+        return f"Файл с указанным идентификатором {ssid} успешно удалён!", (orphans or [None])[0]
+
+
+    @classmethod
+    async def drop_books(cls, ids, *, session: AsyncSession = None):
+        """Deletes many books with one DELETE ... RETURNING and releases their blobs.
+
+            Counters and blob refcounts are updated in the same transaction.
+
+            Args:
+                ids: Iterable of DBook ids.
+                session (AsyncSession): Session to use, defaults to the request's unit of work.
+
+            Returns:
+                tuple: (ids that were deleted, paths of files nothing references any more).
+            """
+        ids = sorted({int(i) for i in ids})
+        if not ids:
+            return [], []
+        async with session_scope(session) as session:
+            result = await session.execute(
+                delete(DBook).where(DBook.id.in_(ids))
+                .returning(DBook.id, DBook.title, DBook.autor, DBook.category, DBook.file_hash,
+                           DBook.hashed)
+                .execution_options(synchronize_session=False))
+            rows = result.all()
+            if not rows:
+                return [], []
+            deltas = {}
+            for row in rows:
+                deltas[row.category] = deltas.get(row.category, 0) - 1
+            await cls._bump_counts(session, deltas)
+            orphans = await cls._release_blobs(session, rows)
+            catalog_changed(session, removed=[row._mapping for row in rows])
+            return [row.id for row in rows], orphans
+
+
+    @classmethod
+    async def _release_blobs(cls, session: AsyncSession, rows):
+        """Drops the blob references of deleted books, returns paths nothing uses any more.
+
+            Args:
+                session (AsyncSession): Session with an open transaction.
+                rows: Deleted rows with file_hash and hashed attributes.
+            """
+        releases = {}
+        legacy = set()
+        for row in rows:
+            if row.file_hash is None:
+                legacy.add(row.hashed)
+            else:
+                releases[row.file_hash] = releases.get(row.file_hash, 0) + 1
+        orphans = []
+        if releases:
+            blobs = (await session.execute(release_blobs_query(releases))).all()
+            gone = [blob for blob in blobs if blob.refcount <= releases[blob.digest]]
+            if gone:
+                await session.execute(delete(DBlob).where(DBlob.id.in_([blob.id for blob in gone])))
+                orphans += [blob.path for blob in gone]
+            by_delta = {}
+            for blob in blobs:
+                if blob.refcount > releases[blob.digest]:
+                    by_delta.setdefault(releases[blob.digest], []).append(blob.id)
+            for delta, blob_ids in by_delta.items():
+                await session.execute(
+                    update(DBlob).where(DBlob.id.in_(blob_ids)).values(refcount=DBlob.refcount - delta))
+        if legacy:
+            orphans += sorted(legacy - await cls.referenced_paths(legacy, session=session))
+        return orphans
+
+
+    @classmethod
+    async def referenced_paths(cls, paths, *, session: AsyncSession = None):
+        """Returns the subset of ``paths`` that a blob or a book still points at.
+
+            Args:
+                paths: Iterable of paths relative to files/.
+                session (AsyncSession): Session to use, defaults to the request's unit of work.
+
+            Returns:
+                set: Referenced paths.
+            """
+        paths = list(paths)
+        if not paths:
+            return set()
+        async with session_scope(session) as session:
+            blobs = await session.execute(referenced_blobs_query(paths))
+            books = await session.execute(referenced_books_query(paths))
+            return set(blobs.scalars()) | set(books.scalars())
+
+
+    @classmethod
+    async def unreferenced_blobs(cls, limit: int, after_id: int = 0, *, session: AsyncSession = None):
+        """Blobs no book points at (left behind by crashes or manual edits), ordered by id.
+
+            Returns:
+                list: (id, path) tuples.
+            """
+        async with session_scope(session) as session:
+            result = await session.execute(unreferenced_blobs_query(after_id, limit))
+            return [tuple(row) for row in result.all()]
+
+
+    @classmethod
+    async def drop_blobs(cls, blob_ids, *, session: AsyncSession = None):
+        """Deletes blobs that are still unreferenced, with their extracted text.
+
+            Returns:
+                list: Paths of the deleted blobs.
+            """
+        blob_ids = list(blob_ids)
+        if not blob_ids:
+            return []
+        async with session_scope(session) as session:
+            result = await session.execute(drop_blobs_query(blob_ids))
+            rows = result.all()
+            if rows:
+                await session.execute(
+                    delete(DBookText).where(DBookText.digest.in_([row.digest for row in rows])))
+            return [row.path for row in rows]
+
+
+    @classmethod
+    async def blobs_after(cls, after_id: int, limit: int, *, session: AsyncSession = None):
+        """Blobs ordered by id, for batch walks over the store.
+
+            Returns:
+                list: (id, digest, path) tuples.
+            """
+        async with session_scope(session) as session:
+            result = await session.execute(blobs_after_query(after_id, limit))
+            return [tuple(row) for row in result.all()]
+
+
+    @classmethod
+    async def books_after(cls, after_id: int, limit: int, *, session: AsyncSession = None):
+        """Books ordered by id, for batch walks over the stored paths.
+
+            Returns:
+                list: (id, stored path, file_hash) tuples.
+            """
+        async with session_scope(session) as session:
+            result = await session.execute(books_after_query(after_id, limit))
+            return [tuple(row) for row in result.all()]
+
+
+    @classmethod
+    async def record_issues(cls, issues, *, session: AsyncSession = None):
+        """Stores verification failures, one row per path.
+
+            A path already listed gets the new findings and is reopened if it
+            had been resolved; its detection time is kept.
+
+            Args:
+                issues: List of dicts with path, kind, expected, actual and detail.
+            """
+        if not issues:
+            return
+        now = datetime.now()
+        async with session_scope(session) as session:
+            result = await session.execute(issues_at_query(issue['path'] for issue in issues))
+            known = {row.path: row for row in result.scalars()}
+            for issue in issues:
+                row = known.get(issue['path'])
+                if row is None:
+                    session.add(DStorageIssue(**issue, detected=now, checked=now))
+                    continue
+                for key, value in issue.items():
+                    setattr(row, key, value)
+                row.checked = now
+                row.resolved = None
 
 
     @classmethod
-    async def search_book(cls, search, temp):
-        """Searches books in the DBook table based on a field and term.
+    async def resolve_issues(cls, paths, kinds=None, *, session: AsyncSession = None):
+        """Closes open issues of paths that verified again.
+
+            Args:
+                paths: Paths that passed verification.
+                kinds: Only close issues of these kinds (None: any), e.g. ('missing',)
+                    when only the existence of the file was checked.
+            """
+        if not paths:
+            return
+        async with session_scope(session) as session:
+            await session.execute(resolve_issues_query(paths, kinds, datetime.now()))
+
+
+    @classmethod
+    async def storage_issues(cls, resolved: bool = False, limit: int = 500, *,
+                             session: AsyncSession = None):
+        """Verification failures with the ids of the books stored at each path.
+
+            Args:
+                resolved (bool): Include issues that have been resolved.
+                limit (int): Maximum number of issues, newest first.
+
+            Returns:
+                tuple: (number of open issues, list of (DStorageIssue, book ids) tuples).
+            """
+        async with session_scope(session) as session:
+            opened = (await session.execute(open_issues_count_query())).scalar_one()
+            issues = (await session.execute(storage_issues_query(resolved, limit))).scalars().all()
+            books = {}
+            if issues:
+                result = await session.execute(books_at_paths_query(issue.path for issue in issues))
+                for book_id, path in result.all():
+                    books.setdefault(path, []).append(book_id)
+            return opened, [(issue, books.get(issue.path, [])) for issue in issues]
+
+
+    @classmethod
+    async def move_blobs(cls, moves, *, session: AsyncSession = None):
+        """Repoints blobs and their books to new paths in one transaction.
+
+            Each old path is recorded in file_redirect, so links to it keep working.
+
+            Args:
+                moves: List of (digest, old path, new path) tuples.
+
+            Returns:
+                int: Number of books repointed.
+            """
+        books = 0
+        async with session_scope(session) as session:
+            for digest, old_path, new_path in moves:
+                await session.execute(
+                    update(DBlob).where(DBlob.digest == digest, DBlob.path == old_path)
+                    .values(path=new_path))
+                result = await session.execute(repoint_books_query(digest, new_path))
+                books += result.rowcount
+                await cls._record_redirect(session, old_path, new_path)
+            if moves:
+                await cls._bump_version(session)
+                catalog_changed(session)
+        return books
+
+
+    @classmethod
+    async def search_book(cls, search, temp, page: int = 1, per_page: int = 20, *,
+                          session: AsyncSession = None):
+        """Full-text search over DBook ranked by relevance, with pagination.
+
+            Uses the FULLTEXT indexes on DBook (see shemas.search), so the cost
+            does not grow with the size of the table the way LIKE '%term%' did.
 
             Args:
                 cls: Class reference (unused).
-                search: Search term to match (string).
-                temp (str): Field to search in ('title', 'category', or 'author').
+                search: Search string, may contain field prefixes (``author:Толстой``).
+                temp (str): Field for terms without prefix ('title', 'category', 'author' or 'all').
+                page (int): Page number for pagination.
+                per_page (int): Number of items per page.
+                session (AsyncSession): Session to use, defaults to the request's unit of work.
 
             Returns:
-                list: List of matching DBook objects if found.
+                list: List of matching DBook objects, best matches first.
                 str: Error message if search term is empty.
                 None: If no results found.
                 False: If an error occurs.
 
             Raises:
-                ValueError: If search term processing fails.
-                NoResultFound: If no records match.
-                IntegrityError: If database constraint violation occurs.
-                SQLAlchemyError: If other database errors occur.
+                SQLAlchemyError: If query execution fails (handled, returns False).
             """
         if not search:
             return "Ошибка при поиске книг"
-        async with new_session() as session:
-            try:
-                if temp == "title":
-                    q = select(DBook).order_by(desc(DBook.id)).where(DBook.title.like(f"%{search}%"))
-                if temp == "category":
-                    q = select(DBook).order_by(desc(DBook.id)).where(DBook.category.like(f"%{search}%"))
-                if temp == "author":
-                    q = select(DBook).order_by(desc(DBook.id)).where(DBook.autor.like(f"%{search}%"))
+        q = search_query(search, temp, page, per_page)
+        if q is None:
+            return None
+        try:
+            async with session_scope(session) as session:
                 result = await session.execute(q)
                 answer = result.scalars().all()
-                await session.commit()
-                if not answer:
-                    return None
-                return answer
-            except ValueError:
-                return False
-            except NoResultFound:
-                return False
-            except IntegrityError:
-                await session.rollback()
-                return False
-            except SQLAlchemyError:
-                await session.rollback()
-                return False
-
-    @classmethod
-    async def select_user(cls, username, password):
+            if not answer:
+                return None
+            return answer
+        except SQLAlchemyError as e:
+            print("error", e)
+            return False
+
+
+    @classmethod
+    async def books_by_values(cls, scores, page: int = 1, per_page: int = 20, *,
+                              session: AsyncSession = None):
+        """Books whose title, author or category equals a fuzzy search value.
+
+            Args:
+                scores: Dict of (kind, value) -> similarity, kind is 'title', 'author' or 'category'.
+                page (int): Page number for pagination.
+                per_page (int): Number of items per page.
+
+            Returns:
+                list: DBook objects ranked by their best matching value, newest first among equals.
+            """
+        q = fuzzy_query(scores, page, per_page)
+        if q is None:
+            return []
+        async with session_scope(session) as session:
+            return (await session.execute(q)).scalars().all()
+
+
+    @classmethod
+    async def count_by_values(cls, scores, *, session: AsyncSession = None):
+        """Counts books matching fuzzy search values (see books_by_values).
+
+            Returns:
+                int: Number of matching books.
+            """
+        q = fuzzy_count_query(scores)
+        if q is None:
+            return 0
+        async with session_scope(session) as session:
+            return (await session.execute(q)).scalar_one()
+
+
+    @classmethod
+    async def count_search(cls, search, temp, *, session: AsyncSession = None):
+        """Counts books matching a full-text search.
+
+            Args:
+                search: Search string.
+                temp (str): Field for terms without prefix.
+                session (AsyncSession): Session to use, defaults to the request's unit of work.
+
+            Returns:
+                int: Number of matching books (0 if the query has no searchable terms).
+            """
+        async with session_scope(session) as session:
+            q = count_query(search, temp)
+            if q is None:
+                return 0
+            result = await session.execute(q)
+            return result.scalar_one()
+
+    @classmethod
+    async def select_user(cls, username, password, *, session: AsyncSession = None):
         """Checks if a user exists with the given username and password.
 
             Args:
@@ -199,9 +823,8 @@ class Repo:
                 SQLAlchemyError: If query execution fails.
                 Exception: For unexpected errors.
             """
-        async with new_session() as session:
-            q = select(DUser).where(and_(DUser.username == username, DUser.password == password))
-            result = await session.execute(q)
+        async with session_scope(session) as session:
+            result = await session.execute(user_query(username, password))
             answer = result.scalar()
             if answer is None:
                 return None
@@ -209,34 +832,310 @@ class Repo:
 
 
     @classmethod
-    async def all_query(cls, session: AsyncSession, page: int, per_page: int, link: str, name: str):
-        """Fetches books from DBook with pagination, filtering, and sorting.
+    async def stream_books(cls, category: str = None, author: str = None, date_from=None, date_to=None,
+                           batch_size: int = 1000):
+        """Streams DBook rows from a server-side cursor, ordered by ID.
+
+            Rows are fetched ``batch_size`` at a time as plain tuples, so memory stays
+            flat no matter how many rows match. The generator opens its own
+            session, which stays open until it is exhausted or closed: the body is
+            streamed after the request's unit of work has ended.
+
+            Args:
+                category (str): Exact category filter.
+                author (str): Exact author filter.
+                date_from (datetime): Lower bound for date_created (inclusive).
+                date_to (datetime): Upper bound for date_created (exclusive).
+                batch_size (int): Rows per fetch.
+
+            Yields:
+                list: Batches of Row objects with EXPORT_COLUMNS fields.
+            """
+        q = export_query(category, author, date_from, date_to)
+        async with new_session() as session:
+            result = await session.stream(q.execution_options(yield_per=batch_size))
+            async for partition in result.partitions():
+                yield partition
+
+
+    @classmethod
+    async def all_query(cls, per_page: int, link: str, name: str, cursor=None, *,
+                        session: AsyncSession = None):
+        """Fetches books of one category with keyset pagination and sorting.
 
             Args:
                 cls: Class reference (unused).
-                session (AsyncSession): Async SQLAlchemy session.
-                page (int): Page number for pagination.
                 per_page (int): Number of items per page.
                 link (str): Field name to sort by (e.g., 'title', 'author').
                 name (str): Category name to filter by.
+                cursor: Decoded cursor, None for the first page.
+                session (AsyncSession): Session to use, defaults to the request's unit of work.
 
             Returns:
-                list: List of DBook objects matching the filter and sort criteria.
+                Page: DBook objects matching the filter and sort criteria with next/prev cursors.
 
             Raises:
                 ValueError: If the specified sorting field is invalid.
                 SQLAlchemyError: If query execution fails.
                 Exception: For unexpected errors.
             """
-        offset_value = (page - 1) * per_page
-        order_field = getattr(DBook, link, None)
-        if order_field is None:
-            raise ValueError(f"Invalid field '{link}' for ordering")
-        q = (select(DBook)
-             .filter(DBook.category == name)     # type: ignore
-             .order_by(desc(order_field))
-             .offset(offset_value)
-             .limit(per_page))
-
-        result = await session.execute(q)
-        return result.scalars().all()
+        async with session_scope(session) as session:
+            order_field = sort_field(link)
+            q, direction = keyset_query(order_field, per_page, cursor, name)
+            result = await session.execute(q)
+            return make_page(order_field, result.scalars().all(), per_page, direction, cursor is not None)
+
+
+    @classmethod
+    async def claim_text_jobs(cls, limit: int, *, session: AsyncSession = None):
+        """Marks up to ``limit`` pending text extraction rows as running.
+
+            Rows are locked with SKIP LOCKED, so several workers can claim in parallel.
+
+            Args:
+                limit (int): Maximum number of rows to claim.
+
+            Returns:
+                list: (digest, stored path) tuples.
+            """
+        async with session_scope(session) as session:
+            rows = [tuple(row) for row in (await session.execute(claim_text_query(limit))).all()]
+            if rows:
+                await session.execute(
+                    update(DBookText)
+                    .where(DBookText.digest.in_([digest for digest, _ in rows]))
+                    .values(status='running', attempts=DBookText.attempts + 1, updated=datetime.now()))
+            return rows
+
+
+    @classmethod
+    async def save_text(cls, digest: str, content, status: str = 'done', *,
+                        session: AsyncSession = None):
+        """Stores extracted text for a blob.
+
+            Args:
+                digest (str): Blob digest.
+                content (str): Extracted text or None.
+                status (str): Final status ('done' or 'skipped').
+            """
+        async with session_scope(session) as session:
+            await session.execute(
+                update(DBookText).where(DBookText.digest == digest)
+                .values(content=content, status=status, error=None, updated=datetime.now()))
+
+
+    @classmethod
+    async def fail_text(cls, digest: str, error: str, max_attempts: int, *,
+                        session: AsyncSession = None):
+        """Records a failed extraction; the row goes back to pending until max_attempts."""
+        async with session_scope(session) as session:
+            result = await session.execute(text_attempts_query(digest))
+            attempts = result.scalar_one_or_none() or 0
+            status = 'failed' if attempts >= max_attempts else 'pending'
+            await session.execute(
+                update(DBookText).where(DBookText.digest == digest)
+                .values(status=status, error=error, updated=datetime.now()))
+
+
+    @classmethod
+    async def release_text(cls, digest: str, *, session: AsyncSession = None):
+        """Returns a claimed row to 'pending' and gives back the attempt its claim charged.
+
+            For documents interrupted through no fault of their own (another
+            document broke the worker pool they were running in).
+            """
+        async with session_scope(session) as session:
+            await session.execute(
+                update(DBookText).where(DBookText.digest == digest, DBookText.status == 'running')
+                .values(status='pending', updated=datetime.now(),
+                        attempts=case((DBookText.attempts > 0, DBookText.attempts - 1), else_=0)))
+
+
+    @classmethod
+    async def reset_text_jobs(cls, stale_before: datetime = None, *, session: AsyncSession = None):
+        """Returns rows left 'running' by a crashed process to 'pending'.
+
+            Args:
+                stale_before (datetime): Only rows claimed before this time, so rows
+                    other worker processes are extracting right now are left alone
+                    (None: all running rows).
+            """
+        async with session_scope(session) as session:
+            await session.execute(reset_text_query(stale_before))
+
+
+    @classmethod
+    async def queue_missing_text(cls, *, session: AsyncSession = None):
+        """Queues text extraction for every blob that has no DBookText row yet.
+
+            Returns:
+                int: Number of rows queued.
+            """
+        async with session_scope(session) as session:
+            result = await session.execute(insert(DBookText).from_select(
+                ['digest', 'status', 'attempts', 'updated'], missing_text_query(datetime.now())))
+            return result.rowcount
+
+
+    @classmethod
+    async def books_without_blob(cls, limit: int, after_id: int = 0, *,
+                                 session: AsyncSession = None):
+        """Legacy books stored before content addressing (file_hash is NULL).
+
+            Returns:
+                list: (id, stored path) tuples ordered by id.
+            """
+        async with session_scope(session) as session:
+            result = await session.execute(books_without_blob_query(after_id, limit))
+            return [tuple(row) for row in result.all()]
+
+
+    @classmethod
+    async def adopt_blob(cls, book_id: int, digest: str, size: int, *,
+                         session: AsyncSession = None):
+        """Attaches a legacy book to the blob store.
+
+            If the same content is already stored under another path, the book is
+            repointed to it, the move is recorded in file_redirect and its own file
+            is returned for removal when no other book references it.
+
+            Args:
+                book_id (int): DBook id.
+                digest (str): SHA-256 of the book's file.
+                size (int): File size in bytes.
+
+            Returns:
+                str: Path of a file that is no longer referenced, or None.
+            """
+        async with session_scope(session) as session:
+            book = (await session.execute(select(DBook).where(DBook.id == book_id))).scalar_one()
+            await session.execute(
+                mysql_insert(DBlob)
+                .values(digest=digest, path=book.hashed, size=size, refcount=1)
+                .on_duplicate_key_update(refcount=DBlob.refcount + 1))
+            path = (await session.execute(blob_paths_query([digest]))).one().path
+            old_path = book.hashed
+            await session.execute(
+                update(DBook).where(DBook.id == book_id).values(file_hash=digest, hashed=path))
+            await session.execute(
+                mysql_insert(DBookText).prefix_with('IGNORE')
+                .values(digest=digest, status='pending', updated=datetime.now()))
+            if old_path == path:
+                return None
+            await cls._bump_version(session)
+            await cls._record_redirect(session, old_path, path)
+            result = await session.execute(books_at_path_query(old_path))
+            return old_path if result.scalar_one() == 0 else None
+
+
+    @classmethod
+    async def enqueue_job(cls, kind: str, payload: str, *, session: AsyncSession = None):
+        """Stores a queued job.
+
+            Args:
+                kind (str): Handler name.
+                payload (str): JSON-encoded handler arguments.
+                session (AsyncSession): Session to use, defaults to the request's unit of work.
+
+            Returns:
+                int: Job id.
+            """
+        async with session_scope(session) as session:
+            now = datetime.now()
+            result = await session.execute(
+                insert(DJob).values(kind=kind, payload=payload, status='queued', attempts=0,
+                                    created=now, updated=now))
+            return result.inserted_primary_key[0]
+
+
+    @classmethod
+    async def start_job(cls, job_id: int, *, session: AsyncSession = None):
+        """Marks a queued job as running, unless another worker took it first.
+
+            Returns:
+                tuple: (kind, payload), None if the job is not queued any more.
+            """
+        async with session_scope(session) as session:
+            result = await session.execute(
+                update(DJob).where(DJob.id == job_id, DJob.status == 'queued')
+                .values(status='running', attempts=DJob.attempts + 1, updated=datetime.now()))
+            if result.rowcount != 1:
+                return None
+            job = (await session.execute(job_query(job_id))).scalar_one()
+            return job.kind, job.payload
+
+
+    @classmethod
+    async def finish_job(cls, job_id: int, result: str = None, *, session: AsyncSession = None):
+        """Marks a job as done, in the transaction that applied its effects."""
+        async with session_scope(session) as session:
+            await session.execute(
+                update(DJob).where(DJob.id == job_id)
+                .values(status='done', result=result, error=None, updated=datetime.now()))
+
+
+    @classmethod
+    async def fail_job(cls, job_id: int, error: str, max_attempts: int, *, session: AsyncSession = None):
+        """Records a failed attempt; the job is queued again until max_attempts.
+
+            Returns:
+                str: New status ('queued' or 'failed').
+            """
+        async with session_scope(session) as session:
+            job = (await session.execute(job_query(job_id))).scalar_one_or_none()
+            attempts = job.attempts if job is not None else 0
+            status = 'failed' if attempts >= max_attempts else 'queued'
+            await session.execute(
+                update(DJob).where(DJob.id == job_id)
+                .values(status=status, error=error, updated=datetime.now()))
+            return status
+
+
+    @classmethod
+    async def queued_jobs(cls, limit: int, *, session: AsyncSession = None):
+        """Ids of the oldest queued jobs."""
+        async with session_scope(session) as session:
+            result = await session.execute(queued_jobs_query(limit))
+            return result.scalars().all()
+
+
+    @classmethod
+    async def queued_job(cls, kind: str, *, session: AsyncSession = None):
+        """Id of a queued job of a kind, None if none is waiting."""
+        async with session_scope(session) as session:
+            result = await session.execute(queued_jobs_query(1, kind))
+            return result.scalar_one_or_none()
+
+
+    @classmethod
+    async def reset_jobs(cls, stale_before: datetime = None, *, session: AsyncSession = None):
+        """Returns jobs left 'running' by a stopped process to 'queued'.
+
+            Args:
+                stale_before (datetime): Only jobs whose last heartbeat (see touch_job)
+                    is older than this, so jobs of other live worker processes are
+                    left alone (None: all running jobs).
+
+            Returns:
+                int: Number of jobs requeued.
+            """
+        async with session_scope(session) as session:
+            result = await session.execute(reset_jobs_query(stale_before))
+            return result.rowcount
+
+
+    @classmethod
+    async def touch_job(cls, job_id: int, *, session: AsyncSession = None):
+        """Heartbeat of a running job: moves its updated time forward."""
+        async with session_scope(session) as session:
+            await session.execute(
+                update(DJob).where(DJob.id == job_id, DJob.status == 'running')
+                .values(updated=datetime.now()))
+
+
+    @classmethod
+    async def get_job(cls, job_id: int, *, session: AsyncSession = None):
+        """Fetches a job by id, None if it does not exist."""
+        async with session_scope(session) as session:
+            result = await session.execute(job_query(job_id))
+            return result.scalar_one_or_none()
@@ -0,0 +1,167 @@
+import re
+from sqlalchemy import select, func, desc, and_, or_, case
+from sqlalchemy.dialects.mysql import match
+from shemas.database import DBook, DBookText
+
+
+MIN_TOKEN_SIZE = 3
+SEARCH_FIELDS = {
+    "title": (DBook.title,),
+    "author": (DBook.autor,),
+    "category": (DBook.category,),
+    "all": (DBook.title, DBook.autor, DBook.category, DBook.describe),
+    "content": (DBookText.content,),
+}
+FIELD_ALIASES = {
+    "title": "title", "название": "title",
+    "author": "author", "autor": "author", "автор": "author",
+    "category": "category", "категория": "category",
+    "all": "all",
+    "content": "content", "text": "content", "текст": "content",
+}
+VALUE_COLUMNS = {"title": DBook.title, "author": DBook.autor, "category": DBook.category}
+BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+TOKEN = re.compile(r'(?:(\w+):)?(?:"([^"]+)"|(\S+))')
+
+
+def parse_query(search: str, default_field: str = "all"):
+    """Splits a search string into per-field term lists.
+
+        Supports field prefixes (``author:Толстой title:"война и мир" text:...``); terms
+        without a prefix go to ``default_field``.
+
+        Args:
+            search (str): Raw search string from the form.
+            default_field (str): Field for unprefixed terms ('title', 'author', 'category', 'all', 'content').
+
+        Returns:
+            dict: Field name -> list of terms (phrases are kept as one term).
+        """
+    default_field = FIELD_ALIASES.get(default_field or "all", "all")
+    fields = {}
+    for prefix, phrase, word in TOKEN.findall(search or ""):
+        field = FIELD_ALIASES.get(prefix.lower(), None) if prefix else default_field
+        if prefix and field is None:
+            field, word = default_field, f"{prefix}:{word}"
+        term = phrase or word
+        fields.setdefault(field, []).append(term)
+    return fields
+
+
+def boolean_expression(terms):
+    """Builds a MATCH ... AGAINST boolean-mode expression from user terms.
+
+        Every word becomes mandatory and prefix-matched (``+word*``), phrases
+        become mandatory exact phrases. Operator characters typed by the user are
+        stripped, single words shorter than the InnoDB token size are dropped.
+
+        Args:
+            terms (list): Terms returned by parse_query for one field.
+
+        Returns:
+            str: Boolean-mode expression, empty string if nothing is searchable.
+        """
+    parts = []
+    for term in terms:
+        words = BOOLEAN_OPERATORS.sub(" ", term).split()
+        if len(words) > 1 and " " in term.strip():
+            parts.append(f'+"{" ".join(words)}"')
+        else:
+            parts.extend(f"+{w}*" for w in words if len(w) >= MIN_TOKEN_SIZE)
+    return " ".join(parts)
+
+
+def build_search(search: str, search_type: str = "all"):
+    """Builds the relevance score and filter for a search request.
+
+        Args:
+            search (str): Raw search string.
+            search_type (str): Default field for unprefixed terms.
+
+        Returns:
+            tuple: (score expression, list of WHERE clauses, whether book_text
+                must be joined), or (None, None, False) if the query has no
+                searchable terms.
+        """
+    score = None
+    clauses = []
+    uses_text = False
+    for field, terms in parse_query(search, search_type).items():
+        expression = boolean_expression(terms)
+        if not expression:
+            continue
+        condition = match(*SEARCH_FIELDS[field], against=expression).in_boolean_mode()
+        clauses.append(condition)
+        score = condition if score is None else score + condition
+        uses_text = uses_text or field == "content"
+    if score is None:
+        return None, None, False
+    return score, clauses, uses_text
+
+
+def _from_books(q, uses_text: bool):
+    if uses_text:
+        return q.join(DBookText, DBookText.digest == DBook.file_hash)
+    return q
+
+
+def search_query(search: str, search_type: str, page: int, per_page: int):
+    """Ranked, paginated search statement over DBook."""
+    score, clauses, uses_text = build_search(search, search_type)
+    if score is None:
+        return None
+    return (_from_books(select(DBook), uses_text)
+            .where(and_(*clauses))
+            .order_by(desc(score), desc(DBook.id))
+            .offset((page - 1) * per_page)
+            .limit(per_page))
+
+
+def count_query(search: str, search_type: str):
+    """Number of rows matching a search, for pagination."""
+    score, clauses, uses_text = build_search(search, search_type)
+    if score is None:
+        return None
+    return _from_books(select(func.count()).select_from(DBook), uses_text).where(and_(*clauses))
+
+
+def build_fuzzy(scores):
+    """Builds the rank and filter of the books matching fuzzy search values.
+
+        A book ranks by its best matching value: the CASE tests the values
+        grouped by score, best score first.
+
+        Args:
+            scores: Dict of (kind, value) -> similarity, kind is 'title', 'author' or 'category'.
+
+        Returns:
+            tuple: (rank expression, filter), (None, None) if there are no values.
+        """
+    by_score, by_kind = {}, {}
+    for (kind, value), score in scores.items():
+        by_score.setdefault(score, {}).setdefault(kind, []).append(value)
+        by_kind.setdefault(kind, []).append(value)
+    if not by_kind:
+        return None, None
+    rank = case(*((or_(*(VALUE_COLUMNS[kind].in_(values) for kind, values in kinds.items())), score)
+                  for score, kinds in sorted(by_score.items(), reverse=True)), else_=0)
+    return rank, or_(*(VALUE_COLUMNS[kind].in_(values) for kind, values in by_kind.items()))
+
+
+def fuzzy_query(scores, page: int, per_page: int):
+    """Paginated fuzzy search statement over DBook, best matches first."""
+    rank, clause = build_fuzzy(scores)
+    if rank is None:
+        return None
+    return (select(DBook).where(clause)
+            .order_by(desc(rank), desc(DBook.id))
+            .offset((page - 1) * per_page)
+            .limit(per_page))
+
+
+def fuzzy_count_query(scores):
+    """Number of books matching fuzzy search values, for pagination."""
+    _, clause = build_fuzzy(scores)
+    if clause is None:
+        return None
+    return select(func.count()).select_from(DBook).where(clause)
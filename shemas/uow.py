@@ -0,0 +1,71 @@
+import asyncio
+import contextvars
+
+
+_current = contextvars.ContextVar('unit_of_work', default=None)
+
+
+class UnitOfWork:
+    """Session and transaction shared by every Repo call made while handling one request.
+
+        The session is created on first use, so requests that never touch the
+        database do not check out a connection. It is only handed to the task
+        that opened it: background tasks spawned during the request copy the
+        context variable but get their own sessions, since an AsyncSession must
+        not be used concurrently.
+
+        Args:
+            factory: Session factory (async_sessionmaker).
+        """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.owner = asyncio.current_task()
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = self.factory()
+        return self._session
+
+    async def commit(self):
+        """Commits the work done so far; the next Repo call starts a new transaction."""
+        if self._session is not None and self._session.in_transaction():
+            await self._session.commit()
+
+    async def close(self):
+        """Rolls back anything not committed and returns the connection to the pool."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def begin_request(factory):
+    """Opens the unit of work of the current request (before_request hook)."""
+    uow = UnitOfWork(factory)
+    _current.set(uow)
+    return uow
+
+
+def current():
+    """The unit of work of the request handled by the current task, None outside of one."""
+    uow = _current.get()
+    if uow is None or uow.owner is not asyncio.current_task():
+        return None
+    return uow
+
+
+async def commit():
+    """Commits the current request's transaction early, e.g. before unlinking files."""
+    uow = current()
+    if uow is not None:
+        await uow.commit()
+
+
+async def end_request():
+    """Closes the unit of work of the current request (teardown_request hook)."""
+    uow = current()
+    _current.set(None)
+    if uow is not None:
+        await uow.close()
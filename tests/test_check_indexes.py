@@ -0,0 +1,30 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import mysql
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL',
+                      f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'library.db')}")
+
+from create.check_indexes import query_shapes
+from shemas.repository import Repo
+
+
+def test_every_repo_query_has_a_shape():
+    sample = SimpleNamespace(id=5, title='Война и мир', autor='Толстой', category='проза',
+                             hashed='ab/cd/x.pdf', file_hash='ab' * 32, date_created=datetime(2024, 1, 1))
+    shapes = query_shapes(sample)
+    for _, statement, _ in shapes:
+        statement.compile(dialect=mysql.dialect(), compile_kwargs={"render_postcompile": True})
+
+    checked = {name.split()[0].split('.')[1] for name, _, _ in shapes}
+    # Writes by primary or unique key, inserts and the streaming wrapper need no plan check.
+    by_key = {'insert_new_book', 'insert_books', 'drop_file', 'drop_books', '_bump_counts', '_bump_version',
+              'save_text', 'release_text', 'adopt_blob', 'enqueue_job', 'start_job', 'finish_job', 'fail_job',
+              'touch_job'}
+    methods = {name for name in vars(Repo) if isinstance(vars(Repo)[name], classmethod)}
+    assert methods - by_key - checked == set()
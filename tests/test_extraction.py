@@ -0,0 +1,77 @@
+import asyncio
+import os
+import signal
+import sys
+import tempfile
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL',
+                      f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'library.db')}")
+
+from services.extraction import TextExtractor, ExtractionError, ExtractionInterrupted
+
+
+def fake_extract(file_path, timeout):
+    """Stands in for extract_pdf_text in the pool processes: sleeps, hangs or crashes."""
+    signal.signal(signal.SIGALRM, signal.SIG_DFL)
+    signal.alarm(timeout)
+    if file_path == 'hang':
+        time.sleep(60)
+    if file_path == 'crash':
+        time.sleep(0.5)
+        os._exit(1)
+    time.sleep(float(file_path))
+    return file_path
+
+
+async def later(delay, coroutine):
+    await asyncio.sleep(delay)
+    return await coroutine
+
+
+@pytest.fixture
+def extractor():
+    extractor = TextExtractor(workers=2, timeout=4, function=fake_extract)
+    yield extractor
+    extractor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_timeout_only_blames_the_slow_document(extractor):
+    hang, sibling = await asyncio.gather(extractor.extract('hang'), later(2.5, extractor.extract('3')),
+                                         return_exceptions=True)
+    assert isinstance(hang, ExtractionError)
+    assert isinstance(sibling, ExtractionInterrupted) and not sibling.suspect
+
+
+@pytest.mark.asyncio
+async def test_crash_among_several_is_found_by_running_alone(extractor):
+    crash, sibling = await asyncio.gather(extractor.extract('crash'), extractor.extract('3'),
+                                          return_exceptions=True)
+    # Either the crash is noticed while both run (both suspects), or only after the
+    # sibling has finished (the crash ran alone): the sibling is never charged.
+    if isinstance(sibling, ExtractionInterrupted):
+        assert sibling.suspect and isinstance(crash, ExtractionInterrupted) and crash.suspect
+    else:
+        assert sibling == '3' and isinstance(crash, ExtractionError)
+
+    assert await extractor.extract('0.1', alone=True) == '0.1'
+    with pytest.raises(ExtractionError):
+        await extractor.extract('crash', alone=True)
+
+
+@pytest.mark.asyncio
+async def test_more_documents_than_workers(extractor):
+    results = await asyncio.gather(*(extractor.extract('0.5') for _ in range(5)))
+    assert results == ['0.5'] * 5
+    assert sorted(extractor._free) == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_trigger_during_a_pass_returns_at_once(extractor):
+    async with extractor._lock:
+        assert await extractor.run_pending(wait=False) == 0
+    assert extractor._again
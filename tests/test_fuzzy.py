@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL',
+                      f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'library.db')}")
+
+from services.fuzzy import FuzzyIndex, latinize
+from shemas.database import Model, DBook
+from shemas.repository import Repo, engine
+
+
+@pytest_asyncio.fixture
+async def tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.create_all)
+    yield
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.drop_all)
+    await engine.dispose()
+
+
+def test_transliteration_folds_spellings():
+    assert latinize('Толстой') == latinize('Tolstoi') == latinize('TOLSTOJ') == 'tolstoy'
+    assert latinize('Достоевский') == latinize('Dostoevsky')
+    assert latinize('Чехов') == latinize('Chekhov') == latinize('Chehov')
+
+
+def test_typos_and_alphabets():
+    index = FuzzyIndex()
+    index._values, index._ids, index._counts, index._postings = index._build([
+        ('author', 'Л. Н. Толстой', 2), ('author', 'Ф. М. Достоевский', 1),
+        ('title', 'Война и мир', 1), ('category', 'проза', 3)])
+
+    assert [value for _, _, value in index.search('Tolstoy')] == ['Л. Н. Толстой']
+    assert [value for _, _, value in index.search('Толстй')] == ['Л. Н. Толстой']
+    assert [value for _, _, value in index.search('Dostoevskii', kinds=('author',))] == ['Ф. М. Достоевский']
+    assert index.search('Dostoevsky', kinds=('title',)) == []
+
+    index.apply([], [{'title': 'Война и мир', 'autor': 'Л. Н. Толстой', 'category': 'проза'}])
+    assert index.search('Война и мир') == []
+    assert [value for _, _, value in index.search('Tolstoy')] == ['Л. Н. Толстой']
+
+
+@pytest.mark.asyncio
+async def test_best_match_ranks_first_however_old(tables):
+    book = {'autor': 'Л. Н. Толстой', 'category': 'проза', 'describe': '', 'hashed': 'x.pdf',
+            'date_created': datetime(2024, 1, 1)}
+    async with engine.begin() as conn:
+        await conn.execute(insert(DBook).values(title='Война и мир', **book))
+        await conn.execute(insert(DBook).values([{'title': f'Рассказ {i}', **book} for i in range(250)]))
+    scores = {('title', 'Война и мир'): 1.0, ('author', 'Л. Н. Толстой'): 0.6}
+
+    assert (await Repo.books_by_values(scores, 1, 20))[0].title == 'Война и мир'
+    assert len(await Repo.books_by_values(scores, 13, 20)) == 11
+    assert await Repo.count_by_values(scores) == 251
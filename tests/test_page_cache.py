@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, update
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL',
+                      f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'library.db')}")
+
+from app import app
+from services.page_cache import PageCache
+from shemas.cache import catalog_cache, TTLCache, MISSING
+from shemas.database import Model, DBook, DBookCount
+from shemas.repository import engine
+
+
+@pytest_asyncio.fixture
+async def catalog():
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.create_all)
+        await conn.execute(insert(DBookCount).values([
+            {'scope': 'total', 'category': '', 'total': 0},
+            {'scope': 'version', 'category': '', 'total': 1}]))
+    catalog_cache.clear()
+    yield
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_change_committed_elsewhere_invalidates_etag(catalog):
+    client = app.test_client()
+    first = await client.get('/')
+    etag = first.headers['ETag']
+    assert (await client.get('/', headers={'If-None-Match': etag})).status_code == 304
+
+    # Another process (worker, bulk import) adds a book; this process never saw the write.
+    async with engine.begin() as conn:
+        await conn.execute(insert(DBook).values(
+            title='Новая книга', autor='Автор', category='проза', describe='',
+            hashed='aa/bb/new.pdf', date_created=datetime(2024, 1, 1)))
+        await conn.execute(update(DBookCount).where(DBookCount.scope == 'version')
+                           .values(total=DBookCount.total + 1))
+
+    fresh = await client.get('/', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != etag
+    assert 'Новая книга' in await fresh.get_data(as_text=True)
+
+
+@pytest.mark.asyncio
+async def test_other_worker_drops_its_catalog_cache_on_new_version(catalog):
+    client = app.test_client()
+    first = await client.get('/')
+    assert 'href="?page=2"' not in await first.get_data(as_text=True)
+
+    # Another worker commits 25 books: its own catalog_cache is cleared on commit,
+    # this process only learns about it from the shared version row.
+    async with engine.begin() as conn:
+        await conn.execute(insert(DBook).values([
+            {'title': f'Стихи {i}', 'autor': 'Поэт', 'category': 'поэзия', 'describe': '',
+             'hashed': f'aa/bb/{i}.pdf', 'date_created': datetime(2024, 1, 1)} for i in range(25)]))
+        await conn.execute(update(DBookCount).where(DBookCount.scope == 'total').values(total=25))
+        await conn.execute(update(DBookCount).where(DBookCount.scope == 'version')
+                           .values(total=DBookCount.total + 1))
+
+    body = await (await client.get('/')).get_data(as_text=True)
+    assert 'href="?page=2"' in body
+    assert 'поэзия' in body
+
+
+@pytest.mark.asyncio
+async def test_two_instances_share_the_version_not_the_cache():
+    version = [1]
+
+    async def current():
+        return version[0]
+
+    committing, rendering = TTLCache(), TTLCache()
+    worker_a, worker_b = PageCache(current, caches=(committing,)), PageCache(current, caches=(rendering,))
+    for worker, cache in ((worker_a, committing), (worker_b, rendering)):
+        await worker._seen()
+        cache.set('count_books', 0)
+
+    version[0] += 1
+    committing.clear()      # after_commit, in the committing worker only
+    assert rendering.get('count_books') == 0
+    await worker_b._seen()
+    assert rendering.get('count_books') is MISSING
@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL',
+                      f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'library.db')}")
+
+from shemas.database import Model, DBook
+from shemas.pagination import decode_cursor
+from shemas.repository import Repo, engine
+
+
+@pytest_asyncio.fixture
+async def tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.create_all)
+    yield
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_walk_tied_empty_sort_values(tables):
+    async with engine.begin() as conn:
+        await conn.execute(insert(DBook).values([
+            {'title': '' if i % 2 else f'book {i}', 'autor': '', 'category': 'c', 'describe': '',
+             'hashed': f'{i}.pdf', 'date_created': datetime(2024, 1, 1)} for i in range(7)]))
+
+    for link in ('title', 'author', 'date_created'):
+        seen, cursor = [], None
+        while True:
+            page = await Repo.all_query(3, link, 'c', cursor)
+            seen += [book.id for book in page.items]
+            if page.next_cursor is None:
+                break
+            cursor = decode_cursor(page.next_cursor)
+        assert sorted(seen) == list(range(1, 8)) and len(seen) == 7
+
+
+@pytest.mark.asyncio
+async def test_sort_fields_refuse_null(tables):
+    with pytest.raises(IntegrityError):
+        async with engine.begin() as conn:
+            await conn.execute(insert(DBook).values(
+                title=None, autor='a', category='c', describe='', hashed='x.pdf',
+                date_created=datetime(2024, 1, 1)))
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+import pytest_asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL',
+                      f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'library.db')}")
+
+from app import app, serializer
+from services import metrics
+from services.profiling import request_profiler, PROFILE_HEADER, PROFILE_SALT
+from shemas.cache import catalog_cache
+from shemas.database import Model
+from shemas.repository import Repo, engine
+
+
+@pytest_asyncio.fixture
+async def tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.create_all)
+    catalog_cache.clear()
+    yield
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_signed_header_profiles_one_request(tables, monkeypatch):
+    monkeypatch.setattr(request_profiler, 'folder', tempfile.mkdtemp())
+    client = app.test_client()
+
+    assert PROFILE_HEADER not in (await client.get('/')).headers
+    assert PROFILE_HEADER not in (await client.get('/', headers={PROFILE_HEADER: 'forged'})).headers
+    token = serializer.dumps('profile', salt=PROFILE_SALT)
+    name = (await client.get('/', headers={PROFILE_HEADER: token})).headers[PROFILE_HEADER]
+
+    assert request_profiler.profiles() == [name]
+    assert 'function calls' in request_profiler.report(name)
+    assert request_profiler.path('../app.py') is None
+
+
+@pytest.mark.asyncio
+async def test_slow_repo_statement_keeps_plan(tables, monkeypatch):
+    monkeypatch.setattr(metrics, 'SLOW_QUERY_MS', 0)
+    metrics.slow_queries.clear()
+
+    await Repo.category()
+    for _ in range(50):
+        entry = next(e for e in metrics.slow_queries.entries() if e['query'] == 'Repo.category')
+        if entry['plan'] or entry['plan_error']:
+            break
+        await asyncio.sleep(0.01)
+
+    assert entry['statement'].startswith('SELECT DISTINCT book.category')
+    assert entry['plan_error'] is None and entry['plan']['rows']
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL',
+                      f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'library.db')}")
+
+from app import app
+from services.gc import _stale
+from services.relayout import LayoutMigration
+from services.storage import link_into_place
+from shemas.cache import catalog_cache
+from shemas.database import Model, DBook, DBlob
+from shemas.repository import engine
+
+
+@pytest_asyncio.fixture
+async def tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.create_all)
+    catalog_cache.clear()
+    yield
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_md5_named_legacy_file_redirects_after_migration(tables, monkeypatch):
+    monkeypatch.chdir(tempfile.mkdtemp())
+    data = b'legacy contents'
+    sha, md5 = hashlib.sha256(data).hexdigest(), hashlib.md5(data).hexdigest()
+    legacy = f'2020/2020-01-01/old_{md5}.pdf'
+    os.makedirs(os.path.join('files', os.path.dirname(legacy)))
+    with open(os.path.join('files', legacy), 'wb') as f:
+        f.write(data)
+    async with engine.begin() as conn:
+        await conn.execute(insert(DBlob).values(digest=sha, path=legacy, size=len(data)))
+        await conn.execute(insert(DBook).values(
+            title='t', autor='a', category='c', describe='', hashed=legacy, file_hash=sha,
+            date_created=datetime(2020, 1, 1)))
+
+    stats = await LayoutMigration('hashed').run()
+    assert (stats['moved'], stats['books'], stats['finished']) == (1, 1, True)
+    new_path = f'{sha[:2]}/{sha[2:4]}/{sha}.pdf'
+    assert not os.path.exists(os.path.join('files', legacy))
+
+    response = await app.test_client().get(f'/files/{legacy}')
+    assert response.status_code == 301
+    assert response.headers['Location'].endswith(f'/files/{new_path}')
+
+
+@pytest.mark.asyncio
+async def test_new_link_of_old_file_is_not_stale(monkeypatch):
+    monkeypatch.chdir(tempfile.mkdtemp())
+    os.makedirs('files/old')
+    with open('files/old/book.pdf', 'wb') as f:
+        f.write(b'contents')
+    os.utime('files/old/book.pdf', (0, 0))
+
+    await link_into_place('old/book.pdf', 'aa/bb/book.pdf')
+    assert os.stat('files/aa/bb/book.pdf').st_mtime > 0
+    assert _stale('files', ['aa/bb/book.pdf'], grace=3600) == []
@@ -0,0 +1,45 @@
+import hashlib
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.resumable import ResumableUploads, UploadError
+
+
+async def body(data: bytes, piece: int = 1000):
+    for i in range(0, len(data), piece):
+        yield data[i:i + piece]
+
+
+@pytest.mark.asyncio
+async def test_chunks_resume_and_hash():
+    folder = tempfile.mkdtemp()
+    data = os.urandom(10_000)
+    uploads = ResumableUploads(folder, max_size=len(data), chunk_size=4096)
+    upload_id = await uploads.create(len(data), {'extension': 'pdf'})
+
+    assert await uploads.write(upload_id, 0, body(data[:4000])) == 4000
+    with pytest.raises(UploadError) as rejected:
+        await uploads.write(upload_id, 0, body(data[:4000]))
+    assert (rejected.value.status, rejected.value.offset) == (409, 4000)
+    with pytest.raises(UploadError) as too_large:
+        await uploads.write(upload_id, 4000, body(data[4000:9000]))
+    assert too_large.value.status == 413
+
+    # A restarted worker has no running hash and rebuilds it from the data on disk.
+    restarted = ResumableUploads(folder, max_size=len(data), chunk_size=4096)
+    offset = (await restarted.status(upload_id))['offset']
+    while offset < len(data):
+        offset = await restarted.write(upload_id, offset, body(data[offset:offset + 4096]))
+
+    data_path, digest, size, meta = await restarted.finish(upload_id)
+    assert (digest, size, meta) == (hashlib.sha256(data).hexdigest(), len(data), {'extension': 'pdf'})
+    with open(data_path, 'rb') as f:
+        assert f.read() == data
+    await restarted.forget(upload_id)
+    with pytest.raises(UploadError):
+        await restarted.status(upload_id)
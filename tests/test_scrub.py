@@ -0,0 +1,93 @@
+import hashlib
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, delete
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL',
+                      f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'library.db')}")
+
+from services.scrub import Scrubber
+from shemas.database import Model, DBook, DBlob
+from shemas.repository import Repo, engine
+
+
+def store(root, path, data):
+    os.makedirs(os.path.dirname(os.path.join(root, path)), exist_ok=True)
+    with open(os.path.join(root, path), 'wb') as f:
+        f.write(data)
+
+
+@pytest_asyncio.fixture
+async def root():
+    root = tempfile.mkdtemp()
+    good, bad = b'intact', b'original'
+    good_sha, bad_sha = hashlib.sha256(good).hexdigest(), hashlib.sha256(bad).hexdigest()
+    legacy_md5 = hashlib.md5(b'legacy').hexdigest()
+    paths = {'good': f'aa/bb/{good_sha}.pdf', 'bad': f'cc/dd/{bad_sha}.pdf',
+             'gone': f'ee/ff/{"0" * 64}.pdf', 'legacy': f'2020/2020-01-01/old_{legacy_md5}.pdf'}
+    store(root, paths['good'], good)
+    store(root, paths['bad'], b'bit rot')
+    store(root, paths['legacy'], b'legacy')
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.create_all)
+        await conn.execute(insert(DBlob).values([
+            {'digest': good_sha, 'path': paths['good'], 'size': 6},
+            {'digest': bad_sha, 'path': paths['bad'], 'size': 8},
+            {'digest': '0' * 64, 'path': paths['gone'], 'size': 1}]))
+        await conn.execute(insert(DBook).values([
+            {'title': 't', 'autor': 'a', 'category': 'c', 'hashed': paths['gone'], 'file_hash': '0' * 64,
+             'date_created': datetime(2024, 1, 1)},
+            {'title': 't', 'autor': 'a', 'category': 'c', 'hashed': paths['legacy'], 'file_hash': None,
+             'date_created': datetime(2020, 1, 1)}]))
+    yield root, paths
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_scrub_resumes_and_records_issues(root):
+    root, paths = root
+    scrubber = Scrubber(root, rate=10 * 1024 * 1024, batch_size=2)
+
+    first = await scrubber.run(max_files=2)
+    assert (first['checked'], first['finished']) == (2, False)
+    assert scrubber.load_state()['phase'] == 'blob'
+    rest = await Scrubber(root, batch_size=2).run()
+    assert (rest['checked'], rest['finished']) == (3, True)
+
+    opened, issues = await Repo.storage_issues()
+    found = {issue.path: (issue.kind, books) for issue, books in issues}
+    assert opened == 2
+    assert found == {paths['bad']: ('corrupt', []), paths['gone']: ('missing', [1])}
+
+    store(root, paths['bad'], b'original')
+    assert (await scrubber.run())['corrupt'] == 0
+    opened, issues = await Repo.storage_issues(resolved=True)
+    assert opened == 1 and len(issues) == 2
+
+
+@pytest.mark.asyncio
+async def test_file_dropped_during_batch_is_not_an_issue(root, monkeypatch):
+    root, paths = root
+    batch = Scrubber._batch
+
+    async def batch_then_drop(self, phase, after_id):
+        checks = await batch(self, phase, after_id)
+        # The book is dropped and its file removed after the batch was read.
+        async with engine.begin() as conn:
+            await conn.execute(delete(DBook).where(DBook.hashed == paths['gone']))
+            await conn.execute(delete(DBlob).where(DBlob.path == paths['gone']))
+        return checks
+
+    monkeypatch.setattr(Scrubber, '_batch', batch_then_drop)
+    stats = await Scrubber(root, batch_size=10).run()
+    assert (stats['missing'], stats['corrupt']) == (0, 1)
+    opened, issues = await Repo.storage_issues()
+    assert [issue.path for issue, _ in issues] == [paths['bad']]
@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL',
+                      f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'library.db')}")
+
+from services.fuzzy import FuzzyIndex
+from services.suggest import SuggestIndex
+from services.terms import TermRefresher
+from shemas.repository import Repo
+
+
+def test_prefix_at_word_start_and_incremental_updates():
+    index = SuggestIndex(max_entries=100)
+    index._values, index._words, index._counts, index.dropped = index._build([
+        ('category', 'проза', 3), ('author', 'Л. Н. Толстой', 2),
+        ('title', 'Война и мир', 1), ('title', 'Военные рассказы', 1)])
+
+    assert index.suggest('вОй') == [('title', 'Война и мир')]
+    assert index.suggest('тол') == [('author', 'Л. Н. Толстой')]
+    assert index.suggest('мир') == [('title', 'Война и мир')]
+    assert index.suggest('во', kind='author') == []
+
+    book = {'title': 'Ёлка', 'autor': 'Л. Н. Толстой', 'category': 'проза'}
+    index.apply([book], [])
+    assert index.suggest('елк') == [('title', 'Ёлка')]
+    index.apply([], [book, {'title': 'Война и мир', 'autor': 'Л. Н. Толстой', 'category': 'проза'}])
+    assert index.suggest('елк') == []
+    assert index.suggest('вой') == []
+    assert index.suggest('тол') == [('author', 'Л. Н. Толстой')]
+
+
+def test_cap_leaves_out_values():
+    index = SuggestIndex(max_entries=3)
+    index._values, index._words, index._counts, index.dropped = index._build([
+        ('category', 'проза', 2), ('title', 'Война и мир', 1)])
+    assert len(index) <= 3 and index.dropped == 1
+    index.add('title', 'Ещё одна книга')
+    assert len(index) <= 3 and index.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_one_term_scan_feeds_both_indexes(monkeypatch):
+    scans = []
+
+    async def suggest_terms(*args, **kwargs):
+        scans.append(1)
+        return [('author', 'Л. Н. Толстой', 2), ('title', 'Война и мир', 1)]
+
+    monkeypatch.setattr(Repo, 'suggest_terms', suggest_terms)
+    suggest, fuzzy = SuggestIndex(), FuzzyIndex()
+    await TermRefresher(suggest, fuzzy, refresh=0).load()
+
+    assert len(scans) == 1 and suggest.ready and fuzzy.ready
+    assert suggest.suggest('тол') == [('author', 'Л. Н. Толстой')]
+    assert [value for _, _, value in fuzzy.search('Tolstoy')] == ['Л. Н. Толстой']
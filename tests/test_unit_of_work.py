@@ -0,0 +1,56 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, insert
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL',
+                      f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'library.db')}")
+
+import benchmarks.sqlite_compat  # noqa: F401  (MATCH ... AGAINST as LIKE on SQLite)
+from app import app
+from shemas.cache import catalog_cache
+from shemas.database import Model, DBook, DBookCount
+from shemas.repository import engine
+
+
+@pytest_asyncio.fixture
+async def checkouts():
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.create_all)
+        await conn.execute(insert(DBook).values([
+            {'title': f'Книга {i}', 'autor': 'Автор', 'category': 'проза', 'describe': '',
+             'hashed': f'2024/01/01/book_{i}.pdf', 'date_created': datetime(2024, 1, 1)}
+            for i in range(30)]))
+        await conn.execute(insert(DBookCount).values([
+            {'scope': 'total', 'category': '', 'total': 30},
+            {'scope': 'category', 'category': 'проза', 'total': 30}]))
+    catalog_cache.clear()
+    counted = []
+    listener = lambda *args: counted.append(1)
+    event.listen(engine.sync_engine, 'checkout', listener)
+    yield counted
+    event.remove(engine.sync_engine, 'checkout', listener)
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('method, path, query, form', [
+    ('GET', '/', None, None),
+    ('GET', '/', {'page': 2}, None),
+    ('GET', '/select_category', {'name': 'проза', 'link': 'title', 'page': 2}, None),
+    ('GET', '/search', {'search': 'Книга', 'search_type': 'title', 'page': 2}, None),
+    ('POST', '/search', None, {'search': 'author:Автор', 'search_type': 'all'}),
+    ('POST', '/login', None, {'user': 'nobody', 'password': 'secret'}),
+])
+async def test_one_pool_checkout_per_request(checkouts, method, path, query, form):
+    client = app.test_client()
+    response = await client.open(path, method=method, query_string=query, form=form)
+    assert response.status_code in (200, 401)
+    assert len(checkouts) <= 1
@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL',
+                      f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'library.db')}")
+
+from app import store_upload, ingest_upload
+from services.gc import remove_released
+from services.jobs import job_queue
+from shemas.database import Model, DBlob, DJob
+from shemas.repository import engine
+
+
+@pytest_asyncio.fixture
+async def tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.create_all)
+    yield
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_is_discarded_before_the_move(tables, monkeypatch):
+    monkeypatch.chdir(tempfile.mkdtemp())
+    digest, existing = 'ab' * 32, 'ab/ab/existing.pdf'
+    os.makedirs('files/ab/ab')
+    with open(f'files/{existing}', 'wb') as f:
+        f.write(b'stored')
+    async with engine.begin() as conn:
+        await conn.execute(insert(DBlob).values(digest=digest, path=existing, size=6))
+    tmp_path = os.path.join(tempfile.mkdtemp(), 'upload.part')
+    with open(tmp_path, 'wb') as f:
+        f.write(b'stored')
+
+    fields = {'title': 't', 'autor': 'a', 'category': 'c', 'describe': ''}
+    job_id = await store_upload(tmp_path, digest, 6, 'pdf', fields, datetime(2024, 1, 1))
+    async with engine.connect() as conn:
+        payload = json.loads((await conn.execute(select(DJob.payload).where(DJob.id == job_id))).scalar_one())
+    assert not os.path.exists(tmp_path)
+    assert (payload['items']['hashed'], payload['stored']) == (existing, False)
+
+    # The existing copy was dropped before the ingest job ran: no book without a file.
+    os.unlink(f'files/{existing}')
+    with pytest.raises(FileNotFoundError):
+        await ingest_upload(None, **payload)
+
+
+@pytest.mark.asyncio
+async def test_extraction_trigger_is_queued_once(tables):
+    first = await job_queue.submit_once('extract_text')
+    assert await job_queue.submit_once('extract_text') == first
+    async with engine.connect() as conn:
+        assert (await conn.execute(select(DJob.id))).scalars().all() == [first]
+
+
+@pytest.mark.asyncio
+async def test_reupload_after_a_drop_keeps_its_file(tables, monkeypatch):
+    monkeypatch.chdir(tempfile.mkdtemp())
+    os.makedirs('files/ab/ab')
+    for name in ('dropped.pdf', 'reuploaded.pdf'):
+        with open(f'files/ab/ab/{name}', 'wb') as f:
+            f.write(b'same')
+        os.utime(f'files/ab/ab/{name}', (0, 0))
+    time.sleep(0.05)     # st_ctime comes from the coarse kernel clock
+    since = time.time()
+    time.sleep(0.05)
+    # The same content moved back into place after the drop started (rename updates st_ctime).
+    os.rename('files/ab/ab/reuploaded.pdf', 'files/ab/ab/moved.pdf')
+
+    removed = await remove_released(['ab/ab/dropped.pdf', 'ab/ab/moved.pdf'], since)
+    assert removed == ['ab/ab/dropped.pdf']
+    assert os.path.exists('files/ab/ab/moved.pdf')